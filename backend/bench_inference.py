@@ -0,0 +1,80 @@
+# bench_inference.py
+"""
+Compare per-request inference with micro-batched inference under concurrent load.
+
+    python backend/bench_inference.py --model models/BERT/best --clients 32 --requests 512
+
+Both modes go through the same MicroBatcher and worker thread; "per-request"
+is max_batch_size=1 (one forward pass per text, as a naive server would do).
+Texts are sampled from pipeline/BERT/test.csv; --max-chars truncates them to
+model short queries (full advisories are mostly cut at --max-length tokens).
+"""
+import argparse
+import asyncio
+import csv
+import random
+import time
+from pathlib import Path
+
+from inference_server import DEFAULT_MODEL, AdvisoryClassifier, LatencyStats, MicroBatcher
+
+TEST_CSV = Path(__file__).resolve().parents[1] / "pipeline" / "BERT" / "test.csv"
+
+
+def load_texts(path: Path, n: int, max_chars=None, seed: int = 0) -> list:
+    with path.open(encoding="utf-8", newline="") as f:
+        texts = [row["text"][:max_chars] for row in csv.DictReader(f) if row.get("text")]
+    rng = random.Random(seed)
+    return [rng.choice(texts) for _ in range(n)]
+
+
+async def run_load(classifier, texts, clients, max_batch_size, max_wait_ms) -> tuple:
+    batcher = MicroBatcher(classifier.predict_proba, max_batch_size, max_wait_ms, LatencyStats())
+    await batcher.start()
+    it = iter(texts)
+
+    async def client():
+        for text in it:
+            await batcher.submit(text)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - t0
+    await batcher.stop()
+    return elapsed, batcher.stats.snapshot()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--texts", type=Path, default=TEST_CSV)
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=512)
+    ap.add_argument("--max-batch-size", type=int, default=32)
+    ap.add_argument("--max-wait-ms", type=float, default=10.0)
+    ap.add_argument("--max-length", type=int, default=256)
+    ap.add_argument("--max-batch-tokens", type=int, default=8192)
+    ap.add_argument("--max-chars", type=int, default=None)
+    ap.add_argument("--threads", type=int, default=None)
+    args = ap.parse_args()
+
+    classifier = AdvisoryClassifier(args.model, max_length=args.max_length,
+                                    max_batch_tokens=args.max_batch_tokens, num_threads=args.threads)
+    texts = load_texts(args.texts, args.requests, args.max_chars)
+    classifier.predict_proba(texts[:8])  # warm up
+
+    results = {}
+    for mode, bs, wait_ms in (("per-request", 1, 0.0), ("batched", args.max_batch_size, args.max_wait_ms)):
+        elapsed, snap = asyncio.run(run_load(classifier, texts, args.clients, bs, wait_ms))
+        results[mode] = elapsed
+        lat = snap["latency_ms"]
+        print(f"[BENCH] {mode:<11s} {len(texts) / elapsed:8.1f} req/s   p50 {lat['p50']:8.1f} ms   "
+              f"p99 {lat['p99']:8.1f} ms   mean batch {snap['mean_batch_size']:5.1f}")
+        if mode == "batched":
+            print(f"[INFO] batch-size histogram: {snap['batch_size_histogram']}")
+    print(f"[INFO] throughput x{results['per-request'] / results['batched']:.1f} "
+          f"({args.clients} concurrent clients, {len(texts)} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# inference_server.py
+"""
+Micro-batching CPU inference server for the advisory level classifier.
+
+Loads the fine-tuned checkpoint written by pipeline/BERT/sentiment.py
+(models/BERT/best) once. Concurrent requests are queued and collected
+into micro-batches: a batch closes when it reaches --max-batch-size or when the
+oldest request has waited --max-wait-ms. Each batch is tokenized once, sorted
+by length and run through padded forward passes of at most --max-batch-tokens
+on a dedicated worker thread (one pass unless lengths differ widely). Requests that arrive while a batch is running are picked up by the
+next batch without waiting further.
+
+    python backend/inference_server.py --model models/BERT/best --port 8000
+
+    POST /predict   {"text": "..."} or {"texts": ["...", ...]}
+                    -> {"predictions": [{"label": "Level 2", "probs": {"Level 1": 0.1, ...}}]}
+    GET  /metrics   request/batch counters, p50/p90/p99 latency, batch-size histogram
+    GET  /health
+
+Standard library HTTP only (asyncio streams), so nothing beyond torch and
+transformers is needed.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_MODEL = "models/BERT/best"
+
+
+class AdvisoryClassifier:
+    """Tokenizer + sequence classifier, loaded once and kept in eval mode."""
+
+    def __init__(self, model_dir=DEFAULT_MODEL, max_length=256, max_batch_tokens=8192, num_threads=None):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+        self.max_length = max_length
+        self.max_batch_tokens = max_batch_tokens
+        id2label = self.model.config.id2label
+        self.labels = [id2label[i] for i in range(len(id2label))]
+
+    def predict_proba(self, texts) -> np.ndarray:
+        """
+        Class probabilities for a list of texts.
+
+        Texts are tokenized together, sorted by length and run in as few
+        padded forward passes as fit in max_batch_tokens (padded tokens), so
+        a short query batched with a long advisory is not padded to 256.
+        """
+        enc = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        ids, mask = enc["input_ids"], enc["attention_mask"]
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        order = np.argsort(lengths, kind="stable")
+
+        out = np.empty((len(ids), len(self.labels)), dtype=np.float32)
+        start = 0
+        while start < len(order):
+            end = start + 1
+            # sorted ascending, so the last row sets the padded width
+            while end < len(order) and lengths[order[end]] * (end - start + 1) <= self.max_batch_tokens:
+                end += 1
+            rows = order[start:end]
+            batch = self.tokenizer.pad({"input_ids": [ids[i] for i in rows],
+                                        "attention_mask": [mask[i] for i in rows]}, return_tensors="pt")
+            with self.torch.inference_mode():
+                logits = self.model(**batch).logits
+            out[rows] = self.torch.softmax(logits.float(), dim=-1).numpy()
+            start = end
+        return out
+
+
+class LatencyStats:
+    """Rolling latency window plus batch-size histogram."""
+
+    def __init__(self, window=10_000):
+        self.latencies_ms = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.batches = 0
+        self.started = time.time()
+
+    def record_batch(self, size: int, latencies_ms) -> None:
+        self.batches += 1
+        self.requests += size
+        self.batch_sizes[size] += 1
+        self.latencies_ms.extend(latencies_ms)
+
+    def snapshot(self) -> dict:
+        lat = np.fromiter(self.latencies_ms, dtype=np.float64)
+        pct = {f"p{q}": round(float(np.percentile(lat, q)), 2) for q in (50, 90, 99)} if lat.size else {}
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "latency_ms": pct,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+
+class MicroBatcher:
+    """
+    Collects single-text requests into batches for predict_fn(list[str]) -> array.
+
+    predict_fn runs on one worker thread, so forward passes never overlap and
+    torch keeps its intra-op threads for the batch itself.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=10.0, stats=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = stats or LatencyStats()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forward")
+        self.queue = None
+        self.worker = None
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.worker:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue one text and wait for its probability row."""
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _, _ in batch]
+            try:
+                probs = await loop.run_in_executor(self.executor, self.predict_fn, texts)
+            except Exception as exc:  # fail the whole batch, keep serving
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            done = time.perf_counter()
+            for (_, fut, t0), row in zip(batch, probs):
+                if not fut.done():
+                    fut.set_result(row)
+            self.stats.record_batch(len(batch), [(done - t0) * 1000.0 for _, _, t0 in batch])
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+MAX_BODY = 4 << 20
+
+
+class InferenceServer:
+    """Minimal HTTP/1.1 (keep-alive) front end over a MicroBatcher."""
+
+    def __init__(self, classifier: AdvisoryClassifier, batcher: MicroBatcher):
+        self.classifier = classifier
+        self.batcher = batcher
+
+    async def predict(self, payload) -> dict:
+        if isinstance(payload, dict) and isinstance(payload.get("text"), str):
+            texts = [payload["text"]]
+        elif isinstance(payload, dict) and isinstance(payload.get("texts"), list) \
+                and all(isinstance(t, str) for t in payload["texts"]):
+            texts = payload["texts"]
+        else:
+            raise ValueError('expected {"text": str} or {"texts": [str, ...]}')
+        rows = await asyncio.gather(*(self.batcher.submit(t) for t in texts))
+        labels = self.classifier.labels
+        return {"predictions": [
+            {"label": labels[int(np.argmax(row))],
+             "probs": {lab: round(float(p), 6) for lab, p in zip(labels, row)}}
+            for row in rows
+        ]}
+
+    async def route(self, method: str, path: str, body: bytes):
+        if path == "/predict":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                return 200, await self.predict(json.loads(body or b"null"))
+            except ValueError as exc:
+                return 400, {"error": str(exc)}
+        if path == "/metrics" and method == "GET":
+            return 200, self.batcher.stats.snapshot()
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "labels": self.classifier.labels}
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY:
+                    status, result = 413, {"error": "body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, result = await self.route(method, target.split("?", 1)[0], body)
+                    except Exception as exc:
+                        status, result = 500, {"error": repr(exc)}
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                payload = json.dumps(result).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args) -> None:
+    classifier = AdvisoryClassifier(args.model, max_length=args.max_length,
+                                    max_batch_tokens=args.max_batch_tokens, num_threads=args.threads)
+    batcher = MicroBatcher(classifier.predict_proba, args.max_batch_size, args.max_wait_ms)
+    await batcher.start()
+    classifier.predict_proba(["warm up"])
+    server = await asyncio.start_server(InferenceServer(classifier, batcher).handle, args.host, args.port)
+    print(f"[INFO] serving {args.model} on http://{args.host}:{args.port} "
+          f"(max_batch_size={args.max_batch_size}, max_wait_ms={args.max_wait_ms})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve the advisory classifier with dynamic batching.")
+    ap.add_argument("--model", default=DEFAULT_MODEL, help="checkpoint directory (model + tokenizer)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--max-batch-size", type=int, default=32)
+    ap.add_argument("--max-wait-ms", type=float, default=10.0)
+    ap.add_argument("--max-length", type=int, default=256)
+    ap.add_argument("--max-batch-tokens", type=int, default=8192, help="padded tokens per forward pass")
+    ap.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# bucketing.py
+"""
+Length-bucketed batching for sentiment.py.
+
+With random batches every advisory is padded to the longest one in its batch,
+and advisory lengths range from a few dozen to 256 tokens, so most of the
+compute goes to pad tokens. The batch samplers here group similar lengths:
+
+    LengthGroupedBatchSampler  shuffle, cut into mega-batches of mega_mult * batch_size,
+                               sort each mega-batch by length, slice fixed-size batches,
+                               then shuffle the batch order
+    TokenBudgetBatchSampler    same grouping, but a batch grows while
+                               (longest length x rows) stays within max_tokens
+
+Evaluation and test use the same packing over a length-sorted order without
+shuffling. Predictions then come back in that order together with their
+label_ids, so metrics are unaffected, but row i of trainer.predict() is not
+dataset row i.
+
+BucketedTrainer plugs the samplers into the train/eval/test loaders.
+padding_report() compares the pad ratio of plain random batches with the
+chosen mode, epoch_time_report() estimates the train epoch time of both from
+a few timed steps, and EpochTimer logs wall time per epoch.
+"""
+import time
+
+import numpy as np
+from torch.utils.data import DataLoader, Sampler
+from transformers import Trainer, TrainerCallback
+
+
+def sequence_lengths(dataset) -> np.ndarray:
+    """Token count per row of a tokenized datasets.Dataset."""
+    ids = dataset.with_format(None)["input_ids"]
+    return np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+
+
+def _pack_fixed(order, batch_size):
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def _pack_tokens(order, lengths, max_tokens):
+    """Greedy packing of a length-sorted (descending) order under a padded-token budget."""
+    batches, start = [], 0
+    while start < len(order):
+        width = lengths[order[start]]   # longest row of the batch comes first
+        rows = max(1, max_tokens // max(int(width), 1))
+        batches.append(order[start:start + rows])
+        start += rows
+    return batches
+
+
+class _BucketedBatchSampler(Sampler):
+    """Shared mega-batch logic; subclasses decide how a sorted mega-batch is cut into batches."""
+
+    def __init__(self, lengths, mega_size, shuffle=True, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.mega_size = max(1, int(mega_size))
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._plan = None
+
+    def _cut(self, order):
+        raise NotImplementedError
+
+    def set_epoch(self, epoch: int) -> None:
+        if epoch != self.epoch:
+            self.epoch, self._plan = epoch, None
+
+    def plan(self) -> list:
+        """Batches (lists of row indices) for the current epoch."""
+        if self._plan is not None:
+            return self._plan
+        n = len(self.lengths)
+        if not self.shuffle:
+            order = np.argsort(-self.lengths, kind="stable")
+            batches = self._cut(order)
+        else:
+            rng = np.random.default_rng(self.seed + self.epoch)
+            perm = rng.permutation(n)
+            batches = []
+            for i in range(0, n, self.mega_size):
+                mega = perm[i:i + self.mega_size]
+                mega = mega[np.argsort(-self.lengths[mega], kind="stable")]
+                batches.extend(self._cut(mega))
+            # keep the longest batch first so an out-of-memory shows up on step one
+            longest = int(np.argmax([self.lengths[b].max() * len(b) for b in batches]))
+            first = batches.pop(longest)
+            rng.shuffle(batches)
+            batches.insert(0, first)
+        self._plan = [b.tolist() for b in batches]
+        return self._plan
+
+    def __iter__(self):
+        batches = self.plan()
+        if self.shuffle:
+            self.set_epoch(self.epoch + 1)   # reshuffle on the next pass even if nobody calls set_epoch
+        yield from batches
+
+    def __len__(self) -> int:
+        return len(self.plan())
+
+
+class LengthGroupedBatchSampler(_BucketedBatchSampler):
+    """Fixed batch_size rows per batch, grouped by length within mega-batches."""
+
+    def __init__(self, lengths, batch_size, mega_mult=50, shuffle=True, seed=42):
+        super().__init__(lengths, batch_size * mega_mult, shuffle, seed)
+        self.batch_size = batch_size
+
+    def _cut(self, order):
+        return _pack_fixed(order, self.batch_size)
+
+
+class TokenBudgetBatchSampler(_BucketedBatchSampler):
+    """Variable-size batches holding at most max_tokens padded tokens each."""
+
+    def __init__(self, lengths, max_tokens=8192, mega_size=2048, shuffle=True, seed=42):
+        if max_tokens < int(np.max(lengths, initial=0)):
+            raise ValueError(f"max_tokens={max_tokens} is smaller than the longest sequence ({np.max(lengths)})")
+        super().__init__(lengths, mega_size, shuffle, seed)
+        self.max_tokens = max_tokens
+
+    def _cut(self, order):
+        return _pack_tokens(order, self.lengths, self.max_tokens)
+
+
+def make_batch_sampler(lengths, mode, batch_size, max_tokens=8192, mega_mult=50, shuffle=True, seed=42):
+    """mode: "length" (fixed rows per batch) or "tokens" (token budget)."""
+    if mode == "length":
+        return LengthGroupedBatchSampler(lengths, batch_size, mega_mult, shuffle, seed)
+    if mode == "tokens":
+        return TokenBudgetBatchSampler(lengths, max_tokens, batch_size * mega_mult, shuffle, seed)
+    raise ValueError(f"unknown bucketing mode {mode!r} (expected 'length' or 'tokens')")
+
+
+def padding_stats(lengths, batches) -> dict:
+    """Real vs padded tokens for a list of batches (each padded to its longest row)."""
+    lengths = np.asarray(lengths)
+    real = int(lengths.sum())
+    padded = int(sum(int(lengths[b].max()) * len(b) for b in batches if len(b)))
+    return {"batches": len(batches), "real_tokens": real, "padded_tokens": padded,
+            "pad_ratio": 1.0 - real / padded if padded else 0.0}
+
+
+def random_batches(n, batch_size, seed=42):
+    perm = np.random.default_rng(seed).permutation(n)
+    return [perm[i:i + batch_size] for i in range(0, n, batch_size)]
+
+
+def padding_report(lengths_by_split: dict, mode, batch_sizes: dict, max_tokens=8192, mega_mult=50, seed=42):
+    """Print pad ratio for random fixed-size batches vs the bucketed mode, per split."""
+    print(f"[INFO] padding ratio (pad tokens / padded tokens), random batches -> {mode}:")
+    for split, lengths in lengths_by_split.items():
+        bs = batch_sizes[split]
+        before = padding_stats(lengths, random_batches(len(lengths), bs, seed))
+        sampler = make_batch_sampler(lengths, mode, bs, max_tokens, mega_mult,
+                                     shuffle=(split == "train"), seed=seed)
+        after = padding_stats(lengths, sampler.plan())
+        saved = 1.0 - after["padded_tokens"] / before["padded_tokens"] if before["padded_tokens"] else 0.0
+        print(f"  {split:<10s} {before['pad_ratio']:6.1%} ({before['batches']} batches) -> "
+              f"{after['pad_ratio']:6.1%} ({after['batches']} batches), {saved:5.1%} fewer padded tokens")
+
+
+def _time_steps(model, collator, rows, batches):
+    """Seconds per forward + backward pass for each batch; weights are left untouched (no optimizer step)."""
+    import torch
+
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.train()
+    times = []
+    for b in batches:
+        cols = rows[[int(i) for i in b]]
+        features = [{k: cols[k][j] for k in cols} for j in range(len(b))]
+        batch = {k: v.to(device) for k, v in collator(features).items()}
+        t0 = time.perf_counter()
+        model(**batch).loss.backward()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    model.zero_grad(set_to_none=True)
+    model.train(was_training)
+    return np.array(times)
+
+
+def epoch_time_report(model, collator, dataset, mode, batch_size, max_tokens=8192, mega_mult=50,
+                      steps=20, seed=42):
+    """
+    Print the estimated training epoch time for random batches vs the bucketed mode.
+
+    Times forward + backward on `steps` batches sampled from each plan and
+    scales the mean to the plan's batch count. EpochTimer reports the real
+    epoch times of the run that follows.
+    """
+    lengths = sequence_lengths(dataset)
+    rows = dataset.with_format(None).select_columns(["input_ids", "attention_mask", "label"])
+    plans = {"random": random_batches(len(lengths), batch_size, seed),
+             mode: make_batch_sampler(lengths, mode, batch_size, max_tokens, mega_mult, seed=seed).plan()}
+    rng = np.random.default_rng(seed)
+    _time_steps(model, collator, rows, plans["random"][:1])   # warm-up
+    estimates = {}
+    for name, batches in plans.items():
+        picked = rng.choice(len(batches), min(steps, len(batches)), replace=False)
+        estimates[name] = _time_steps(model, collator, rows, [batches[i] for i in picked]).mean() * len(batches)
+    print(f"[INFO] estimated train epoch time ({steps} sampled steps each): "
+          f"random batches {estimates['random']:.1f}s -> {mode} {estimates[mode]:.1f}s "
+          f"(x{estimates['random'] / estimates[mode]:.2f})")
+    return estimates
+
+
+class EpochTimer(TrainerCallback):
+    """Logs and prints wall time per training epoch."""
+
+    def __init__(self):
+        self.times = []
+        self._t0 = None
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._t0 = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        if self._t0 is None:
+            return
+        self.times.append(time.perf_counter() - self._t0)
+        print(f"[INFO] epoch {len(self.times)} took {self.times[-1]:.1f}s")
+
+
+class BucketedTrainer(Trainer):
+    """
+    Trainer whose train/eval/test loaders use length-bucketed batch samplers.
+
+    bucketing: "off" (stock Trainer loaders), "length" or "tokens". With
+    "length" the per-device batch sizes from TrainingArguments are kept; with
+    "tokens" they only size the mega-batches and max_batch_tokens bounds each
+    batch.
+    """
+
+    def __init__(self, *args, bucketing="tokens", max_batch_tokens=8192, mega_mult=50, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucketing = bucketing
+        self.max_batch_tokens = max_batch_tokens
+        self.mega_mult = mega_mult
+
+    def _bucketed_loader(self, dataset, description, batch_size, shuffle):
+        lengths = sequence_lengths(dataset)
+        dataset = self._remove_unused_columns(dataset, description=description)
+        sampler = make_batch_sampler(lengths, self.bucketing, batch_size, self.max_batch_tokens,
+                                     self.mega_mult, shuffle=shuffle, seed=self.args.seed)
+        loader = DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(loader)
+
+    def get_train_dataloader(self):
+        if self.bucketing == "off":
+            return super().get_train_dataloader()
+        return self._bucketed_loader(self.train_dataset, "training", self._train_batch_size, shuffle=True)
+
+    def get_eval_dataloader(self, eval_dataset=None):
+        if self.bucketing == "off":
+            return super().get_eval_dataloader(eval_dataset)
+        if isinstance(eval_dataset, str):
+            eval_dataset = self.eval_dataset[eval_dataset]
+        dataset = eval_dataset if eval_dataset is not None else self.eval_dataset
+        return self._bucketed_loader(dataset, "evaluation", self.args.eval_batch_size, shuffle=False)
+
+    def get_test_dataloader(self, test_dataset):
+        if self.bucketing == "off":
+            return super().get_test_dataloader(test_dataset)
+        return self._bucketed_loader(test_dataset, "test", self.args.eval_batch_size, shuffle=False)
+
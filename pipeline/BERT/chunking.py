@@ -0,0 +1,287 @@
+# chunking.py
+"""
+Sliding-window encoding for advisories longer than max_length.
+
+sentiment.py truncates every advisory at 256 tokens, so the Level 4
+sub-region sections at the end of long advisories are never seen. Here each
+document is split into overlapping windows (return_overflowing_tokens with a
+stride). Windows from many documents are packed into shared batches under a
+padded-token budget (bucketing.TokenBudgetBatchSampler), and the per-window
+logits are reduced back to one row per document:
+
+    max        element-wise max over a document's windows (the most alarming section wins)
+    mean       average over windows
+    attention  softmax-weighted average, weights from a learned score on each window's [CLS] state
+
+Reductions use scatter/index_add over a window -> document index, so the
+cost is proportional to the total number of tokens, not documents x
+max_length.
+
+    python pipeline/BERT/chunking.py eval  --model models/BERT/best
+    python pipeline/BERT/chunking.py train --model models/BERT/best --out models/BERT/chunked --reducer max
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch import nn
+
+from bucketing import TokenBudgetBatchSampler
+from token_cache import read_column
+
+REDUCERS = ("max", "mean", "attention")
+ATTENTION_FILE = "window_attention.pt"
+HERE = Path(__file__).resolve().parent
+
+
+def encode_windows(tokenizer, texts, max_length=256, stride=64, overflow=True) -> dict:
+    """
+    Tokenize texts into overlapping windows of at most max_length tokens.
+
+    stride is the number of tokens shared by consecutive windows. Returns
+    input_ids / attention_mask per window, doc_ids (window -> text index)
+    and lengths (tokens per window). overflow=False keeps only the first
+    window, i.e. plain truncation as in sentiment.py.
+    """
+    if overflow:
+        enc = tokenizer(list(texts), truncation=True, max_length=max_length, stride=stride,
+                        return_overflowing_tokens=True)
+        doc_ids = np.asarray(enc["overflow_to_sample_mapping"], dtype=np.int64)
+    else:
+        enc = tokenizer(list(texts), truncation=True, max_length=max_length)
+        doc_ids = np.arange(len(texts), dtype=np.int64)
+    lengths = np.fromiter((len(x) for x in enc["input_ids"]), dtype=np.int64, count=len(doc_ids))
+    return {"input_ids": enc["input_ids"], "attention_mask": enc["attention_mask"],
+            "doc_ids": doc_ids, "lengths": lengths, "n_docs": len(texts)}
+
+
+def _pad(tokenizer, windows, rows, device):
+    batch = tokenizer.pad({"input_ids": [windows["input_ids"][i] for i in rows],
+                           "attention_mask": [windows["attention_mask"][i] for i in rows]},
+                          return_tensors="pt")
+    return {k: v.to(device) for k, v in batch.items()}
+
+
+def reduce_windows(logits, doc_ids, n_docs, reducer="max", scores=None):
+    """
+    Aggregate window logits (W, C) to document logits (n_docs, C).
+
+    doc_ids: LongTensor (W,) mapping each window to its document. scores:
+    (W,) attention scores, required for reducer="attention".
+    """
+    n_classes = logits.shape[1]
+    if reducer == "max":
+        index = doc_ids.unsqueeze(1).expand(-1, n_classes)
+        out = logits.new_full((n_docs, n_classes), float("-inf"))
+        return out.scatter_reduce(0, index, logits, reduce="amax", include_self=True)
+    if reducer == "mean":
+        sums = logits.new_zeros((n_docs, n_classes)).index_add(0, doc_ids, logits)
+        counts = torch.bincount(doc_ids, minlength=n_docs).clamp(min=1).to(logits.dtype)
+        return sums / counts.unsqueeze(1)
+    if reducer == "attention":
+        if scores is None:
+            raise ValueError("reducer='attention' needs per-window scores")
+        # softmax within each document: subtract the per-document max for stability
+        peak = scores.new_full((n_docs,), float("-inf")).scatter_reduce(
+            0, doc_ids, scores, reduce="amax", include_self=True)
+        e = torch.exp(scores - peak[doc_ids])
+        z = scores.new_zeros(n_docs).index_add(0, doc_ids, e)
+        weights = e / z[doc_ids]
+        return logits.new_zeros((n_docs, n_classes)).index_add(0, doc_ids, weights.unsqueeze(1) * logits)
+    raise ValueError(f"unknown reducer {reducer!r}; expected one of {REDUCERS}")
+
+
+class WindowAttention(nn.Module):
+    """Scores each window from its [CLS] hidden state; zero-initialised, so it starts as the mean."""
+
+    def __init__(self, hidden_size):
+        super().__init__()
+        self.score = nn.Linear(hidden_size, 1)
+        nn.init.zeros_(self.score.weight)
+        nn.init.zeros_(self.score.bias)
+
+    def forward(self, cls_states):
+        return self.score(cls_states).squeeze(-1)
+
+
+def load_attention(model_dir, hidden_size):
+    attention = WindowAttention(hidden_size)
+    path = Path(model_dir) / ATTENTION_FILE
+    if path.exists():
+        attention.load_state_dict(torch.load(path, map_location="cpu"))
+    else:
+        print(f"[WARN] {path} not found; attention reducer starts as a plain mean")
+    return attention
+
+
+def _window_forward(model, batch, attention):
+    out = model(**batch, output_hidden_states=attention is not None)
+    scores = attention(out.hidden_states[-1][:, 0]) if attention is not None else None
+    return out.logits, scores
+
+
+def predict_documents(model, tokenizer, texts, reducer="max", attention=None, max_length=256, stride=64,
+                      max_tokens=8192, overflow=True, device=None) -> np.ndarray:
+    """Document-level logits for texts; windows of all documents share length-packed batches."""
+    device = device or next(model.parameters()).device
+    windows = encode_windows(tokenizer, texts, max_length, stride, overflow)
+    if reducer == "attention" and attention is None:
+        attention = WindowAttention(model.config.hidden_size)
+    attention = attention.to(device).eval() if reducer == "attention" else None
+
+    n_windows = len(windows["doc_ids"])
+    logits = torch.empty((n_windows, model.config.num_labels))
+    scores = torch.empty(n_windows) if attention is not None else None
+    sampler = TokenBudgetBatchSampler(windows["lengths"], max_tokens, mega_size=n_windows, shuffle=False)
+    model.eval()
+    with torch.inference_mode():
+        for rows in sampler:
+            win_logits, win_scores = _window_forward(model, _pad(tokenizer, windows, rows, device), attention)
+            logits[rows] = win_logits.float().cpu()
+            if scores is not None:
+                scores[rows] = win_scores.float().cpu()
+        doc = reduce_windows(logits, torch.from_numpy(windows["doc_ids"]), windows["n_docs"], reducer, scores)
+    return doc.numpy()
+
+
+def document_batches(windows, max_tokens, shuffle=True, seed=42):
+    """
+    Group whole documents into training batches whose windows fit in max_tokens padded tokens.
+
+    Documents are sorted by window count (within shuffled mega-batches), so
+    one-window advisories train together and long ones share batches with
+    other long ones. A document that alone exceeds the budget gets its own batch.
+    """
+    doc_ids, lengths = windows["doc_ids"], windows["lengths"]
+    per_doc = np.bincount(doc_ids, minlength=windows["n_docs"])
+    width = np.zeros(windows["n_docs"], dtype=np.int64)
+    np.maximum.at(width, doc_ids, lengths)
+    starts = np.concatenate([[0], np.cumsum(per_doc)[:-1]])   # windows are contiguous per document
+
+    order = np.random.default_rng(seed).permutation(windows["n_docs"]) if shuffle else np.arange(windows["n_docs"])
+    mega = 64
+    batches = []
+    for i in range(0, len(order), mega):
+        chunk = order[i:i + mega]
+        chunk = chunk[np.argsort(-per_doc[chunk], kind="stable")]
+        cur, cur_windows, cur_width = [], 0, 0
+        for d in chunk:
+            w, wd = int(per_doc[d]), int(width[d])
+            if cur and (cur_windows + w) * max(cur_width, wd) > max_tokens:
+                batches.append(cur)
+                cur, cur_windows, cur_width = [], 0, 0
+            cur.append(int(d))
+            cur_windows += w
+            cur_width = max(cur_width, wd)
+        if cur:
+            batches.append(cur)
+    if shuffle:
+        np.random.default_rng(seed + 1).shuffle(batches)
+    return [(docs, np.concatenate([np.arange(starts[d], starts[d] + per_doc[d]) for d in docs]))
+            for docs in batches]
+
+
+def train_chunked(model, tokenizer, texts, labels, reducer="max", epochs=1, lr=2e-5, weight_decay=0.01,
+                  max_length=256, stride=64, max_tokens=8192, seed=42, device=None):
+    """
+    Fine-tune on document labels through the window reducer.
+
+    Every batch holds all windows of its documents, so the loss is taken on
+    the reduced document logits. Returns the WindowAttention module for
+    reducer="attention" (None otherwise).
+    """
+    from transformers import get_linear_schedule_with_warmup
+
+    torch.manual_seed(seed)
+    device = device or next(model.parameters()).device
+    windows = encode_windows(tokenizer, texts, max_length, stride)
+    labels = torch.as_tensor(np.asarray(labels), dtype=torch.long)
+    attention = WindowAttention(model.config.hidden_size).to(device) if reducer == "attention" else None
+
+    params = list(model.parameters()) + (list(attention.parameters()) if attention is not None else [])
+    optimizer = torch.optim.AdamW(params, lr=lr, weight_decay=weight_decay)
+    steps = epochs * len(document_batches(windows, max_tokens, shuffle=False))
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(0.06 * steps), steps)
+    print(f"[INFO] {len(texts)} documents -> {len(windows['doc_ids'])} windows "
+          f"({int(windows['lengths'].sum())} tokens), reducer={reducer}")
+
+    model.train()
+    for epoch in range(epochs):
+        t0, total, n = time.perf_counter(), 0.0, 0
+        for docs, rows in document_batches(windows, max_tokens, shuffle=True, seed=seed + epoch):
+            local = {d: i for i, d in enumerate(docs)}
+            doc_index = torch.as_tensor([local[d] for d in windows["doc_ids"][rows]], device=device)
+            win_logits, win_scores = _window_forward(model, _pad(tokenizer, windows, rows, device), attention)
+            doc_logits = reduce_windows(win_logits, doc_index, len(docs), reducer, win_scores)
+            loss = nn.functional.cross_entropy(doc_logits, labels[docs].to(device))
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(params, 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+            total += loss.item() * len(docs)
+            n += len(docs)
+        print(f"[INFO] epoch {epoch + 1}: loss {total / max(n, 1):.4f} ({time.perf_counter() - t0:.1f}s)")
+    model.eval()
+    return attention
+
+
+def load_labelled(csv_path, label2id):
+    """(texts, label ids) from a label,text CSV, mapping numeric labels through 'Level N' names."""
+    texts = read_column(csv_path, "text")
+    raw = read_column(csv_path, "label")
+    return texts, np.asarray([label2id[f"Level {v}"] if f"Level {v}" in label2id else label2id[v] for v in raw])
+
+
+def main():
+    from sklearn.metrics import accuracy_score, f1_score
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    ap = argparse.ArgumentParser(description="Sliding-window evaluation / training of the advisory classifier.")
+    ap.add_argument("cmd", choices=("eval", "train"))
+    ap.add_argument("--model", default="models/BERT/best")
+    ap.add_argument("--out", default="models/BERT/chunked", help="train: where to save the fine-tuned model")
+    ap.add_argument("--reducer", choices=REDUCERS, default="max")
+    ap.add_argument("--max-length", type=int, default=256)
+    ap.add_argument("--stride", type=int, default=64, help="tokens shared by consecutive windows")
+    ap.add_argument("--max-tokens", type=int, default=8192, help="padded tokens per batch")
+    ap.add_argument("--epochs", type=int, default=1)
+    ap.add_argument("--lr", type=float, default=2e-5)
+    ap.add_argument("--train-csv", default=str(HERE / "train.csv"))
+    ap.add_argument("--test-csv", default=str(HERE / "test.csv"))
+    args = ap.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model).eval()
+    label2id = model.config.label2id
+
+    if args.cmd == "train":
+        texts, labels = load_labelled(args.train_csv, label2id)
+        attention = train_chunked(model, tokenizer, texts, labels, args.reducer, args.epochs, args.lr,
+                                  max_length=args.max_length, stride=args.stride, max_tokens=args.max_tokens)
+        model.save_pretrained(args.out)
+        tokenizer.save_pretrained(args.out)
+        if attention is not None:
+            torch.save(attention.state_dict(), Path(args.out) / ATTENTION_FILE)
+        print(f"[OK] saved {args.out}")
+        return
+
+    texts, labels = load_labelled(args.test_csv, label2id)
+    n_tokens = int(encode_windows(tokenizer, texts, args.max_length, args.stride)["lengths"].sum())
+    print(f"[INFO] {len(texts)} test documents, {n_tokens} window tokens")
+    # "truncate" is the sentiment.py setting: first max_length tokens only
+    runs = [("truncate", None)] + [(f"windows/{r}", r) for r in REDUCERS]
+    for name, reducer in runs:
+        t0 = time.perf_counter()
+        attention = load_attention(args.model, model.config.hidden_size) if reducer == "attention" else None
+        logits = predict_documents(model, tokenizer, texts, reducer or "max", attention, args.max_length,
+                                   args.stride, args.max_tokens, overflow=reducer is not None)
+        pred = logits.argmax(1)
+        print(f"[EVAL] {name:<18s} acc {accuracy_score(labels, pred):.4f}  "
+              f"f1 {f1_score(labels, pred, average='weighted'):.4f}  {time.perf_counter() - t0:6.1f}s")
+
+
+if __name__ == "__main__":
+    main()
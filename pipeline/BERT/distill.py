@@ -0,0 +1,216 @@
+# distill.py
+"""
+Distil the fine-tuned advisory classifier into a smaller student for CPU serving.
+
+    python pipeline/BERT/distill.py --teacher models/BERT/best --out models/BERT/student \
+        --layers 4 --hidden 384
+
+The student is the same architecture class as the teacher with fewer layers
+and a narrower hidden size. It is initialised by slicing teacher weights:
+student layer i copies an evenly spaced teacher layer, and every matrix keeps
+its leading rows/columns (whole attention heads, the first hidden units and
+the first intermediate units). It is trained on train.csv against
+
+    alpha * T^2 * KL(softmax(teacher / T) || softmax(student / T)) + (1 - alpha) * CE(student, label)
+
+with the teacher's logits computed once up front. The student is saved with
+save_pretrained plus the tokenizer, so it loads exactly like the teacher
+(AutoModelForSequenceClassification / backend/inference_server.py --model).
+Test accuracy/F1 and throughput of teacher and student are printed side by side.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from torch import nn
+
+from bucketing import BucketedTrainer, EpochTimer
+from chunking import predict_documents
+from token_cache import read_column
+
+HERE = Path(__file__).resolve().parent
+DATA_FILES = {"train": str(HERE / "train.csv"), "test": str(HERE / "test.csv")}
+TEACHER = "models/BERT/best"
+STUDENT = "models/BERT/student"
+MAX_LENGTH = 256
+SEED = 42
+
+
+def student_config(teacher_config, num_layers, hidden_size):
+    """Teacher config with fewer layers / narrower hidden size; head size and FFN ratio are kept."""
+    head_dim = teacher_config.hidden_size // teacher_config.num_attention_heads
+    if hidden_size % head_dim:
+        raise ValueError(f"hidden size {hidden_size} must be a multiple of the head size {head_dim}")
+    config = teacher_config.__class__.from_dict(teacher_config.to_dict())
+    ffn_ratio = teacher_config.intermediate_size // teacher_config.hidden_size
+    config.num_hidden_layers = num_layers
+    config.hidden_size = hidden_size
+    config.num_attention_heads = hidden_size // head_dim
+    config.intermediate_size = hidden_size * ffn_ratio
+    return config
+
+
+def layer_map(n_teacher, n_student) -> list:
+    """Evenly spaced teacher layers, always including the last one."""
+    return [round((i + 1) * n_teacher / n_student) - 1 for i in range(n_student)]
+
+
+def build_student(teacher, num_layers=4, hidden_size=384):
+    """Student of the teacher's class initialised from sliced teacher weights."""
+    config = student_config(teacher.config, num_layers, hidden_size)
+    student = teacher.__class__(config)
+    mapping = layer_map(teacher.config.num_hidden_layers, num_layers)
+    t_state = teacher.state_dict()
+    prefix = ".layer."
+
+    new_state = {}
+    for name, s_param in student.state_dict().items():
+        t_name = name
+        if prefix in name:   # encoder.layer.<i>. -> the mapped teacher layer
+            head, rest = name.split(prefix, 1)
+            idx, tail = rest.split(".", 1)
+            t_name = f"{head}{prefix}{mapping[int(idx)]}.{tail}"
+        t_param = t_state[t_name]
+        # leading slice along every dim: whole heads, first hidden / intermediate units
+        new_state[name] = t_param[tuple(slice(0, n) for n in s_param.shape)].clone()
+    student.load_state_dict(new_state)
+    print(f"[INFO] student: {num_layers} layers (teacher layers {mapping}), hidden {hidden_size}, "
+          f"{config.num_attention_heads} heads, {sum(p.numel() for p in student.parameters()) / 1e6:.1f}M params "
+          f"(teacher {sum(p.numel() for p in teacher.parameters()) / 1e6:.1f}M)")
+    return student
+
+
+class DistillationTrainer(BucketedTrainer):
+    """Trainer whose loss mixes KL to the teacher's soft logits with CE on the labels."""
+
+    def __init__(self, *args, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        teacher_logits = inputs.pop("teacher_logits", None)
+        labels = inputs.pop("labels")
+        outputs = model(**inputs)
+        logits = outputs.logits
+        loss = nn.functional.cross_entropy(logits, labels)
+        if teacher_logits is not None:
+            t = self.temperature
+            kd = nn.functional.kl_div(nn.functional.log_softmax(logits / t, dim=-1),
+                                      nn.functional.softmax(teacher_logits.to(logits.dtype) / t, dim=-1),
+                                      reduction="batchmean") * t * t
+            loss = self.alpha * kd + (1.0 - self.alpha) * loss
+        return (loss, outputs) if return_outputs else loss
+
+
+def load_split(path, label2id):
+    texts = read_column(path, "text")
+    labels = [label2id[f"Level {v}"] if f"Level {v}" in label2id else label2id[v] for v in read_column(path, "label")]
+    return texts, np.asarray(labels)
+
+
+def score(model, tokenizer, texts, labels, max_length=MAX_LENGTH) -> dict:
+    """Accuracy / weighted F1 / throughput on texts (truncated, length-packed batches)."""
+    from sklearn.metrics import accuracy_score, f1_score
+
+    t0 = time.perf_counter()
+    logits = predict_documents(model, tokenizer, texts, "max", max_length=max_length, overflow=False)
+    elapsed = time.perf_counter() - t0
+    pred = logits.argmax(1)
+    return {"accuracy": accuracy_score(labels, pred), "f1": f1_score(labels, pred, average="weighted"),
+            "seq_per_s": len(texts) / elapsed, "params_m": sum(p.numel() for p in model.parameters()) / 1e6}
+
+
+def main():
+    from datasets import Dataset
+    from transformers import (AutoModelForSequenceClassification, AutoTokenizer, DataCollatorWithPadding,
+                              TrainingArguments)
+
+    ap = argparse.ArgumentParser(description="Teacher -> student distillation of the advisory classifier.")
+    ap.add_argument("--teacher", default=TEACHER)
+    ap.add_argument("--out", default=STUDENT)
+    ap.add_argument("--layers", type=int, default=4)
+    ap.add_argument("--hidden", type=int, default=384)
+    ap.add_argument("--temperature", type=float, default=2.0)
+    ap.add_argument("--alpha", type=float, default=0.5, help="weight of the KL term (1 - alpha for CE)")
+    ap.add_argument("--epochs", type=float, default=5)
+    ap.add_argument("--lr", type=float, default=1e-4)
+    ap.add_argument("--max-batch-tokens", type=int, default=8192)
+    args = ap.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.teacher).eval()
+    label2id = teacher.config.label2id
+    train_texts, train_labels = load_split(DATA_FILES["train"], label2id)
+    test_texts, test_labels = load_split(DATA_FILES["test"], label2id)
+
+    # soft targets: one teacher pass over train.csv
+    t0 = time.perf_counter()
+    teacher_logits = predict_documents(teacher, tokenizer, train_texts, "max", max_length=MAX_LENGTH,
+                                       overflow=False, max_tokens=args.max_batch_tokens)
+    print(f"[INFO] teacher logits for {len(train_texts)} rows in {time.perf_counter() - t0:.1f}s")
+
+    enc = tokenizer(train_texts, truncation=True, max_length=MAX_LENGTH)
+    data = Dataset.from_dict({"input_ids": enc["input_ids"], "attention_mask": enc["attention_mask"],
+                              "label": train_labels.tolist(), "teacher_logits": teacher_logits.tolist()})
+    split = data.train_test_split(test_size=0.1, seed=SEED)
+
+    student = build_student(teacher, args.layers, args.hidden)
+    training_args = TrainingArguments(
+        output_dir="./results/distill",
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        save_total_limit=1,
+        load_best_model_at_end=True,
+        metric_for_best_model="f1",
+        greater_is_better=True,
+        per_device_train_batch_size=16,
+        per_device_eval_batch_size=32,
+        learning_rate=args.lr,
+        num_train_epochs=args.epochs,
+        weight_decay=0.01,
+        seed=SEED,
+        remove_unused_columns=False,   # keep teacher_logits for compute_loss
+        report_to="none",
+    )
+
+    def compute_metrics(eval_pred):
+        from sklearn.metrics import accuracy_score, f1_score
+
+        logits, labels = eval_pred
+        preds = np.argmax(logits, axis=1)
+        return {"accuracy": accuracy_score(labels, preds), "f1": f1_score(labels, preds, average="weighted")}
+
+    epoch_timer = EpochTimer()
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=split["train"],
+        eval_dataset=split["test"],
+        processing_class=tokenizer,
+        data_collator=DataCollatorWithPadding(tokenizer=tokenizer),
+        compute_metrics=compute_metrics,
+        callbacks=[epoch_timer],
+        bucketing="tokens",
+        max_batch_tokens=args.max_batch_tokens,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    trainer.train()
+    print(f"[INFO] epoch wall times: {[round(t, 1) for t in epoch_timer.times]}")
+    trainer.save_model(args.out)   # best checkpoint (load_best_model_at_end) + tokenizer
+    print(f"[OK] saved student to {args.out}")
+
+    student = AutoModelForSequenceClassification.from_pretrained(args.out).eval()
+    rows = [("teacher", score(teacher, tokenizer, test_texts, test_labels)),
+            ("student", score(student, tokenizer, test_texts, test_labels))]
+    print(f"{'model':<8s} {'params':>8s} {'acc':>7s} {'f1':>7s} {'seq/s':>8s}")
+    for name, r in rows:
+        print(f"{name:<8s} {r['params_m']:7.1f}M {r['accuracy']:7.4f} {r['f1']:7.4f} {r['seq_per_s']:8.1f}")
+    print(f"[INFO] student is x{rows[1][1]['seq_per_s'] / rows[0][1]['seq_per_s']:.1f} faster, "
+          f"F1 {rows[1][1]['f1'] - rows[0][1]['f1']:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+# embedding_store.py
+"""
+Memory-mapped store of advisory embeddings for "which past advisories look like this one?".
+
+Every advisory from train.csv / test.csv and from the Wayback snapshots
+(wayback/wayback_to_csv.py INPUT_URLS) is encoded once with the fine-tuned
+encoder and kept on disk:
+
+    models/BERT/embeddings/
+        embeddings.f16   float16 rows (count x dim), L2-normalised, opened with np.memmap
+        meta.csv         id,country,date,level,source,key   (row id -> advisory)
+        manifest.json    model fingerprint, dim, count, processed sources, IVF state
+        ivf.npz          optional coarse partition: centroids + list id per row
+
+An embedding is the mean over the advisory's sliding windows (chunking.py) of
+the mean-pooled last hidden state, so long advisories are covered end to
+end. Rows are normalised before storage, so cosine similarity is a dot
+product.
+
+Appends are incremental: advisories whose (level, text) hash is already in
+meta.csv are not re-encoded, and snapshot URLs listed in the manifest are
+not re-parsed. The manifest is written last, and its count is the source of
+truth: rows past it in embeddings.f16, meta.csv and ivf.npz from an
+interrupted append are cut off on the next open.
+
+search() scans the matrix in chunks with a running top-k (argpartition per
+chunk), so memory stays bounded by chunk_rows x queries. Past IVF_THRESHOLD
+rows an IVF partition is built (spherical k-means over a sample), and a query
+scans only the rows of its n_probe closest lists.
+
+    python pipeline/BERT/embedding_store.py update --model models/BERT/best
+    python pipeline/BERT/embedding_store.py query --text "do not travel due to armed conflict" -k 5
+    python pipeline/BERT/embedding_store.py bench --rows 1000000
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from token_cache import model_fingerprint, read_column
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE / "wayback"))
+from dedup_index import advisory_key   # same key as the Wayback CSV's dedup index
+STORE_DIR = "models/BERT/embeddings"
+DEFAULT_MODEL = "models/BERT/best"
+DATA_FILES = {"train": str(HERE / "train.csv"), "test": str(HERE / "test.csv")}
+
+EMB_NAME = "embeddings.f16"
+META_NAME = "meta.csv"
+MANIFEST_NAME = "manifest.json"
+IVF_NAME = "ivf.npz"
+META_FIELDS = ["id", "country", "date", "level", "source", "key"]
+
+IVF_THRESHOLD = 1_000_000   # rows before search switches to the IVF partition
+CHUNK_ROWS = 65536
+
+# "... precautions in Bhutan.", "... do not travel to haiti due to ..."
+COUNTRY_PATTERN = re.compile(
+    r"(?:precautions|caution|reconsider travel|do not travel)\s+(?:in|to|when traveling to)\s+"
+    r"([a-z][\w .,'’()-]*?)(?=\s+(?:due|because)\b|[.;:]|,\s|$)",
+    re.IGNORECASE,
+)
+# https://web.archive.org/web/20190621071528/https://...
+SNAPSHOT_DATE = re.compile(r"/web/(\d{4})(\d{2})(\d{2})\d*/")
+
+
+def country_from_text(text: str) -> str:
+    m = COUNTRY_PATTERN.search(text)
+    return m.group(1).strip().title() if m else ""
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _merge_topk(best_s, best_i, scores, ids, k):
+    """Keep the k highest of (best, new) per query row."""
+    s = np.concatenate([best_s, scores], axis=1)
+    i = np.concatenate([best_i, np.broadcast_to(ids, scores.shape)], axis=1)
+    if s.shape[1] > k:
+        part = np.argpartition(-s, k - 1, axis=1)[:, :k]
+        s, i = np.take_along_axis(s, part, 1), np.take_along_axis(i, part, 1)
+    return s, i
+
+
+def _sorted_topk(s, i):
+    order = np.argsort(-s, axis=1, kind="stable")
+    return np.take_along_axis(s, order, 1), np.take_along_axis(i, order, 1)
+
+
+def brute_force_topk(matrix, queries, k=10, chunk_rows=CHUNK_ROWS):
+    """Top-k rows of matrix by dot product for each (normalised) query, scanning chunk_rows at a time."""
+    n_q = len(queries)
+    best_s = np.empty((n_q, 0), np.float32)
+    best_i = np.empty((n_q, 0), np.int64)
+    for start in range(0, len(matrix), chunk_rows):
+        block = np.asarray(matrix[start:start + chunk_rows], dtype=np.float32)
+        scores = queries @ block.T
+        ids = np.arange(start, start + len(block), dtype=np.int64)
+        best_s, best_i = _merge_topk(best_s, best_i, scores, ids, k)
+    return _sorted_topk(best_s, best_i)
+
+
+def spherical_kmeans(x, n_lists, iters=10, seed=42):
+    """Centroids (n_lists x dim, unit norm) maximising dot product with their members."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), n_lists, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=n_lists) == 0
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]   # reseed empty lists
+        centroids = _normalize(sums)
+    return centroids
+
+
+def assign_lists(matrix, centroids, chunk_rows=CHUNK_ROWS) -> np.ndarray:
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), chunk_rows):
+        block = np.asarray(matrix[start:start + chunk_rows], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Coarse partition: rows grouped by nearest centroid, queries scan their n_probe closest lists."""
+
+    def __init__(self, centroids, assign):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assign = np.asarray(assign, dtype=np.int32)
+        self.order = np.argsort(self.assign, kind="stable")
+        self.offsets = np.searchsorted(self.assign[self.order], np.arange(len(self.centroids) + 1))
+
+    @classmethod
+    def train(cls, matrix, n_lists=None, sample=100_000, seed=42):
+        n = len(matrix)
+        n_lists = n_lists or max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(n, min(n, max(sample, n_lists)), replace=False))
+        centroids = spherical_kmeans(np.asarray(matrix[rows], dtype=np.float32), n_lists, seed=seed)
+        return cls(centroids, assign_lists(matrix, centroids))
+
+    def extend(self, matrix, start):
+        """Assign rows matrix[start:] appended after the partition was built."""
+        new = assign_lists(matrix[start:], self.centroids)
+        self.__init__(self.centroids, np.concatenate([self.assign, new]))
+
+    def search(self, matrix, queries, k=10, n_probe=16):
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        out_s = np.full((len(queries), k), -np.inf, np.float32)
+        out_i = np.full((len(queries), k), -1, np.int64)
+        for q, lists in enumerate(probes):
+            ids = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            if not len(ids):
+                continue
+            ids.sort()   # ascending row order keeps the memmap reads sequential
+            s, i = brute_force_topk(matrix[ids], queries[q:q + 1], k)
+            out_s[q, :s.shape[1]], out_i[q, :s.shape[1]] = s[0], ids[i[0]]
+        return out_s, out_i
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, assign=self.assign)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["centroids"], f["assign"])
+
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix with a row -> advisory sidecar."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.manifest = {}
+        self.meta = []
+        self.keys = set()
+        self.ivf = None
+        if (self.root / MANIFEST_NAME).exists():
+            self.manifest = json.loads((self.root / MANIFEST_NAME).read_text(encoding="utf-8"))
+        if self.root.exists():
+            self._repair()
+            self.keys = {row["key"] for row in self.meta}
+            if self.manifest.get("ivf") and (self.root / IVF_NAME).exists():
+                self.ivf = IVFIndex.load(self.root / IVF_NAME)
+                if len(self.ivf.assign) > self.count:     # saved by an append whose manifest never landed
+                    self.ivf = IVFIndex(self.ivf.centroids, self.ivf.assign[:self.count])
+
+    @property
+    def count(self) -> int:
+        return int(self.manifest.get("count", 0))
+
+    @property
+    def dim(self) -> int:
+        return int(self.manifest.get("dim", 0))
+
+    def _repair(self):
+        """Drop rows written after the last manifest update (interrupted append) from the matrix and meta.csv."""
+        emb = self.root / EMB_NAME
+        expected = self.count * self.dim * 2
+        if emb.exists() and emb.stat().st_size > expected:
+            with emb.open("r+b") as f:
+                f.truncate(expected)
+            print(f"[WARN] truncated {emb} to {self.count} rows (interrupted append)")
+        if (self.root / META_NAME).exists():
+            with (self.root / META_NAME).open(encoding="utf-8", newline="") as f:
+                self.meta = list(csv.DictReader(f))
+            if len(self.meta) > self.count:
+                del self.meta[self.count:]
+                self._write_meta()
+                print(f"[WARN] truncated {self.root / META_NAME} to {self.count} rows (interrupted append)")
+
+    def _write_meta(self):
+        tmp = self.root / f".{META_NAME}.tmp"
+        with tmp.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=META_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.meta)
+        os.replace(tmp, self.root / META_NAME)
+
+    def matrix(self) -> np.ndarray:
+        """The embeddings as a read-only (count x dim) float16 memmap."""
+        if not self.count:
+            return np.empty((0, self.dim), dtype=np.float16)
+        return np.memmap(self.root / EMB_NAME, dtype=np.float16, mode="r", shape=(self.count, self.dim))
+
+    def _write_manifest(self):
+        tmp = self.root / f".{MANIFEST_NAME}.tmp"
+        tmp.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        os.replace(tmp, self.root / MANIFEST_NAME)
+
+    def append(self, vectors, records, model_id):
+        """Append vectors (normalised here) with their records (country, date, level, source, key)."""
+        vectors = _normalize(vectors).astype(np.float16)
+        if self.manifest and self.manifest["model"] != model_id:
+            raise ValueError(f"store {self.root} was built with model {self.manifest['model']}, not {model_id}; "
+                             "rebuild it with --rebuild")
+        if self.dim and vectors.shape[1] != self.dim:
+            raise ValueError(f"dimension mismatch: store has {self.dim}, got {vectors.shape[1]}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        start = self.count
+
+        with (self.root / EMB_NAME).open("ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        new_meta = not (self.root / META_NAME).exists() or not self.meta
+        rows = [{"id": start + j, **{k: r.get(k, "") for k in META_FIELDS[1:]}} for j, r in enumerate(records)]
+        with (self.root / META_NAME).open("w" if new_meta else "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=META_FIELDS)
+            if new_meta:
+                writer.writeheader()
+            writer.writerows(rows)
+
+        self.meta.extend({k: str(v) for k, v in row.items()} for row in rows)
+        self.keys.update(r["key"] for r in rows)
+        self.manifest.update(model=model_id, dim=int(vectors.shape[1]), count=start + len(rows), dtype="float16")
+
+        if self.ivf is not None:
+            self.ivf.extend(self.matrix(), start)
+        elif self.count >= IVF_THRESHOLD:
+            print(f"[INFO] {self.count} rows >= {IVF_THRESHOLD}; building IVF partition")
+            self.ivf = IVFIndex.train(self.matrix())
+        if self.ivf is not None:
+            self.ivf.save(self.root / IVF_NAME)
+            self.manifest["ivf"] = {"lists": len(self.ivf.centroids), "rows": len(self.ivf.assign)}
+        self._write_manifest()
+        return len(rows)
+
+    def mark_sources(self, sources, model_id):
+        """Record snapshot URLs as embedded so later updates skip them."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest.setdefault("model", model_id)
+        self.manifest["sources"] = sorted(set(self.manifest.get("sources", [])) | set(sources))
+        self._write_manifest()
+
+    def build_ivf(self, n_lists=None):
+        self.ivf = IVFIndex.train(self.matrix(), n_lists)
+        self.ivf.save(self.root / IVF_NAME)
+        self.manifest["ivf"] = {"lists": len(self.ivf.centroids), "rows": len(self.ivf.assign)}
+        self._write_manifest()
+
+    def search(self, queries, k=10, n_probe=16, exact=False):
+        """
+        (scores, ids) of the k most similar rows per query, best first.
+
+        Uses the IVF partition when one exists unless exact=True; ids of -1 mark
+        empty slots when the probed lists hold fewer than k rows.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        k = min(k, self.count)
+        if not k:
+            return np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64)
+        if self.ivf is not None and not exact:
+            return self.ivf.search(self.matrix(), queries, k, n_probe)
+        return brute_force_topk(self.matrix(), queries, k)
+
+
+# ---------------------- encoding ----------------------
+
+def load_encoder(model_dir):
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir).eval()   # encoder of the classifier checkpoint
+    return model, tokenizer
+
+
+def encode(model, tokenizer, texts, max_length=256, stride=64, max_tokens=8192) -> np.ndarray:
+    """Mean-pooled last hidden state, averaged over each text's sliding windows."""
+    import torch
+
+    from bucketing import TokenBudgetBatchSampler
+    from chunking import _pad, encode_windows, reduce_windows
+
+    if not texts:
+        return np.empty((0, model.config.hidden_size), np.float32)
+    device = next(model.parameters()).device
+    windows = encode_windows(tokenizer, texts, max_length, stride, overflow=True)
+    pooled = torch.empty((len(windows["doc_ids"]), model.config.hidden_size))
+    sampler = TokenBudgetBatchSampler(windows["lengths"], max_tokens, mega_size=len(windows["doc_ids"]),
+                                      shuffle=False)
+    with torch.inference_mode():
+        for rows in sampler:
+            batch = _pad(tokenizer, windows, rows, device)
+            hidden = model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled[rows] = ((hidden * mask).sum(1) / mask.sum(1)).float().cpu()
+    doc = reduce_windows(pooled, torch.from_numpy(windows["doc_ids"]), windows["n_docs"], "mean")
+    return _normalize(doc.numpy())
+
+
+def csv_records(split, path):
+    """Advisories of a labelled CSV; country is parsed from the text, no snapshot date."""
+    for level, text in zip(read_column(path, "label"), read_column(path, "text")):
+        if text:
+            yield text, {"country": country_from_text(text), "date": "", "level": level,
+                         "source": split, "key": advisory_key(level, text, cleaned=True)}
+
+
+def snapshot_records(urls):
+    """(url, [(text, record), ...]) per Wayback snapshot, parsed as wayback_to_csv.py does."""
+    from snapshot_fetcher import fetch_snapshots
+    from wayback_to_csv import TITLE_PATTERN, extract_items, should_skip_short_advisory
+    from textnorm import clean_text_for_bert   # on sys.path via wayback_to_csv
+
+    for url, xml_path in fetch_snapshots(urls):
+        m = SNAPSHOT_DATE.search(url)
+        date = f"{m.group(1)}-{m.group(2)}-{m.group(3)}" if m else ""
+        items = []
+        for item in extract_items(xml_path):
+            title = TITLE_PATTERN.match(item["title"] or "")
+            if not title or not item["body_text"]:
+                continue
+            level = int(title.group("level"))
+            text = clean_text_for_bert(item["body_text"])
+            if should_skip_short_advisory(text, level):
+                continue
+            items.append((text, {"country": title.group("country").strip(), "date": date, "level": level,
+                                 "source": "wayback", "key": advisory_key(level, text, cleaned=True)}))
+        yield url, items
+
+
+def add_batch(store, model, tokenizer, model_id, items, sources=(), batch_rows=2048):
+    """Encode and append the items whose key is not in the store yet; returns rows added."""
+    fresh, seen = [], set()
+    for text, record in items:
+        if record["key"] not in store.keys and record["key"] not in seen:
+            seen.add(record["key"])
+            fresh.append((text, record))
+    added = 0
+    for i in range(0, len(fresh), batch_rows):
+        chunk = fresh[i:i + batch_rows]
+        vectors = encode(model, tokenizer, [t for t, _ in chunk])
+        added += store.append(vectors, [r for _, r in chunk], model_id)
+    if sources:
+        store.mark_sources(sources, model_id)
+    return added
+
+
+def update(store_dir, model_dir, snapshot_urls, rebuild=False):
+    store_dir = Path(store_dir)
+    if rebuild:
+        for name in (EMB_NAME, META_NAME, MANIFEST_NAME, IVF_NAME):
+            (store_dir / name).unlink(missing_ok=True)
+    store = EmbeddingStore(store_dir)
+    model_id = model_fingerprint(model_dir)
+    if store.manifest and store.manifest["model"] != model_id:
+        raise SystemExit(f"[ERROR] {store_dir} was built with another model ({store.manifest['model']}); "
+                         "pass --rebuild to re-encode everything")
+    model, tokenizer = load_encoder(model_dir)
+
+    t0 = time.perf_counter()
+    for split, path in DATA_FILES.items():
+        added = add_batch(store, model, tokenizer, model_id, csv_records(split, path))
+        print(f"[INFO] {split}: +{added} rows")
+    pending = [u for u in snapshot_urls if u not in store.manifest.get("sources", [])]
+    print(f"[INFO] {len(snapshot_urls) - len(pending)} snapshots already embedded, {len(pending)} new")
+    if pending:
+        for url, items in snapshot_records(pending):
+            added = add_batch(store, model, tokenizer, model_id, items, sources=[url])
+            print(f"[INFO] {url}: +{added} rows ({len(items)} advisories)")
+    print(f"[OK] {store.count} rows x {store.dim} in {store_dir} ({time.perf_counter() - t0:.1f}s)")
+
+
+def bench(rows, dim, queries, k, n_probe, seed=42):
+    """Brute-force vs IVF latency and recall@k on clustered synthetic rows."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((256, dim)))
+    matrix = np.empty((rows, dim), np.float16)
+    for start in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - start)
+        block = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)) / np.sqrt(dim)
+        matrix[start:start + n] = _normalize(block)
+    q = _normalize(np.asarray(matrix[rng.choice(rows, queries, replace=False)], np.float32)
+                   + 0.1 * rng.standard_normal((queries, dim)) / np.sqrt(dim))
+
+    t0 = time.perf_counter()
+    _, exact = brute_force_topk(matrix, q, k)
+    t_exact = (time.perf_counter() - t0) / queries
+    t0 = time.perf_counter()
+    index = IVFIndex.train(matrix)
+    t_train = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _, approx = index.search(matrix, q, k, n_probe)
+    t_ivf = (time.perf_counter() - t0) / queries
+    recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+    print(f"[INFO] {rows} rows x {dim} float16 ({matrix.nbytes / 1e6:.0f} MB), {queries} queries, k={k}")
+    print(f"  brute force  {t_exact * 1e3:8.1f} ms/query")
+    print(f"  IVF          {t_ivf * 1e3:8.1f} ms/query  ({len(index.centroids)} lists, n_probe={n_probe}, "
+          f"trained in {t_train:.1f}s, recall@{k} {recall:.3f}, x{t_exact / t_ivf:.1f})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Advisory embedding store with nearest-neighbour search.")
+    ap.add_argument("--store", default=STORE_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    up = sub.add_parser("update", help="encode advisories not yet in the store")
+    up.add_argument("--model", default=DEFAULT_MODEL)
+    up.add_argument("--no-wayback", action="store_true", help="only train.csv / test.csv")
+    up.add_argument("--rebuild", action="store_true", help="drop the store and re-encode everything")
+
+    q = sub.add_parser("query", help="most similar stored advisories")
+    q.add_argument("--model", default=DEFAULT_MODEL)
+    src = q.add_mutually_exclusive_group(required=True)
+    src.add_argument("--text")
+    src.add_argument("--id", type=int, help="use a stored row as the query")
+    q.add_argument("-k", type=int, default=10)
+    q.add_argument("--n-probe", type=int, default=16)
+    q.add_argument("--exact", action="store_true", help="ignore the IVF partition")
+
+    iv = sub.add_parser("ivf", help="(re)build the IVF partition now")
+    iv.add_argument("--lists", type=int, default=None)
+
+    b = sub.add_parser("bench", help="brute-force vs IVF on synthetic rows")
+    b.add_argument("--rows", type=int, default=1_000_000)
+    b.add_argument("--dim", type=int, default=768)
+    b.add_argument("--queries", type=int, default=20)
+    b.add_argument("-k", type=int, default=10)
+    b.add_argument("--n-probe", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.cmd == "update":
+        urls = []
+        if not args.no_wayback:
+            from wayback_to_csv import INPUT_URLS
+            urls = INPUT_URLS
+        update(args.store, args.model, urls, args.rebuild)
+    elif args.cmd == "query":
+        store = EmbeddingStore(args.store)
+        if not store.count:
+            raise SystemExit(f"[ERROR] {args.store} is empty; run the update command first")
+        if args.id is not None:
+            vec = np.asarray(store.matrix()[args.id], np.float32)
+        else:
+            model, tokenizer = load_encoder(args.model)
+            vec = encode(model, tokenizer, [args.text])
+        t0 = time.perf_counter()
+        scores, ids = store.search(vec, args.k, args.n_probe, args.exact)
+        print(f"[INFO] searched {store.count} rows in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+        for s, i in zip(scores[0], ids[0]):
+            if i < 0:
+                continue
+            row = store.meta[i]
+            print(f"  {s:6.3f}  #{i:<7d} L{row['level']}  {row['country'] or '?':<28s} {row['date'] or '-':<10s} "
+                  f"{row['source']}")
+    elif args.cmd == "ivf":
+        store = EmbeddingStore(args.store)
+        store.build_ivf(args.lists)
+        print(f"[OK] IVF with {len(store.ivf.centroids)} lists over {store.count} rows")
+    elif args.cmd == "bench":
+        bench(args.rows, args.dim, args.queries, args.k, args.n_probe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# evaluation.py
+"""
+Single-pass evaluation of a saved advisory classifier.
+
+    python pipeline/BERT/evaluation.py --model models/BERT/best --data pipeline/BERT/test.csv
+
+The held-out CSV is read and tokenized in chunks of --chunk-rows. Each chunk
+is packed into length-sorted batches under a padded-token budget
+(bucketing.TokenBudgetBatchSampler) and run through one forward pass per
+batch. Only a K x K confusion matrix is kept across batches, so memory does
+not grow with the size of the file. Everything is derived from it:
+
+    accuracy, weighted / macro F1 (binary F1 for two classes),
+    per-class precision / recall / F1 / support, the confusion matrix
+
+Throughput is reported as samples/sec end to end (read + tokenize +
+forward) and for the forward passes alone. Latency percentiles are taken over
+per-batch forward times, as total and per sample.
+
+The module is named evaluation.py, not evaluate.py, so it does not shadow
+the `evaluate` package for scripts run from this directory.
+"""
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_MODEL = "models/BERT/best"
+DEFAULT_DATA = str(HERE / "test.csv")
+MAX_LENGTH = 256
+CHUNK_ROWS = 4096
+
+
+class StreamingMetrics:
+    """Confusion-matrix accumulator; all metrics are computed from the matrix on demand."""
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        k = len(self.labels)
+        self.matrix = np.zeros((k, k), dtype=np.int64)
+
+    def update(self, y_true, y_pred) -> None:
+        k = len(self.labels)
+        idx = np.asarray(y_true, dtype=np.int64) * k + np.asarray(y_pred, dtype=np.int64)
+        self.matrix += np.bincount(idx, minlength=k * k).reshape(k, k)
+
+    @property
+    def count(self) -> int:
+        return int(self.matrix.sum())
+
+    def per_class(self) -> dict:
+        tp = np.diag(self.matrix).astype(np.float64)
+        support = self.matrix.sum(1).astype(np.float64)
+        predicted = self.matrix.sum(0).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, tp / predicted, 0.0)
+            recall = np.where(support > 0, tp / support, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return {"precision": precision, "recall": recall, "f1": f1, "support": support}
+
+    def compute(self) -> dict:
+        """accuracy and f1 (binary for two classes, else weighted) as in sentiment.py, plus macro/weighted F1."""
+        pc = self.per_class()
+        total = self.count
+        accuracy = float(np.trace(self.matrix) / total) if total else 0.0
+        weighted = float((pc["f1"] * pc["support"]).sum() / total) if total else 0.0
+        macro = float(pc["f1"].mean()) if len(pc["f1"]) else 0.0
+        f1 = float(pc["f1"][1]) if len(self.labels) == 2 else weighted
+        return {"accuracy": accuracy, "f1": f1, "f1_weighted": weighted, "f1_macro": macro}
+
+    def report(self) -> str:
+        """Per-class table in the layout of sklearn's classification_report."""
+        pc = self.per_class()
+        width = max(len("weighted avg"), *(len(str(n)) for n in self.labels))
+        lines = [f"{'':>{width}s} {'precision':>9s} {'recall':>9s} {'f1-score':>9s} {'support':>9s}", ""]
+        for i, name in enumerate(self.labels):
+            lines.append(f"{str(name):>{width}s} {pc['precision'][i]:9.2f} {pc['recall'][i]:9.2f} "
+                         f"{pc['f1'][i]:9.2f} {int(pc['support'][i]):9d}")
+        total = self.count
+        m = self.compute()
+        lines += ["", f"{'accuracy':>{width}s} {'':>9s} {'':>9s} {m['accuracy']:9.2f} {total:9d}"]
+        for name, weights in (("macro avg", np.ones_like(pc["support"])), ("weighted avg", pc["support"])):
+            norm = weights.sum() or 1.0
+            lines.append(f"{name:>{width}s} {(pc['precision'] * weights).sum() / norm:9.2f} "
+                         f"{(pc['recall'] * weights).sum() / norm:9.2f} {(pc['f1'] * weights).sum() / norm:9.2f} "
+                         f"{total:9d}")
+        return "\n".join(lines)
+
+
+class Timing:
+    """Per-batch forward times plus end-to-end wall time."""
+
+    def __init__(self):
+        self.batch_seconds = []
+        self.batch_rows = []
+        self.t0 = time.perf_counter()
+
+    def add(self, seconds, rows) -> None:
+        self.batch_seconds.append(seconds)
+        self.batch_rows.append(rows)
+
+    def summary(self) -> dict:
+        secs = np.asarray(self.batch_seconds)
+        rows = np.asarray(self.batch_rows)
+        wall = time.perf_counter() - self.t0
+        n = int(rows.sum())
+        if not len(secs):
+            return {"samples": 0, "wall_s": wall}
+        per_sample = secs / rows
+
+        def p(x, q):
+            return float(np.percentile(x, q) * 1e3)
+
+        return {
+            "samples": n, "batches": len(secs), "wall_s": wall,
+            "samples_per_s": n / wall if wall else 0.0,
+            "forward_samples_per_s": n / secs.sum() if secs.sum() else 0.0,
+            "batch_ms": {f"p{q}": p(secs, q) for q in (50, 90, 99)},
+            "per_sample_ms": {f"p{q}": p(per_sample, q) for q in (50, 90, 99)},
+        }
+
+
+def label_index(config, raw_labels) -> np.ndarray:
+    """Map CSV labels ("3" or "Level 3" or a class name) to the model's class ids."""
+    label2id = config.label2id
+    out = []
+    for v in raw_labels:
+        v = str(v).strip()
+        if f"Level {v}" in label2id:
+            out.append(label2id[f"Level {v}"])
+        elif v in label2id:
+            out.append(label2id[v])
+        else:
+            raise ValueError(f"label {v!r} is not one of the model's labels {list(label2id)}")
+    return np.asarray(out, dtype=np.int64)
+
+
+def iter_csv_chunks(path, chunk_rows=CHUNK_ROWS, text_col="text", label_col="label"):
+    """(texts, raw labels) chunks of a labelled CSV, read lazily."""
+    with Path(path).open(encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [c.strip() for c in next(reader)]
+        ti, li = header.index(text_col), header.index(label_col)
+        texts, labels = [], []
+        for row in reader:
+            if len(row) <= max(ti, li):
+                continue
+            texts.append(row[ti])
+            labels.append(row[li])
+            if len(texts) == chunk_rows:
+                yield texts, labels
+                texts, labels = [], []
+        if texts:
+            yield texts, labels
+
+
+def evaluate_encoded(model, tokenizer, chunks, metrics, timing, max_tokens=8192):
+    """
+    Run one forward pass per packed batch over chunks of (input_ids, attention_mask, labels).
+
+    input_ids / attention_mask are lists of token-id lists; labels are class ids.
+    """
+    import torch
+
+    from bucketing import TokenBudgetBatchSampler
+
+    device = next(model.parameters()).device
+    for ids, mask, labels in chunks:
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        labels = np.asarray(labels)
+        sampler = TokenBudgetBatchSampler(lengths, max_tokens, mega_size=len(ids), shuffle=False)
+        for rows in sampler:
+            batch = tokenizer.pad({"input_ids": [ids[i] for i in rows], "attention_mask": [mask[i] for i in rows]},
+                                  return_tensors="pt")
+            t0 = time.perf_counter()
+            with torch.inference_mode():
+                logits = model(**{k: v.to(device) for k, v in batch.items()}).logits
+            preds = logits.argmax(-1).cpu().numpy()
+            timing.add(time.perf_counter() - t0, len(rows))
+            metrics.update(labels[rows], preds)
+    return metrics, timing
+
+
+def csv_chunks(tokenizer, config, path, chunk_rows=CHUNK_ROWS, max_length=MAX_LENGTH, text_col="text"):
+    for texts, raw in iter_csv_chunks(path, chunk_rows, text_col):
+        enc = tokenizer(texts, truncation=True, max_length=max_length)
+        yield enc["input_ids"], enc["attention_mask"], label_index(config, raw)
+
+
+def dataset_chunks(dataset, chunk_rows=CHUNK_ROWS):
+    """Chunks of an already tokenized datasets.Dataset with input_ids / attention_mask / label."""
+    dataset = dataset.with_format(None)
+    for start in range(0, len(dataset), chunk_rows):
+        part = dataset[start:start + chunk_rows]
+        yield part["input_ids"], part["attention_mask"], part["label"]
+
+
+def evaluate_model(model, tokenizer, chunks, max_tokens=8192):
+    """One pass over chunks; returns (StreamingMetrics, timing summary)."""
+    model.eval()
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    metrics, timing = evaluate_encoded(model, tokenizer, chunks, StreamingMetrics(labels), Timing(), max_tokens)
+    return metrics, timing.summary()
+
+
+def print_results(metrics, timing) -> None:
+    print({k: round(v, 4) for k, v in metrics.compute().items()})
+    print(metrics.report())
+    print(metrics.matrix)
+    if timing.get("samples"):
+        print(f"[INFO] {timing['samples']} samples in {timing['wall_s']:.1f}s: {timing['samples_per_s']:.1f} samples/s "
+              f"end to end, {timing['forward_samples_per_s']:.1f} samples/s in forward passes "
+              f"({timing['batches']} batches)")
+        b, s = timing["batch_ms"], timing["per_sample_ms"]
+        print(f"[INFO] batch latency ms p50/p90/p99: {b['p50']:.1f} / {b['p90']:.1f} / {b['p99']:.1f}; "
+              f"per sample: {s['p50']:.2f} / {s['p90']:.2f} / {s['p99']:.2f}")
+
+
+def main():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    ap = argparse.ArgumentParser(description="Single-pass streaming evaluation of a saved checkpoint.")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--data", default=DEFAULT_DATA, help="labelled CSV with label,text columns")
+    ap.add_argument("--text-col", default="text")
+    ap.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    ap.add_argument("--max-batch-tokens", type=int, default=8192)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model)
+    chunks = csv_chunks(tokenizer, model.config, args.data, args.chunk_rows, args.max_length, args.text_col)
+    metrics, timing = evaluate_model(model, tokenizer, chunks, args.max_batch_tokens)
+    print_results(metrics, timing)
+
+
+if __name__ == "__main__":
+    main()
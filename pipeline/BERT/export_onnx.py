@@ -0,0 +1,278 @@
+# export_onnx.py
+"""
+ONNX export and INT8 dynamic quantization of the advisory classifier.
+
+    python pipeline/BERT/export_onnx.py export     # models/BERT/best -> models/BERT/onnx/{model,model.int8}.onnx
+    python pipeline/BERT/export_onnx.py check      # logits parity + accuracy/F1 drift on test.csv
+    python pipeline/BERT/export_onnx.py bench      # throughput and RSS: eager vs ONNX fp32 vs ONNX int8
+
+The export directory also receives the tokenizer and config, so it can be
+loaded on its own. `check` exits non-zero when the fp32 graph's logits differ
+from the PyTorch model's by more than --atol. The int8 model is not expected
+to match logits that closely, so its drift is reported as the change in
+accuracy/F1 and in predicted labels. Each `bench` backend runs in its own
+process so peak RSS is measured per backend.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+from pathlib import Path
+from queue import Empty
+
+import numpy as np
+
+REPO = Path(__file__).resolve().parents[2]
+CHECKPOINT = REPO / "models" / "BERT" / "best"
+ONNX_DIR = REPO / "models" / "BERT" / "onnx"
+TEST_CSV = Path(__file__).resolve().parent / "test.csv"
+FP32_NAME = "model.onnx"
+INT8_NAME = "model.int8.onnx"
+OPSET = 17
+
+
+def export(checkpoint=CHECKPOINT, out_dir=ONNX_DIR, quantize=True) -> list:
+    """Export checkpoint to out_dir/model.onnx (+ model.int8.onnx); returns the written graphs."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    model = AutoModelForSequenceClassification.from_pretrained(checkpoint).eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(["warm up", "a slightly longer warm up sentence"], padding=True, return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["logits"] = {0: "batch"}
+
+    fp32_path = out_dir / FP32_NAME
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), str(fp32_path),
+            input_names=names, output_names=["logits"], dynamic_axes=dynamic,
+            opset_version=OPSET, do_constant_folding=True, dynamo=False,
+        )
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+    print(f"[OK] exported {fp32_path} ({fp32_path.stat().st_size / 2**20:.1f} MB)")
+    written = [fp32_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = out_dir / INT8_NAME
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        print(f"[OK] quantized {int8_path} ({int8_path.stat().st_size / 2**20:.1f} MB)")
+        written.append(int8_path)
+    return written
+
+
+class OnnxClassifier:
+    """onnxruntime session with the same call shape as the eager model (numpy in, logits out)."""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, enc) -> np.ndarray:
+        feed = {n: np.asarray(enc[n], dtype=np.int64) for n in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+class EagerClassifier:
+    def __init__(self, checkpoint, num_threads=None):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.model = AutoModelForSequenceClassification.from_pretrained(checkpoint).eval()
+        self.input_names = ["input_ids", "attention_mask", "token_type_ids"]
+
+    def logits(self, enc) -> np.ndarray:
+        feed = {n: self.torch.as_tensor(np.asarray(enc[n], dtype=np.int64)) for n in self.input_names if n in enc}
+        with self.torch.inference_mode():
+            return self.model(**feed).logits.float().numpy()
+
+
+def load_backend(name, checkpoint=CHECKPOINT, onnx_dir=ONNX_DIR, num_threads=None):
+    if name == "eager":
+        return EagerClassifier(checkpoint, num_threads)
+    return OnnxClassifier(Path(onnx_dir) / (FP32_NAME if name == "onnx-fp32" else INT8_NAME), num_threads)
+
+
+def load_test(path, label2id) -> tuple:
+    """(texts, label ids) from test.csv; numeric labels map through 'Level N' names when the config has them."""
+    with Path(path).open(encoding="utf-8", newline="") as f:
+        rows = [r for r in csv.DictReader(f) if r.get("text")]
+    raw = [r["label"].strip() for r in rows]
+    if all(f"Level {v}" in label2id for v in raw):
+        labels = [label2id[f"Level {v}"] for v in raw]
+    elif all(v in label2id for v in raw):
+        labels = [label2id[v] for v in raw]
+    else:  # same contiguous remap as sentiment.py
+        uniq = sorted(set(raw), key=lambda v: (not v.lstrip("-").isdigit(), int(v) if v.lstrip("-").isdigit() else v))
+        labels = [uniq.index(v) for v in raw]
+    return [r["text"] for r in rows], np.asarray(labels)
+
+
+def run_logits(backend, tokenizer, texts, batch_size=32, max_length=256) -> np.ndarray:
+    out = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], truncation=True, max_length=max_length,
+                        padding=True, return_tensors="np")
+        out.append(backend.logits(enc))
+    return np.concatenate(out)
+
+
+def scores(labels, preds) -> dict:
+    from sklearn.metrics import accuracy_score, f1_score
+
+    return {"accuracy": accuracy_score(labels, preds),
+            "f1_weighted": f1_score(labels, preds, average="weighted"),
+            "f1_macro": f1_score(labels, preds, average="macro")}
+
+
+def check(checkpoint=CHECKPOINT, onnx_dir=ONNX_DIR, test_csv=TEST_CSV, atol=1e-3, max_length=256) -> bool:
+    """Compare eager, ONNX fp32 and ONNX int8 on test.csv; True when fp32 parity holds."""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+    eager = load_backend("eager", checkpoint)
+    texts, labels = load_test(test_csv, eager.model.config.label2id)
+
+    ref = run_logits(eager, tokenizer, texts, max_length=max_length)
+    ref_pred = ref.argmax(1)
+    base = scores(labels, ref_pred)
+    print(f"[INFO] {len(texts)} test rows; eager  acc {base['accuracy']:.4f}  "
+          f"f1w {base['f1_weighted']:.4f}  f1m {base['f1_macro']:.4f}")
+
+    ok = True
+    for name in ("onnx-fp32", "onnx-int8"):
+        path = Path(onnx_dir) / (FP32_NAME if name == "onnx-fp32" else INT8_NAME)
+        if not path.exists():
+            print(f"[WARN] {path} missing, skipping {name}")
+            continue
+        logits = run_logits(load_backend(name, checkpoint, onnx_dir), tokenizer, texts, max_length=max_length)
+        diff = np.abs(logits - ref)
+        pred = logits.argmax(1)
+        s = scores(labels, pred)
+        print(f"[INFO] {name:<9s} acc {s['accuracy']:.4f} ({s['accuracy'] - base['accuracy']:+.4f})  "
+              f"f1w {s['f1_weighted']:.4f} ({s['f1_weighted'] - base['f1_weighted']:+.4f})  "
+              f"f1m {s['f1_macro']:.4f} ({s['f1_macro'] - base['f1_macro']:+.4f})  "
+              f"max|dlogit| {diff.max():.2e}  mean {diff.mean():.2e}  "
+              f"label flips {int((pred != ref_pred).sum())}")
+        if name == "onnx-fp32" and diff.max() > atol:
+            print(f"[FAIL] onnx-fp32 logits differ from eager by {diff.max():.2e} > atol {atol:g}")
+            ok = False
+    return ok
+
+
+def _bench_worker(name, checkpoint, onnx_dir, batch_sizes, seq_lens, seconds, threads, queue):
+    """Runs in a fresh process: load one backend, time every (batch, seq) shape, report peak RSS."""
+    # config.json is read directly so the ONNX workers never import torch/transformers
+    config = Path(onnx_dir if name != "eager" else checkpoint) / "config.json"
+    vocab_size = json.loads(config.read_text(encoding="utf-8"))["vocab_size"]
+    backend = load_backend(name, checkpoint, onnx_dir, threads)
+    rss_loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rng = np.random.default_rng(0)
+    rows = []
+    for seq in seq_lens:
+        for bs in batch_sizes:
+            enc = {"input_ids": rng.integers(min(1000, vocab_size // 2), vocab_size, (bs, seq)),
+                   "attention_mask": np.ones((bs, seq), dtype=np.int64),
+                   "token_type_ids": np.zeros((bs, seq), dtype=np.int64)}
+            backend.logits(enc)  # warm up
+            n, t0 = 0, time.perf_counter()
+            while True:
+                backend.logits(enc)
+                n += 1
+                elapsed = time.perf_counter() - t0
+                if elapsed >= seconds and n >= 2:
+                    break
+            rows.append({"batch": bs, "seq": seq, "seq_per_s": n * bs / elapsed, "ms_per_batch": elapsed / n * 1e3})
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 / 2**20 if sys.platform == "darwin" else 1 / 2**10
+    queue.put({"backend": name, "rss_loaded_mb": rss_loaded * scale, "rss_peak_mb": rss_peak * scale, "rows": rows})
+
+
+def bench(checkpoint=CHECKPOINT, onnx_dir=ONNX_DIR, batch_sizes=(1, 8, 32), seq_lens=(64, 128, 256),
+          seconds=2.0, threads=None) -> list:
+    ctx = mp.get_context("spawn")
+    results = []
+    for name in ("eager", "onnx-fp32", "onnx-int8"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_bench_worker,
+                           args=(name, checkpoint, onnx_dir, batch_sizes, seq_lens, seconds, threads, queue))
+        proc.start()
+        res = None
+        while res is None:
+            try:
+                res = queue.get(timeout=1.0)
+            except Empty:
+                if not proc.is_alive():
+                    raise SystemExit(f"[ERROR] {name} benchmark process exited with {proc.exitcode}")
+        proc.join()
+        results.append(res)
+        print(f"[BENCH] {name:<9s} RSS after load {res['rss_loaded_mb']:7.1f} MB   peak {res['rss_peak_mb']:7.1f} MB")
+
+    eager = {(r["batch"], r["seq"]): r["seq_per_s"] for r in results[0]["rows"]}
+    print(f"{'seq':>5s} {'batch':>5s} " + " ".join(f"{r['backend']:>16s}" for r in results))
+    for seq in seq_lens:
+        for bs in batch_sizes:
+            cells = []
+            for res in results:
+                row = next(r for r in res["rows"] if r["batch"] == bs and r["seq"] == seq)
+                cells.append(f"{row['seq_per_s']:8.1f}/s x{row['seq_per_s'] / eager[(bs, seq)]:4.1f}")
+            print(f"{seq:5d} {bs:5d} " + " ".join(f"{c:>16s}" for c in cells))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("export", "check", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--checkpoint", type=Path, default=CHECKPOINT)
+        p.add_argument("--onnx-dir", type=Path, default=ONNX_DIR)
+        if name == "export":
+            p.add_argument("--no-quantize", action="store_true")
+        if name == "check":
+            p.add_argument("--test-csv", type=Path, default=TEST_CSV)
+            p.add_argument("--atol", type=float, default=1e-3)
+            p.add_argument("--max-length", type=int, default=256)
+        if name == "bench":
+            p.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+            p.add_argument("--seq-lens", type=int, nargs="+", default=[64, 128, 256])
+            p.add_argument("--seconds", type=float, default=2.0, help="timing budget per shape")
+            p.add_argument("--threads", type=int, default=None)
+            p.add_argument("--json", type=Path, help="also write the raw results here")
+    args = ap.parse_args()
+
+    if args.cmd == "export":
+        export(args.checkpoint, args.onnx_dir, quantize=not args.no_quantize)
+    elif args.cmd == "check":
+        if not check(args.checkpoint, args.onnx_dir, args.test_csv, args.atol, args.max_length):
+            sys.exit(1)
+    else:
+        results = bench(args.checkpoint, args.onnx_dir, tuple(args.batch_sizes), tuple(args.seq_lens),
+                        args.seconds, args.threads)
+        if args.json:
+            args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
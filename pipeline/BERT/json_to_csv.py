@@ -1,31 +1,25 @@
-import json
 import csv
-import re
-
-# Function to clean text safely
-def clean_text(text):
-    if not text:
-        return ""
-    # Lowercase
-    text = text.lower()
-    # Remove URLs
-    text = re.sub(r'http\S+|www\S+', '', text)
-    # Remove special characters and digits except punctuation
-    text = re.sub(r"[^a-zA-Z\s.,!?:;'-]", '', text)
-    # Replace multiple spaces with single space
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-# Load JSON
-with open('unified_data/unified_travel_data.json', 'r') as file:
-    data = json.load(file)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "common"))
+from textnorm import clean_text_lowercase
+from unified_store import read_unified
+
+# Lowercase, drop URLs and special characters/digits except punctuation, collapse spaces
+clean_text = clean_text_lowercase
+
+# Load only the advisory columns (Arrow/Parquet when present, else the JSON)
+data = read_unified('unified_data/unified_travel_data', columns=['advisory_level', 'advisory_text'])
+levels = data['advisory_level'].astype(object) if 'advisory_level' in data else [None] * len(data)
+texts = data['advisory_text'].astype(object) if 'advisory_text' in data else [None] * len(data)
 
 # Collect cleaned and structured data
 rows = []
-for entry in data:
-    advisory_level = entry.get('advisory_level', '') or ""
+for advisory_level, advisory_text in zip(levels, texts):
+    advisory_level = advisory_level if isinstance(advisory_level, str) else ""
     advisory_num = advisory_level.split(" ")[1][0] if len(advisory_level.split(" ")) > 1 else ""
-    advisory_text = entry.get('advisory_text', '') or ""
+    advisory_text = advisory_text if isinstance(advisory_text, str) else ""
 
     # Clean texts
     advisory_text_clean = clean_text(advisory_text)
@@ -0,0 +1,168 @@
+# prediction_cache.py
+"""
+Prediction cache in front of model inference.
+
+Most advisories are byte-identical between feed pulls, so a re-score should
+only run the model on texts it has not seen. Results are keyed by
+
+    (model version, blake2b of the normalized text)
+
+where the model version is a hash of the saved weights and config
+(token_cache.model_fingerprint) or, for a hub model, its name and commit.
+Normalization only collapses whitespace. The model is run on the normalized
+text, so a hit returns exactly what the model would.
+
+Two tiers:
+
+    memory  OrderedDict LRU of the most recent results (per process)
+    disk    SQLite table (WAL mode), shared by every run and process
+
+Results must be JSON-serializable (pipeline dicts, probability lists).
+
+    cache = PredictionCache(model_version=model_version("models/BERT/best"))
+    results = cache.predict(texts, predict_fn)   # predict_fn(list of str) -> list of results
+    print(cache.stats())
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from token_cache import model_fingerprint
+
+CACHE_PATH = Path(__file__).resolve().parent / ".prediction_cache.sqlite"
+LRU_SIZE = 4096
+SQL_BATCH = 500   # keys per IN (...) lookup, below SQLite's variable limit
+
+
+def normalize_text(text) -> str:
+    """Whitespace-collapsed text; this is both the cache key input and what the model sees."""
+    return " ".join(str(text or "").split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def model_version(model) -> str:
+    """
+    Version string for a model directory, a loaded model or a transformers pipeline.
+
+    Saved directories hash their files, so retraining into the same path
+    invalidates old entries. Hub models use name@commit.
+    """
+    model = getattr(model, "model", model)   # pipeline -> model
+    path = Path(getattr(model, "name_or_path", model))
+    if (path / "config.json").exists():
+        return model_fingerprint(path)
+    config = getattr(model, "config", None)
+    commit = getattr(config, "_commit_hash", None) or "unknown"
+    return f"{getattr(model, 'name_or_path', model)}@{commit}"
+
+
+class PredictionCache:
+    """Two-tier (LRU + SQLite) cache of model outputs with hit/miss counters."""
+
+    def __init__(self, path=CACHE_PATH, model_version="", lru_size=LRU_SIZE):
+        if not model_version:
+            raise ValueError("model_version is required (see model_version())")
+        self.path = Path(path)
+        self.model_version = model_version
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " model TEXT NOT NULL, text_hash BLOB NOT NULL, result TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+        )
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _remember(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys) -> dict:
+        """{key: result} for the keys found in memory or on disk; counts hits only."""
+        found, missing = {}, []
+        for key in dict.fromkeys(keys):
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[key] = self._lru[key]
+                self.counters["memory_hits"] += 1
+            else:
+                missing.append(key)
+        for i in range(0, len(missing), SQL_BATCH):
+            chunk = missing[i:i + SQL_BATCH]
+            rows = self._db.execute(
+                f"SELECT text_hash, result FROM predictions WHERE model = ? AND text_hash IN "
+                f"({','.join('?' * len(chunk))})", (self.model_version, *chunk)).fetchall()
+            for key, result in rows:
+                key = bytes(key)
+                found[key] = json.loads(result)
+                self._remember(key, found[key])
+            self.counters["disk_hits"] += len(rows)
+        return found
+
+    def put_many(self, items) -> None:
+        """Store (key, result) pairs in both tiers."""
+        now = time.time()
+        rows = []
+        for key, result in items:
+            self._remember(key, result)
+            rows.append((self.model_version, key, json.dumps(result), now))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", rows)
+
+    def predict(self, texts, predict_fn, batch_size=256) -> list:
+        """
+        Results for texts in order; predict_fn only sees distinct normalized texts that are not cached.
+
+        predict_fn(list of str) -> list of JSON-serializable results, one per text.
+        """
+        normalized = [normalize_text(t) for t in texts]
+        keys = [text_key(t) for t in normalized]
+        found = self.get_many(keys)
+        todo = {k: t for k, t in zip(keys, normalized) if k not in found}
+        self.counters["misses"] += len(todo)
+
+        pending = list(todo.items())
+        for i in range(0, len(pending), batch_size):
+            chunk = pending[i:i + batch_size]
+            results = predict_fn([t for _, t in chunk])
+            if len(results) != len(chunk):
+                raise ValueError(f"predict_fn returned {len(results)} results for {len(chunk)} texts")
+            # round-trip through JSON so a miss returns the same types as a later hit
+            results = [json.loads(json.dumps(r)) for r in results]
+            self.put_many(zip((k for k, _ in chunk), results))
+            found.update(zip((k for k, _ in chunk), results))
+        return [found[k] for k in keys]
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        total = hits + self.counters["misses"]
+        return {**self.counters, "hit_rate": hits / total if total else 0.0, "memory_entries": len(self._lru)}
+
+    def prune(self, keep_versions=()) -> int:
+        """Delete rows of every model version except the current one and keep_versions."""
+        keep = (self.model_version, *keep_versions)
+        with self._db:
+            cur = self._db.execute(f"DELETE FROM predictions WHERE model NOT IN ({','.join('?' * len(keep))})", keep)
+        return cur.rowcount
@@ -0,0 +1,247 @@
+# profiling.py
+"""
+Per-step training profile for sentiment.py (opt-in, PROFILE in sentiment.py).
+
+PhaseProfiler is a TrainerCallback that splits every optimizer step into
+
+    data       waiting for the next batch (dataloader + collation, collate shown separately)
+    forward    model forward passes (forward hooks on the model)
+    backward   loss backward + gradient clipping (rest of the step up to the optimizer)
+    optimizer  optimizer.step()
+    finish     lr scheduler + zero_grad
+
+and records evaluation, checkpoint and torch.profiler export time between
+steps, real and padded tokens/sec, and peak RSS. At the end of training it
+writes to out_dir:
+
+    <run>-phases.trace.json   Chrome trace (chrome://tracing or ui.perfetto.dev), one slice per phase
+    <run>-summary.json        totals, mean / p50 / p90 per phase, tokens/sec, peak RSS
+
+mode="torch" also runs torch.profiler over a few steps after a warm-up and
+writes <run>-torch.trace.json plus the top operators to <run>-torch-ops.txt.
+
+Timestamps come from hooks that the Trainer already calls, so the
+profiler adds no synchronisation. On CPU, phases are exact wall time.
+"""
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from transformers import TrainerCallback
+
+PHASES = ("data", "collate", "forward", "backward", "optimizer", "finish")
+TORCH_WAIT, TORCH_WARMUP, TORCH_ACTIVE = 2, 1, 3   # torch.profiler schedule, in optimizer steps
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024   # bytes on macOS, KiB on Linux
+
+
+class PhaseProfiler(TrainerCallback):
+    """Records per-step phase timings, tokens/sec and peak RSS; writes a Chrome trace and a summary."""
+
+    def __init__(self, out_dir="profiles", mode="phases", run_name=None):
+        if mode not in ("phases", "torch"):
+            raise ValueError(f"unknown profile mode {mode!r} (expected 'phases' or 'torch')")
+        self.out_dir = Path(out_dir)
+        self.mode = mode
+        self.run = run_name or time.strftime("%Y%m%d-%H%M%S")
+        self.steps = []
+        self.events = []
+        self.other = {"evaluate": 0.0, "save": 0.0, "profiler": 0.0}
+        self._t0 = None
+        self._last = None
+        self._step = None
+        self._fwd_start = None
+        self._pending_collate = 0.0
+        self._hooks = []
+        self._torch_prof = None
+
+    # ---- timing helpers ----
+
+    def _now(self) -> float:
+        return time.perf_counter()
+
+    def _slice(self, name, start, end, tid=0, **args):
+        self.events.append({"name": name, "ph": "X", "pid": 0, "tid": tid,
+                            "ts": round((start - self._t0) * 1e6, 1),
+                            "dur": round((end - start) * 1e6, 1), "args": args})
+
+    def _forward_pre(self, module, args, kwargs):
+        if module.training and self._step is not None:
+            self._fwd_start = self._now()
+            ids = kwargs.get("input_ids", args[0] if args else None)
+            mask = kwargs.get("attention_mask")
+            if ids is not None:
+                self._step["padded_tokens"] += int(ids.numel())
+                self._step["tokens"] += int(mask.sum()) if mask is not None else int(ids.numel())
+                self._step["rows"] += int(ids.shape[0])
+
+    def _forward_post(self, module, args, kwargs, output):
+        if module.training and self._step is not None and self._fwd_start is not None:
+            end = self._now()
+            self._step["forward"] += end - self._fwd_start
+            self._slice("forward", self._fwd_start, end, tid=1)
+            self._fwd_start = None
+
+    def _timed_collate(self, collate_fn):
+        def collate(features):
+            start = self._now()
+            batch = collate_fn(features)
+            if self._t0 is not None:
+                end = self._now()
+                self._pending_collate += end - start
+                self._slice("collate", start, end, tid=2)
+            return batch
+        return collate
+
+    # ---- TrainerCallback ----
+
+    def on_train_begin(self, args, state, control, model=None, train_dataloader=None, **kwargs):
+        self._t0 = self._last = self._now()
+        self._pending_collate = 0.0
+        if model is not None:
+            self._hooks = [model.register_forward_pre_hook(self._forward_pre, with_kwargs=True),
+                           model.register_forward_hook(self._forward_post, with_kwargs=True)]
+        if train_dataloader is not None and train_dataloader.num_workers == 0:
+            # collation runs in this process only without workers; accelerate wraps the real loader
+            loader = getattr(train_dataloader, "base_dataloader", train_dataloader)
+            loader.collate_fn = self._timed_collate(loader.collate_fn)
+        if self.mode == "torch":
+            import torch
+
+            schedule = torch.profiler.schedule(wait=TORCH_WAIT, warmup=TORCH_WARMUP, active=TORCH_ACTIVE, repeat=1)
+            self._torch_prof = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], schedule=schedule,
+                on_trace_ready=self._torch_trace_ready, record_shapes=True, profile_memory=True)
+            self._torch_prof.__enter__()
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._last = self._now()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        now = self._now()
+        self._step = {"step": state.global_step + 1, "data": now - self._last, "collate": self._pending_collate,
+                      "forward": 0.0, "tokens": 0, "padded_tokens": 0, "rows": 0, "begin": now}
+        self._pending_collate = 0.0
+        self._slice("data", self._last, now, step=self._step["step"])
+
+    def on_pre_optimizer_step(self, args, state, control, **kwargs):
+        if self._step is None:
+            return
+        now = self._now()
+        self._step["backward"] = now - self._step["begin"] - self._step["forward"]
+        self._step["pre_opt"] = now
+        self._slice("forward+backward", self._step["begin"], now, step=self._step["step"])
+
+    def on_optimizer_step(self, args, state, control, **kwargs):
+        if self._step is None or "pre_opt" not in self._step:
+            return
+        now = self._now()
+        self._step["optimizer"] = now - self._step["pre_opt"]
+        self._step["opt_end"] = now
+        self._slice("optimizer", self._step["pre_opt"], now, step=self._step["step"])
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self._step is None:
+            return
+        now = self._now()
+        s = self._step
+        s["finish"] = now - s.get("opt_end", now)
+        s["total"] = s["data"] + (now - s["begin"])
+        s["rss_mb"] = peak_rss_mb()
+        self._slice("finish", s.get("opt_end", now), now, step=s["step"])
+        self.events.append({"name": "tokens/s", "ph": "C", "pid": 0, "ts": round((now - self._t0) * 1e6, 1),
+                            "args": {"tokens": s["tokens"] / max(s["total"], 1e-9)}})
+        self.events.append({"name": "peak RSS (MB)", "ph": "C", "pid": 0, "ts": round((now - self._t0) * 1e6, 1),
+                            "args": {"rss": round(s["rss_mb"], 1)}})
+        self.steps.append({k: v for k, v in s.items() if k not in ("begin", "pre_opt", "opt_end")})
+        self._step = None
+        self._last = now
+        if self._torch_prof is not None:
+            self._torch_prof.step()   # exports the trace when the active window closes
+            end = self._now()
+            self.other["profiler"] += end - now
+            self._slice("profiler", now, end)
+            self._last = end
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        now = self._now()
+        self.other["evaluate"] += now - self._last
+        self._slice("evaluate", self._last, now)
+        self._last = now
+
+    def on_save(self, args, state, control, **kwargs):
+        now = self._now()
+        self.other["save"] += now - self._last
+        self._slice("save", self._last, now)
+        self._last = now
+
+    def on_train_end(self, args, state, control, **kwargs):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        if self._torch_prof is not None:
+            self._torch_prof.__exit__(None, None, None)
+            self._torch_prof = None
+        if self._t0 is not None:
+            self.write()
+
+    def _torch_trace_ready(self, prof):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        prof.export_chrome_trace(str(self.out_dir / f"{self.run}-torch.trace.json"))
+        table = prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=25)
+        (self.out_dir / f"{self.run}-torch-ops.txt").write_text(table, encoding="utf-8")
+
+    # ---- output ----
+
+    def summary(self) -> dict:
+        if not self.steps:
+            return {"steps": 0}
+        total = sum(s["total"] for s in self.steps)
+        phases = {}
+        for name in PHASES:
+            values = np.array([s.get(name, 0.0) for s in self.steps])
+            phases[name] = {"total_s": float(values.sum()), "share": float(values.sum() / total) if total else 0.0,
+                            "mean_ms": float(values.mean() * 1e3), "p50_ms": float(np.percentile(values, 50) * 1e3),
+                            "p90_ms": float(np.percentile(values, 90) * 1e3)}
+        tokens = sum(s["tokens"] for s in self.steps)
+        padded = sum(s["padded_tokens"] for s in self.steps)
+        return {
+            "run": self.run, "steps": len(self.steps), "step_time_s": total,
+            "phases": phases, "between_steps_s": self.other,
+            "tokens_per_s": tokens / total if total else 0.0,
+            "padded_tokens_per_s": padded / total if total else 0.0,
+            "samples_per_s": sum(s["rows"] for s in self.steps) / total if total else 0.0,
+            "peak_rss_mb": max(s["rss_mb"] for s in self.steps),
+        }
+
+    def write(self) -> dict:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        trace = {"traceEvents": self.events, "displayTimeUnit": "ms",
+                 "otherData": {"run": self.run, "threads": {"0": "step", "1": "forward", "2": "collate"}}}
+        (self.out_dir / f"{self.run}-phases.trace.json").write_text(json.dumps(trace), encoding="utf-8")
+        (self.out_dir / f"{self.run}-summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print_summary(summary)
+        print(f"[INFO] profile written to {self.out_dir}/{self.run}-*")
+        return summary
+
+
+def print_summary(summary) -> None:
+    if not summary.get("steps"):
+        print("[INFO] profile: no training steps recorded")
+        return
+    print(f"[INFO] profile over {summary['steps']} steps ({summary['step_time_s']:.1f}s): "
+          f"{summary['tokens_per_s']:.0f} tokens/s ({summary['padded_tokens_per_s']:.0f} padded), "
+          f"{summary['samples_per_s']:.1f} samples/s, peak RSS {summary['peak_rss_mb']:.0f} MB")
+    for name, p in summary["phases"].items():
+        print(f"  {name:<10s} {p['share']:6.1%}  mean {p['mean_ms']:8.1f} ms  p50 {p['p50_ms']:8.1f}  "
+              f"p90 {p['p90_ms']:8.1f}" + ("  (part of data)" if name == "collate" else ""))
+    other = summary["between_steps_s"]
+    print(f"  evaluation {other['evaluate']:.1f}s, checkpoints {other['save']:.1f}s"
+          + (f", torch.profiler {other['profiler']:.1f}s" if other.get("profiler") else "") + " (outside the steps)")
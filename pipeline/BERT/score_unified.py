@@ -0,0 +1,90 @@
+# score_unified.py
+"""
+Batch-score the advisories in unified_travel_data with the fine-tuned classifier.
+
+Texts are cleaned the way json_to_csv.py prepares training text, then
+looked up in the prediction cache. Only advisories that changed since the
+last run (or were scored by another model version) reach the model.
+
+    python pipeline/BERT/score_unified.py --model models/BERT/best
+
+Writes unified_data/unified_predictions.csv:
+iso2,country_name,advisory_level,predicted_level,confidence.
+"""
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chunking import predict_documents
+from prediction_cache import CACHE_PATH, PredictionCache, model_version
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "common"))
+from textnorm import clean_text_lowercase
+from unified_store import read_unified
+
+UNIFIED = Path(__file__).resolve().parents[1] / "scrapers" / "unified_data"
+DEFAULT_MODEL = "models/BERT/best"
+MAX_LENGTH = 256
+
+
+def make_predict_fn(model, tokenizer, max_length=MAX_LENGTH):
+    """Texts -> [{"label", "probs"}], the same shape backend/inference_server.py returns."""
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+
+    def predict(texts):
+        logits = predict_documents(model, tokenizer, texts, "max", max_length=max_length, overflow=False)
+        probs = np.exp(logits - logits.max(1, keepdims=True))
+        probs /= probs.sum(1, keepdims=True)
+        return [{"label": labels[int(p.argmax())], "probs": {l: round(float(v), 6) for l, v in zip(labels, p)}}
+                for p in probs]
+
+    return predict
+
+
+def main():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    ap = argparse.ArgumentParser(description="Score unified_travel_data advisories through the prediction cache.")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--unified", default=str(UNIFIED / "unified_travel_data"))
+    ap.add_argument("--out", default=str(UNIFIED / "unified_predictions.csv"))
+    ap.add_argument("--cache", default=str(CACHE_PATH))
+    args = ap.parse_args()
+
+    data = read_unified(args.unified, columns=["iso2", "country_name", "advisory_level", "advisory_text"])
+    texts = data["advisory_text"].astype(object) if "advisory_text" in data else [None] * len(data)
+    cleaned = [clean_text_lowercase(t) if isinstance(t, str) else "" for t in texts]
+    rows = [i for i, t in enumerate(cleaned) if t]
+    print(f"[INFO] {len(rows)} advisories with text out of {len(data)} rows")
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model).eval()
+    t0 = time.perf_counter()
+    with PredictionCache(args.cache, model_version=model_version(args.model)) as cache:
+        results = cache.predict([cleaned[i] for i in rows], make_predict_fn(model, tokenizer))
+        stats = cache.stats()
+    print(f"[INFO] scored in {time.perf_counter() - t0:.1f}s; cache: {stats['memory_hits']} memory hits, "
+          f"{stats['disk_hits']} disk hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
+
+    by_row = dict(zip(rows, results))
+
+    def column(name):
+        return data[name].astype(object).tolist() if name in data else [None] * len(data)
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["iso2", "country_name", "advisory_level", "predicted_level", "confidence"])
+        for i, (iso2, name, level) in enumerate(zip(column("iso2"), column("country_name"),
+                                                     column("advisory_level"))):
+            pred = by_row.get(i)
+            writer.writerow([iso2, name, level, pred["label"] if pred else "",
+                             f"{max(pred['probs'].values()):.4f}" if pred else ""])
+    print(f"[OK] wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 from transformers import pipeline
 
+from prediction_cache import PredictionCache, model_version
+
 sentiment_pipeline = pipeline("sentiment-analysis", device="cpu")
 
-results = sentiment_pipeline("Updated to remove the Level 4: Do Not Travel area near the border with Burundi and to reflect changes to the Level 4: Do Not Travel areas near the border with the Democratic Republic of the Congo. Exercise increased caution in Rwanda due to the potential for armed violence . Some areas have an increased risk. Read the entire Travel Advisory. Do Not Travel to: Rusizi District within 10 kilometers of the Democratic Republic of the Congo (DRC) border due to armed violence . Rubavu District within 10 kilometers of the DRC border due to armed violence . Country Summary: Armed groups, individuals, and military forces routinely clash in nearby countries. The ongoing violence in these areas raises the risk of spilling over into Rwanda. Read the country information page for additional information on travel to Rwanda. If you decide to travel to Rwanda: Enroll in the Smart Traveler Enrollment Program ( STEP ) to receive messages and Alerts from the U.S. Embassy and make it easier to locate you in an emergency. Review the Country Security Report for Rwanda. Prepare a plan for emergency situations. Review the Traveler’s Checklist . Visit the CDC page for the latest Travel Health Information related to your travel and return to the United States. We highly recommend that you buy insurance before you travel. Check with your travel insurance provider about evacuation assistance, medical insurance, and trip cancellation coverage. Rusizi District within 10 kilometers of the DRC border – Level 4: Do Not Travel Lake Kivu borders the DRC. Borders may not be clearly marked. A permit from the Rwanda Development Board is required for entry to Nyungwe Forest National Park. Due to the risks, U.S. government employees working in Rwanda must obtain special authorization to travel to Rusizi District. Visit our website for Travel to High-Risk Areas . Rubavu District within 10 kilometers of the DRC border – Level 4: Do Not Travel Armed groups operate in the DRC’s North and South Kivu provinces and Virunga Park. This is next to Rwanda’s Volcanoes National Park. The area has faced increasing armed conflict, which might spread across a poorly marked border. To enter the Volcanoes National Park in Rwanda, you need a permit from the Rwanda Development Board. Due to the risks, U.S. government employees working in Rwanda must obtain special authorization to travel to Rubavu District. Visit our website for Travel to High-Risk Areas ")
+# only advisories not scored before by this model version reach the pipeline
+cache = PredictionCache(model_version=model_version(sentiment_pipeline))
+
+texts = ["Updated to remove the Level 4: Do Not Travel area near the border with Burundi and to reflect changes to the Level 4: Do Not Travel areas near the border with the Democratic Republic of the Congo. Exercise increased caution in Rwanda due to the potential for armed violence . Some areas have an increased risk. Read the entire Travel Advisory. Do Not Travel to: Rusizi District within 10 kilometers of the Democratic Republic of the Congo (DRC) border due to armed violence . Rubavu District within 10 kilometers of the DRC border due to armed violence . Country Summary: Armed groups, individuals, and military forces routinely clash in nearby countries. The ongoing violence in these areas raises the risk of spilling over into Rwanda. Read the country information page for additional information on travel to Rwanda. If you decide to travel to Rwanda: Enroll in the Smart Traveler Enrollment Program ( STEP ) to receive messages and Alerts from the U.S. Embassy and make it easier to locate you in an emergency. Review the Country Security Report for Rwanda. Prepare a plan for emergency situations. Review the Traveler’s Checklist . Visit the CDC page for the latest Travel Health Information related to your travel and return to the United States. We highly recommend that you buy insurance before you travel. Check with your travel insurance provider about evacuation assistance, medical insurance, and trip cancellation coverage. Rusizi District within 10 kilometers of the DRC border – Level 4: Do Not Travel Lake Kivu borders the DRC. Borders may not be clearly marked. A permit from the Rwanda Development Board is required for entry to Nyungwe Forest National Park. Due to the risks, U.S. government employees working in Rwanda must obtain special authorization to travel to Rusizi District. Visit our website for Travel to High-Risk Areas . Rubavu District within 10 kilometers of the DRC border – Level 4: Do Not Travel Armed groups operate in the DRC’s North and South Kivu provinces and Virunga Park. This is next to Rwanda’s Volcanoes National Park. The area has faced increasing armed conflict, which might spread across a poorly marked border. To enter the Volcanoes National Park in Rwanda, you need a permit from the Rwanda Development Board. Due to the risks, U.S. government employees working in Rwanda must obtain special authorization to travel to Rubavu District. Visit our website for Travel to High-Risk Areas "]
+results = cache.predict(texts, sentiment_pipeline)
 print(results)
+print(cache.stats())
 # [{'label': 'POSITIVE', 'score': 0.998}, {'label': 'NEGATIVE', 'score': 0.996}]
@@ -1,106 +1,136 @@
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report
 from datasets import load_dataset, DatasetDict
 from transformers import (
     BertTokenizerFast, BertForSequenceClassification,
-    TrainingArguments, Trainer, DataCollatorWithPadding
+    TrainingArguments, DataCollatorWithPadding
 )
 import numpy as np
 from sklearn.metrics import accuracy_score, f1_score
 import torch
 from collections import Counter
+from bucketing import BucketedTrainer, EpochTimer, epoch_time_report, padding_report, sequence_lengths
+from token_cache import cache_key, load_or_build, read_column
+from chunking import predict_documents
+from evaluation import dataset_chunks, evaluate_model, print_results
+from profiling import PhaseProfiler
 
 MODEL = "bert-base-uncased"
 TEST_SIZE = 0.1
 SEED = 42
-
-# 1) Load CSVs
-raw = load_dataset(
-    "csv",
-    data_files={"train": "pipeline/BERT/train.csv", "test": "pipeline/BERT/test.csv"}
-)
-
-def merge_labels(example):
-    return example
-
-raw["train"] = raw["train"].map(merge_labels)
-raw["test"]  = raw["test"].map(merge_labels)
-
-# 2) Normalize column names (strip whitespace)
-def strip_colnames(ds):
-    rename = {c: c.strip() for c in ds.column_names}
-    # only rename if any name changes
-    if any(k != v for k, v in rename.items()):
-        ds = ds.rename_columns(rename)
-    return ds
-
-raw["train"] = strip_colnames(raw["train"])
-raw["test"]  = strip_colnames(raw["test"])
-
-# 3) Identify columns
-cols = raw["train"].column_names
-if "label" not in cols:
-    raise ValueError(f"Expected a 'label' column, found: {cols}")
-text_col = "text" if "text" in cols else None
-if text_col is None:
-    # Try a best-effort guess: pick the non-label column
-    candidates = [c for c in cols if c != "label"]
-    if len(candidates) == 1:
-        text_col = candidates[0]
-    else:
-        raise ValueError(f"Couldn't find text column. Columns: {cols}")
-
-# 4) Ensure label is numeric and contiguous 0..K-1
-train_labels = raw["train"]["label"]
-if isinstance(train_labels[0], str):
+MAX_LENGTH = 256
+DATA_FILES = {"train": "pipeline/BERT/train.csv", "test": "pipeline/BERT/test.csv"}
+BEST_DIR = "models/BERT/best"   # final model + tokenizer, loaded by backend/inference_server.py
+
+# Length bucketing for the train/validation/test loaders (see bucketing.py):
+# "off" = random fixed-size batches, "length" = fixed-size batches of similar length,
+# "tokens" = similar-length batches of at most MAX_BATCH_TOKENS padded tokens (opt-in: rows per
+# step then vary with length, so per_device_train_batch_size and the learning rate no longer match)
+BUCKETING = "length"
+MAX_BATCH_TOKENS = 8192
+MEGA_BATCH_MULT = 50
+EPOCH_TIME_STEPS = 20   # timed steps per batching for the before/after epoch estimate; 0 to skip
+
+# Also score the test set over sliding windows (chunking.py) so text past MAX_LENGTH
+# counts: None to skip, or "max" / "mean" / "attention" to reduce window logits
+CHUNK_REDUCER = None
+CHUNK_STRIDE = 64
+
+# Opt-in training profile (profiling.py): None, "phases" (per-step phase timings, tokens/s,
+# peak RSS as a Chrome trace + summary JSON) or "torch" (also a torch.profiler trace)
+PROFILE = None
+PROFILE_DIR = "profiles"
+
+# 1) Label mapping, read straight from the CSV (it is part of the token cache key)
+train_labels = read_column(DATA_FILES["train"], "label")
+numeric_labels = all(v.lstrip("-").isdigit() for v in train_labels)
+if numeric_labels:
+    # shift labels to 0..K-1 if they are {1,2,3,...}
+    unique = sorted({int(v) for v in train_labels})
+    label2idx = {v: i for i, v in enumerate(unique)}
+    id2label = {i: f"Level {v}" for i, v in enumerate(unique)}
+else:
     # map strings -> ints
     label_names = sorted(set(train_labels))
-    name2id = {n: i for i, n in enumerate(label_names)}
-    def map_labels(ex): ex["label"] = name2id[ex["label"]]; return ex
-    raw["train"] = raw["train"].map(map_labels)
-    raw["test"]  = raw["test"].map(map_labels)
-else:
-    # shift labels to 0..K-1 if they are {1,2,3,...}
-    unique = sorted(set(train_labels))
-    if unique != list(range(len(unique))):
-        remap = {v: i for i, v in enumerate(unique)}
-        def remap_labels(ex): ex["label"] = remap[int(ex["label"])]; return ex
-        raw["train"] = raw["train"].map(remap_labels)
-        raw["test"]  = raw["test"].map(remap_labels)
+    label2idx = {n: i for i, n in enumerate(label_names)}
+    id2label = {i: str(n) for i, n in enumerate(label_names)}
+num_labels = len(label2idx)
 
-num_labels = len(set(raw["train"]["label"]))
-
-# 5) Try stratified split, else fallback
-counts = Counter(raw["train"]["label"])
-min_class = min(counts.values())
-can_stratify = min_class >= 2  # with 10% val, each class needs >=2 to put >=1 in val
+tokenizer = BertTokenizerFast.from_pretrained(MODEL)
 
-if can_stratify:
-    split = raw["train"].train_test_split(test_size=0.1, seed=42)
 
-else:
-    print(f"[WARN] Cannot stratify (class counts: {dict(counts)}). Using random split.")
-    split = raw["train"].train_test_split(test_size=TEST_SIZE, seed=SEED)
+def prepare_splits():
+    """Steps 2-6: load, clean, relabel, split and tokenize. Only runs on a token cache miss."""
+    # 2) Load CSVs
+    raw = load_dataset("csv", data_files=DATA_FILES)
+
+    # 3) Normalize column names (strip whitespace)
+    def strip_colnames(ds):
+        rename = {c: c.strip() for c in ds.column_names}
+        # only rename if any name changes
+        if any(k != v for k, v in rename.items()):
+            ds = ds.rename_columns(rename)
+        return ds
+
+    raw["train"] = strip_colnames(raw["train"])
+    raw["test"]  = strip_colnames(raw["test"])
+
+    # 4) Identify columns, make label numeric and contiguous 0..K-1
+    cols = raw["train"].column_names
+    text_col = "text" if "text" in cols else None
+    if text_col is None:
+        # Try a best-effort guess: pick the non-label column
+        candidates = [c for c in cols if c != "label"]
+        if len(candidates) == 1:
+            text_col = candidates[0]
+        else:
+            raise ValueError(f"Couldn't find text column. Columns: {cols}")
+
+    if not (numeric_labels and list(label2idx) == list(range(num_labels))):
+        def map_labels(batch):
+            key = (lambda v: int(v)) if numeric_labels else (lambda v: str(v).strip())
+            return {"label": [label2idx[key(v)] for v in batch["label"]]}
+        raw["train"] = raw["train"].map(map_labels, batched=True)
+        raw["test"]  = raw["test"].map(map_labels, batched=True)
+
+    # 5) Try stratified split, else fallback
+    counts = Counter(raw["train"]["label"])
+    min_class = min(counts.values())
+    can_stratify = min_class >= 2  # with 10% val, each class needs >=2 to put >=1 in val
+
+    if can_stratify:
+        split = raw["train"].train_test_split(test_size=0.1, seed=42)
 
-dataset = DatasetDict({
-    "train": split["train"],
-    "validation": split["test"],
-    "test": raw["test"],
-})
+    else:
+        print(f"[WARN] Cannot stratify (class counts: {dict(counts)}). Using random split.")
+        split = raw["train"].train_test_split(test_size=TEST_SIZE, seed=SEED)
 
-# 6) Tokenization (dynamic padding via data collator)
-tokenizer = BertTokenizerFast.from_pretrained(MODEL)
+    dataset = DatasetDict({
+        "train": split["train"],
+        "validation": split["test"],
+        "test": raw["test"],
+    })
 
-def tokenize(batch):
-    return tokenizer(batch[text_col], truncation=True, max_length=256)
+    # 6) Tokenization (dynamic padding via data collator)
+    def tokenize(batch):
+        return tokenizer(batch[text_col], truncation=True, max_length=MAX_LENGTH)
 
-tokenized = {k: ds.map(tokenize, batched=True) for k, ds in dataset.items()}
-for k in tokenized:
     keep = ["input_ids", "attention_mask", "label"]
-    tokenized[k] = tokenized[k].remove_columns([c for c in tokenized[k].column_names if c not in keep])
-    tokenized[k] = tokenized[k].with_format("torch")
+    tokenized = DatasetDict({
+        k: ds.map(tokenize, batched=True, remove_columns=[c for c in ds.column_names if c not in keep])
+        for k, ds in dataset.items()
+    })
+    return tokenized, {"text_col": text_col}
+
+
+key, key_parts = cache_key(DATA_FILES, tokenizer, MAX_LENGTH, label2idx, test_size=TEST_SIZE, seed=SEED)
+tokenized, prep_meta = load_or_build(key, key_parts, prepare_splits)
+tokenized = {k: ds.with_format("torch") for k, ds in tokenized.items()}
 
 # 7) Model, collator, metrics
-model = BertForSequenceClassification.from_pretrained(MODEL, num_labels=num_labels)
+model = BertForSequenceClassification.from_pretrained(
+    MODEL, num_labels=num_labels,
+    id2label=id2label, label2id={v: k for k, v in id2label.items()},
+)
 collator = DataCollatorWithPadding(tokenizer=tokenizer)
 
 def compute_metrics(eval_pred):
@@ -130,7 +160,20 @@ args = TrainingArguments(
     report_to=None,
 )
 
-trainer = Trainer(
+if BUCKETING != "off":
+    padding_report(
+        {k: sequence_lengths(ds) for k, ds in tokenized.items()}, BUCKETING,
+        {"train": args.per_device_train_batch_size, "validation": args.per_device_eval_batch_size,
+         "test": args.per_device_eval_batch_size},
+        max_tokens=MAX_BATCH_TOKENS, mega_mult=MEGA_BATCH_MULT, seed=SEED,
+    )
+    if EPOCH_TIME_STEPS:
+        epoch_time_report(model, collator, tokenized["train"], BUCKETING, args.per_device_train_batch_size,
+                          MAX_BATCH_TOKENS, MEGA_BATCH_MULT, steps=EPOCH_TIME_STEPS, seed=SEED)
+
+epoch_timer = EpochTimer()
+callbacks = [epoch_timer] + ([PhaseProfiler(PROFILE_DIR, PROFILE)] if PROFILE else [])
+trainer = BucketedTrainer(
     model=model,
     args=args,
     train_dataset=tokenized["train"],
@@ -138,18 +181,25 @@ trainer = Trainer(
     tokenizer=tokenizer,
     data_collator=collator,
     compute_metrics=compute_metrics,
+    callbacks=callbacks,
+    bucketing=BUCKETING,
+    max_batch_tokens=MAX_BATCH_TOKENS,
+    mega_mult=MEGA_BATCH_MULT,
 )
 
 trainer.train()
-
-print(trainer.evaluate(eval_dataset=tokenized["test"]))
-
-
-preds = trainer.predict(tokenized["test"])
-logits, labels = preds.predictions, preds.label_ids
-y_pred = np.argmax(logits, axis=-1)
-
-
-
-print(classification_report(labels, y_pred))
-print(confusion_matrix(labels, y_pred))
+print(f"[INFO] epoch wall times ({BUCKETING}): {[round(t, 1) for t in epoch_timer.times]}")
+trainer.save_model(BEST_DIR)   # best checkpoint (load_best_model_at_end) + tokenizer
+
+# one streaming pass over the test set: metrics, per-class report, confusion matrix, throughput
+test_metrics, test_timing = evaluate_model(trainer.model, tokenizer, dataset_chunks(tokenized["test"]),
+                                           max_tokens=MAX_BATCH_TOKENS)
+print_results(test_metrics, test_timing)
+
+if CHUNK_REDUCER:
+    test_texts = read_column(DATA_FILES["test"], prep_meta["text_col"])
+    test_labels = tokenized["test"].with_format(None)["label"]
+    doc_logits = predict_documents(trainer.model, tokenizer, test_texts, CHUNK_REDUCER,
+                                   max_length=MAX_LENGTH, stride=CHUNK_STRIDE, max_tokens=MAX_BATCH_TOKENS)
+    print(f"[INFO] sliding-window test metrics (reducer={CHUNK_REDUCER}, stride={CHUNK_STRIDE}):")
+    print(classification_report(test_labels, np.argmax(doc_logits, axis=-1)))
@@ -0,0 +1,115 @@
+# token_cache.py
+"""
+On-disk cache of the tokenized train/validation/test splits for sentiment.py.
+
+The prepared DatasetDict is written with save_to_disk (Arrow shards) under
+.token_cache/<key>/ and reopened with load_from_disk, which memory-maps the
+shards instead of reading them. The key hashes everything that changes the
+tokenized rows:
+
+    content hash of every data file
+    tokenizer class, name and a hash of its serialized vocab/normalizer
+    max_length
+    label mapping
+    split parameters (validation size, seed)
+
+so a repeat run or a hyperparameter change that does not touch the data
+reuses the shards and goes straight to training. A half-written entry is
+never picked up: shards go to a temporary directory that is renamed into
+place last.
+"""
+import csv
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+CACHE_ROOT = Path(__file__).resolve().parent / ".token_cache"
+META_NAME = "meta.json"
+
+
+def file_digest(path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> dict:
+    """Name plus a hash of the full tokenizer definition (vocab, normalizer, special tokens)."""
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        blob = backend.to_str()
+    else:
+        blob = json.dumps(sorted(tokenizer.get_vocab().items()))
+    blob += json.dumps(tokenizer.special_tokens_map, sort_keys=True)
+    return {"class": type(tokenizer).__name__,
+            "name": getattr(tokenizer, "name_or_path", ""),
+            "vocab_sha256": hashlib.sha256(blob.encode("utf-8")).hexdigest()}
+
+
+def model_fingerprint(model_dir) -> str:
+    """Hash of config.json and the weight files of a saved model directory."""
+    model_dir = Path(model_dir)
+    weights = sorted(model_dir.glob("*.safetensors")) + sorted(model_dir.glob("*.bin"))
+    parts = [file_digest(p) for p in weights if p.name != "training_args.bin"]
+    parts.append(file_digest(model_dir / "config.json"))
+    return hashlib.sha256("".join(parts).encode("ascii")).hexdigest()[:24]
+
+
+def read_column(path, name) -> list:
+    """One column of a CSV as strings (header names are stripped, as sentiment.py does)."""
+    with Path(path).open(encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [c.strip() for c in next(reader)]
+        if name not in header:
+            raise ValueError(f"Expected a '{name}' column in {path}, found: {header}")
+        idx = header.index(name)
+        return [row[idx].strip() for row in reader if len(row) > idx]
+
+
+def cache_key(data_files: dict, tokenizer, max_length: int, label_mapping: dict, **params) -> tuple:
+    """(short hex key, the key's inputs) for a tokenized-splits cache entry."""
+    parts = {
+        "data": {split: file_digest(path) for split, path in sorted(data_files.items())},
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "max_length": max_length,
+        "labels": {str(k): v for k, v in label_mapping.items()},
+        "params": params,
+    }
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return digest[:24], parts
+
+
+def load_or_build(key: str, parts: dict, build, cache_root=CACHE_ROOT):
+    """
+    Return (DatasetDict, meta) for key, building it with build() -> (DatasetDict, meta) on a miss.
+
+    meta must be JSON-serializable; it is stored next to the shards.
+    """
+    from datasets import load_from_disk
+
+    entry = Path(cache_root) / key
+    if (entry / META_NAME).exists():
+        t0 = time.perf_counter()
+        splits = load_from_disk(str(entry / "splits"))
+        meta = json.loads((entry / META_NAME).read_text(encoding="utf-8"))["meta"]
+        print(f"[INFO] token cache hit {key} ({time.perf_counter() - t0:.2f}s, "
+              f"{', '.join(f'{k}={len(v)}' for k, v in splits.items())})")
+        return splits, meta
+
+    print(f"[INFO] token cache miss {key}; tokenizing")
+    t0 = time.perf_counter()
+    splits, meta = build()
+    tmp = Path(cache_root) / f".{key}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    splits.save_to_disk(str(tmp / "splits"))
+    (tmp / META_NAME).write_text(json.dumps({"key": parts, "meta": meta}, indent=2, default=str),
+                                 encoding="utf-8")
+    shutil.rmtree(entry, ignore_errors=True)
+    tmp.rename(entry)
+    print(f"[INFO] token cache stored {entry} ({time.perf_counter() - t0:.1f}s)")
+    # reopen from disk so the returned splits are the memory-mapped shards
+    return load_from_disk(str(entry / "splits")), meta
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+Persistent de-duplication index for the Wayback advisory CSVs.
+
+Consecutive snapshots mostly repeat the same advisories. The index keeps a
+hash of (level label, clean_text_for_bert(body)) for every row already in the
+output CSV, plus the snapshot URLs that have been fully processed, so a run
+only parses new snapshots and only appends genuinely new advisories.
+
+On-disk format (append-only text, one entry per line):
+    h <blake2b hex>   advisory already written
+    u <snapshot url>  snapshot fully processed
+
+Hashes are held back until mark_url(), which the caller invokes after the
+snapshot's CSV rows are flushed, so a hash never reaches disk before its row.
+"""
+
+import csv
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from textnorm import clean_text_for_bert
+
+
+def advisory_key(label, body: str, cleaned: bool = False) -> str:
+    """Hash of the level label plus the normalized advisory body."""
+    text = body if cleaned else clean_text_for_bert(body)
+    payload = f"{int(label)}\t{text}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class DedupIndex:
+    """Set of advisory hashes and processed snapshot URLs backed by an append-only file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.hashes = set()
+        self.urls = set()
+        self._pending = []   # hashes added since the last mark_url, not on disk yet
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    kind, _, value = line.rstrip("\n").partition(" ")
+                    if kind == "h":
+                        self.hashes.add(value)
+                    elif kind == "u":
+                        self.urls.add(value)
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, label, body: str, cleaned: bool = False) -> bool:
+        """
+        Record an advisory; return False if an identical one was already seen.
+        Pass cleaned=True when body already went through clean_text_for_bert.
+        """
+        key = advisory_key(label, body, cleaned)
+        if key in self.hashes:
+            return False
+        self.hashes.add(key)
+        self._pending.append(key)
+        return True
+
+    def has_url(self, url: str) -> bool:
+        return url in self.urls
+
+    def mark_url(self, url: str) -> None:
+        """
+        Mark a snapshot as fully processed and flush the index to disk. Call it
+        after the snapshot's rows are flushed to the CSV: the hashes added since
+        the last call are written here, ahead of the URL.
+        """
+        self.urls.add(url)
+        self._write_pending()
+        self._fh.write(f"u {url}\n")
+        self._fh.flush()
+
+    def _write_pending(self) -> None:
+        self._fh.writelines(f"h {key}\n" for key in self._pending)
+        self._pending.clear()
+
+    def reset(self) -> None:
+        """Forget everything (used when the output CSV is being rebuilt)."""
+        self._fh.close()
+        self.hashes.clear()
+        self.urls.clear()
+        self._pending.clear()
+        self._fh = self.path.open("w", encoding="utf-8")
+
+    def seed_from_csv(self, csv_path, label_col="label", text_col="text_advisory") -> int:
+        """Hash every row of an existing output CSV; returns the number of rows indexed."""
+        n = 0
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get(label_col) and row.get(text_col):
+                    # rows were written after clean_text_for_bert already
+                    self.add(row[label_col], row[text_col], cleaned=True)
+                    n += 1
+        self._write_pending()   # these rows are already on disk
+        self._fh.flush()
+        return n
+
+    def close(self) -> None:
+        """
+        Write outstanding hashes and close. On a clean exit the CSV is closed
+        (and flushed) first, as in wayback_to_csv's `with index, open(...)`.
+        """
+        self._write_pending()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,38 +1,21 @@
 # TODO: Create a cleaner that cleans the data into bert usable format
 
 import sys
-import requests
-import xml.etree.ElementTree as ET
+from pathlib import Path
 
-from bs4 import BeautifulSoup
+from snapshot_fetcher import fetch_snapshots
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from advisory_xml import iter_items
 
-def fetch_xml(url: str) -> str:
-    """Download XML from the given URL and return it as text."""
-    print(f"[INFO] Fetching XML from: {url}", file=sys.stderr)
-    resp = requests.get(url)
-    resp.raise_for_status()
-    return resp.text
 
-
-def extract_items(xml_text: str):
-    """Parse XML text and yield (title, raw_description_html, clean_text)."""
-    root = ET.fromstring(xml_text)
-
-    # This works for most RSS-like feeds: <rss><channel><item>...</item></channel></rss>
-    items = root.findall(".//item")
-    print(f"[INFO] Found {len(items)} <item> entries", file=sys.stderr)
-
-    for item in items:
-        title = (item.findtext("title") or "").strip()
-        desc_html = (item.findtext("description") or "").strip()
-
-        # description is usually HTML inside CDATA — parse it to get visible text
-        soup = BeautifulSoup(desc_html, "html.parser")
-        # separator=" " ensures words from different tags don't get smashed together
-        clean_text = soup.get_text(separator=" ", strip=True)
-
-        yield title, desc_html, clean_text
+def extract_items(source):
+    """Stream <item> entries from a snapshot and yield (title, raw_description_html, clean_text)."""
+    count = 0
+    for record in iter_items(source):
+        count += 1
+        yield record["title"], record["description"], record["text"]
+    print(f"[INFO] Found {count} <item> entries", file=sys.stderr)
 
 
 
@@ -66,12 +49,8 @@ def main():
         sys.exit(1)
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as out_file:
-        for url in INPUT_URLS:
-            xml_text = fetch_xml(url)
-
-            
-
-            for idx, (title, desc_html, clean_text) in enumerate(extract_items(xml_text), start=1):
+        for url, xml_path in fetch_snapshots(INPUT_URLS):
+            for idx, (title, desc_html, clean_text) in enumerate(extract_items(xml_path), start=1):
                 out_file.write(f"### ITEM {idx} ###\n")
                 if title:
                     out_file.write(f"TITLE: {title}\n")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Shared fetch layer for the Wayback advisory scrapers.
+
+- fetches every snapshot URL concurrently over a bounded thread pool
+- one pooled requests.Session with retries / backoff for all workers
+- per-host rate limiting so web.archive.org is not hammered
+- on-disk content-addressed cache of the raw XML: blobs live under
+  objects/<sha256 of body> and index.json maps snapshot URL -> sha256,
+  so re-runs only read from disk
+
+Usage from a script:
+
+    from snapshot_fetcher import fetch_snapshots
+
+    for url, xml_path in fetch_snapshots(INPUT_URLS):
+        ...
+"""
+
+import json
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".snapshot_cache"
+DEFAULT_WORKERS = 8
+DEFAULT_MIN_INTERVAL = 1.0  # seconds between request starts to the same host
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 1.0  # urllib3 backoff_factor: sleeps factor * 2**(retry - 1) between retries
+DEFAULT_TIMEOUT = 60
+
+
+class SnapshotCache:
+    """Content-addressed store of raw snapshot bodies keyed by snapshot URL."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}
+        if self.index_path.exists():
+            self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / f"{digest}.xml"
+
+    def path_for(self, url: str):
+        """Return the cached blob path for url, or None if it is not cached."""
+        with self._lock:
+            digest = self._index.get(url)
+        if digest is None:
+            return None
+        path = self._blob_path(digest)
+        return path if path.exists() else None
+
+    def put(self, url: str, data: bytes) -> Path:
+        """Store data for url and return the blob path."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self._index[url] = digest
+        return path
+
+    def flush(self) -> None:
+        """Persist the url -> digest index atomically."""
+        with self._lock:
+            payload = json.dumps(self._index, indent=2, sort_keys=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+
+class HostRateLimiter:
+    """Spaces out request starts to the same host by at least min_interval seconds."""
+
+    def __init__(self, min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def make_session(pool_size: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF) -> requests.Session:
+    """Build a Session with a connection pool sized for the worker count and retry/backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_snapshots(urls, cache_dir=DEFAULT_CACHE_DIR, max_workers=DEFAULT_WORKERS,
+                    min_interval=DEFAULT_MIN_INTERVAL, session=None, refresh=False,
+                    timeout=DEFAULT_TIMEOUT):
+    """
+    Make sure every URL is in the on-disk cache and return [(url, blob_path), ...]
+    in the same order as urls.
+
+    Cached URLs are never re-downloaded unless refresh=True (Wayback snapshot URLs
+    with a timestamp are immutable). Misses are fetched concurrently.
+    """
+    cache = SnapshotCache(cache_dir)
+    limiter = HostRateLimiter(min_interval)
+    own_session = session is None
+    if own_session:
+        session = make_session(pool_size=max_workers)
+
+    results = {}
+    misses = []
+    for url in dict.fromkeys(urls):
+        path = None if refresh else cache.path_for(url)
+        if path is not None:
+            print(f"[INFO] Cache hit: {url}", file=sys.stderr)
+            results[url] = path
+        else:
+            misses.append(url)
+
+    def fetch_one(url):
+        limiter.wait(url)
+        print(f"[INFO] Fetching XML from: {url}", file=sys.stderr)
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return cache.put(url, resp.content)
+
+    try:
+        if misses:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for url, path in zip(misses, pool.map(fetch_one, misses)):
+                    results[url] = path
+    finally:
+        # keep whatever was fetched even if one URL failed
+        cache.flush()
+        if own_session:
+            session.close()
+
+    return [(url, results[url]) for url in urls]
+
+
+if __name__ == "__main__":
+    # prefetch: python snapshot_fetcher.py URL [URL ...]
+    for url, path in fetch_snapshots(sys.argv[1:]):
+        print(f"{url}\t{path}")
@@ -7,14 +7,21 @@ label,text_advisory
 - label is the EXACT advisory "Level X" from the <title> (1,2,3,4)
 - NO merging of levels
 - text_advisory is cleaned advisory body text (no "Country – Level X" included)
+- identical advisories across snapshots are written once; re-runs only process
+  snapshot URLs missing from the dedup index and append to the CSV
 """
 
 import sys
 import csv
 import re
-import requests
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from pathlib import Path
+
+from dedup_index import DedupIndex
+from snapshot_fetcher import fetch_snapshots
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from advisory_xml import iter_items
+from textnorm import clean_text_for_bert
 
 
 # ---------------------- CONFIGURATION ----------------------
@@ -28,37 +35,21 @@ INPUT_URLS = [
 ]
 
 OUTPUT_CSV = "BERT/wayback/old_advisories_minimal_pt2.csv"
+DEDUP_INDEX = OUTPUT_CSV + ".dedup"  # hashes of rows already in OUTPUT_CSV
 
 # -----------------------------------------------------------
 
 
-def fetch_xml(url: str) -> str:
-    """Download XML from the given URL and return it as text."""
-    print(f"[INFO] Fetching XML from: {url}", file=sys.stderr)
-    resp = requests.get(url)
-    resp.raise_for_status()
-    return resp.text
-
-
-def extract_items(xml_text: str):
-    """Yield dicts: {title, body_text}."""
-    root = ET.fromstring(xml_text)
-
-    items = root.findall(".//item")
-    print(f"[INFO] Found {len(items)} items", file=sys.stderr)
-
-    for item in items:
-        title = (item.findtext("title") or "").strip()
-        desc_html = (item.findtext("description") or "").strip()
-
-        # description is HTML inside CDATA → strip into text
-        soup = BeautifulSoup(desc_html, "html.parser")
-        body_text = soup.get_text(separator=" ", strip=True)
-
+def extract_items(source):
+    """Stream <item> entries from a snapshot and yield dicts: {title, body_text}."""
+    count = 0
+    for record in iter_items(source):
+        count += 1
         yield {
-            "title": title,
-            "body_text": body_text,
+            "title": record["title"],
+            "body_text": record["text"],
         }
+    print(f"[INFO] Found {count} items", file=sys.stderr)
 
 
 # Pattern: "<Country> – Level X"
@@ -67,18 +58,11 @@ TITLE_PATTERN = re.compile(
 )
 
 
-# Optional boilerplate removal to reduce noise
-BOILERPLATE_REMOVE = [
-    r"Read the Safety and Security section.*?\. ",
-    r"Read the Safety and Security section.*?$",
-    r"If you decide to travel to .*?:",
-    r"Enroll in the Smart Traveler Enrollment Program.*?\. ",
-    r"Follow the Department of State on Facebook and Twitter.*?\. ",
-    r"U\.S\. citizens who travel abroad should always have a contingency plan.*?\. ",
-    r"Review the Traveler’s Checklist.*?\. ",
-    r"Review the Crime and Safety Report.*?\. ",
-    r"Review the Crime and Safety Reports.*?\. ",
-]
+# Pattern that catches the trivial Level 1 advisories
+SHORT_LEVEL1_PATTERN = re.compile(
+    r"^Exercise normal precautions\b.*$", re.IGNORECASE
+)
+
 
 def should_skip_short_advisory(text: str, label: int) -> bool:
     """
@@ -93,46 +77,35 @@ def should_skip_short_advisory(text: str, label: int) -> bool:
     if len(text.split()) < 20:
         return True
 
-    # Pattern that catches the trivial Level 1 advisories
-    SHORT_LEVEL1_PATTERN = re.compile(
-        r"^Exercise normal precautions\b.*$", re.IGNORECASE
-    )
-
     if label == 1 and SHORT_LEVEL1_PATTERN.match(text):
         return True
 
     return False
 
 
-def clean_text_for_bert(body: str) -> str:
-    """
-    Clean advisory body text for BERT:
-
-    - DOES NOT include the title or the Level text
-    - Strips boilerplate
-    - Normalizes whitespace
-    """
-    text = body.strip()
-
-    # Remove boilerplate phrases
-    for pattern in BOILERPLATE_REMOVE:
-        text = re.sub(pattern, " ", text, flags=re.IGNORECASE)
-
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
-
-    return text
-
-
 def main():
-    with open(OUTPUT_CSV, "w", encoding="utf-8", newline="") as f_out:
+    output = Path(OUTPUT_CSV)
+    index = DedupIndex(DEDUP_INDEX)
+    if not output.exists():
+        index.reset()
+    elif not index.urls:
+        # CSV predates the index: hash what is already there
+        n = index.seed_from_csv(output)
+        print(f"[INFO] Seeded dedup index with {n} existing rows", file=sys.stderr)
+
+    pending = [url for url in INPUT_URLS if not index.has_url(url)]
+    print(f"[INFO] {len(INPUT_URLS) - len(pending)} snapshots already processed, "
+          f"{len(pending)} new", file=sys.stderr)
+
+    written = duplicates = 0
+    write_header = not output.exists()
+    with index, output.open("a", encoding="utf-8", newline="") as f_out:
         writer = csv.writer(f_out)
-        writer.writerow(["label", "text_advisory"])
-
-        for url in INPUT_URLS:
-            xml_text = fetch_xml(url)
+        if write_header:
+            writer.writerow(["label", "text_advisory"])
 
-            for item in extract_items(xml_text):
+        for url, xml_path in fetch_snapshots(pending):
+            for item in extract_items(xml_path):
                 title = item["title"]
                 body = item["body_text"]
 
@@ -154,10 +127,20 @@ def main():
                 if should_skip_short_advisory(text, raw_level):
                     continue
 
+                # Skip advisories already written from an earlier snapshot
+                if not index.add(raw_level, text, cleaned=True):
+                    duplicates += 1
+                    continue
 
                 writer.writerow([raw_level, text])
+                written += 1
+
+            # rows reach disk first, then their hashes and the URL (dedup_index.mark_url)
+            f_out.flush()
+            index.mark_url(url)
 
-    print(f"[INFO] Wrote minimal CSV (no merging) to: {OUTPUT_CSV}", file=sys.stderr)
+    print(f"[INFO] Appended {written} new rows ({duplicates} duplicates skipped) "
+          f"to: {OUTPUT_CSV}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+"""
+Persisted clustering model: imputer reference set, scaler and KMeans centroids as one versioned artifact.
+
+build reproduces imputation.py + clustering.py once (KNN imputation over the
+six score columns, StandardScaler on the four core scores, KMeans) and saves:
+
+    clustering/output/cluster_model/<version>.npz   arrays (reference rows, scaler, centroids, drift baseline)
+    clustering/output/cluster_model/latest.json     current version + history
+
+The version is a hash of the arrays. After that, new or changed rows are
+assigned with NumPy only: impute against the reference set (same donors and
+averaging as sklearn's KNNImputer), scale, argmin distance to the centroids.
+Nothing is refitted.
+
+    update   online mini-batch step: each centroid moves toward its new members with a
+             per-centroid 1/count learning rate (as MiniBatchKMeans does). Saved as a
+             new version whose parent is the old one
+    drift    compares new rows with the training baseline: within-cluster distance ratio,
+             mean shift of the scaled features, PSI of the cluster shares, and how far the
+             centroids moved. Refit when any of them crosses its threshold
+
+    python clustering/cluster_model.py build  --data clustering/data/clustering_data.csv
+    python clustering/cluster_model.py assign --data new_scores.csv
+    python clustering/cluster_model.py drift  --data new_scores.csv
+    python clustering/cluster_model.py update --data new_scores.csv
+"""
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CORE_COLS = ['gpi_score', 'ppi_score', 'gti_score', 'pvi_score']
+AUX_COLS = ['numbeo_safety_index', 'numbeo_crime_index']
+IMPUTE_COLS = CORE_COLS + AUX_COLS          # order used by imputation.py
+N_NEIGHBORS = 5
+DENSE_REFERENCE_MAX = 5_000         # reference rows; above this imputation goes through knn_impute's tree indexes
+K = 5
+SEED = 42
+MODEL_DIR = "clustering/output/cluster_model"
+
+# refit when any drift metric crosses its threshold
+DRIFT_THRESHOLDS = {"distance_ratio": 1.5, "max_mean_shift": 0.5, "psi": 0.2, "centroid_shift": 0.5}
+
+
+def nan_euclidean(A, B):
+    """
+    sklearn's nan_euclidean_distances without its input validation overhead.
+
+    Same operations in the same order (zero-filled Gram form, minus the
+    terms of coordinates missing on the other side, rescaled by n_features /
+    n_present), so distances and the order of tied neighbours match
+    KNNImputer. NaN when two rows share no coordinate.
+    """
+    A_nan, B_nan = np.isnan(A), np.isnan(B)
+    A0, B0 = np.where(A_nan, 0.0, A), np.where(B_nan, 0.0, B)
+    AA, BB = A0 * A0, B0 * B0
+    d = -2 * (A0 @ B0.T)
+    d += np.einsum("ij,ij->i", A0, A0)[:, None]
+    d += np.einsum("ij,ij->i", B0, B0)[None, :]
+    np.maximum(d, 0, out=d)
+    d -= AA @ B_nan.T
+    d -= A_nan @ BB.T
+    np.clip(d, 0, None, out=d)
+    present = (~A_nan).astype(np.float64) @ (~B_nan).astype(np.float64).T
+    d[present == 0] = np.nan
+    np.maximum(1, present, out=present)
+    d /= present
+    d *= A.shape[1]
+    return np.sqrt(d)
+
+
+def knn_impute(X, reference, n_neighbors=N_NEIGHBORS):
+    """
+    Fill NaNs in X from the n_neighbors nearest rows of reference (nan-euclidean, uniform weights).
+
+    Mirrors sklearn's KNNImputer.transform: donors for a column are the
+    reference rows that have it, receivers whose distances to all donors are
+    undefined get the column mean.
+    """
+    X = np.array(X, dtype=np.float64)
+    mask = np.isnan(X)
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not len(rows):
+        return X
+    ref_mask = np.isnan(reference)
+    dist = nan_euclidean(X[rows], reference)
+    for col in range(X.shape[1]):
+        receivers = np.flatnonzero(mask[rows, col])
+        donors = np.flatnonzero(~ref_mask[:, col])
+        if not len(receivers) or not len(donors):
+            continue
+        d = dist[receivers][:, donors]
+        all_nan = np.isnan(d).all(axis=1)
+        if all_nan.any():
+            X[rows[receivers[all_nan]], col] = reference[donors, col].mean()
+            receivers, d = receivers[~all_nan], d[~all_nan]
+            if not len(receivers):
+                continue
+        k = min(n_neighbors, len(donors))
+        idx = np.argpartition(d, k - 1, axis=1)[:, :k]
+        weights = (~np.isnan(np.take_along_axis(d, idx, 1))).astype(np.float64)
+        X[rows[receivers], col] = (reference[donors, col][idx] * weights).sum(1) / weights.sum(1)
+    return X
+
+
+def _sq_distances(Z, centroids):
+    # |z|^2 - 2 z.c + |c|^2, clipped at 0 against rounding
+    d = (Z * Z).sum(1)[:, None] - 2.0 * Z @ centroids.T + (centroids * centroids).sum(1)[None, :]
+    return np.maximum(d, 0.0)
+
+
+def _psi(expected, actual, eps=1e-4):
+    expected = np.clip(expected, eps, None)
+    actual = np.clip(actual, eps, None)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+class ClusterModel:
+    """Imputer reference + scaler + centroids, with NumPy assignment, online updates and drift checks."""
+
+    ARRAYS = ("reference", "scaler_mean", "scaler_scale", "centroids", "counts",
+              "base_centroids", "base_share", "base_sq_dist")
+
+    def __init__(self, reference, scaler_mean, scaler_scale, centroids, counts=None, base_centroids=None,
+                 base_share=None, base_sq_dist=None, meta=None):
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        k = len(self.centroids)
+        self.counts = np.asarray(counts if counts is not None else np.ones(k), dtype=np.float64)
+        self.base_centroids = np.asarray(base_centroids if base_centroids is not None else self.centroids,
+                                         dtype=np.float64)
+        self.base_share = np.asarray(base_share if base_share is not None else np.full(k, 1.0 / k))
+        self.base_sq_dist = float(base_sq_dist) if base_sq_dist is not None else 1.0
+        self.meta = dict(meta or {})
+        self.meta.setdefault("impute_cols", IMPUTE_COLS)
+        self.meta.setdefault("core_cols", CORE_COLS)
+        self.meta.setdefault("n_neighbors", N_NEIGHBORS)
+        self._imputer = None
+
+    # ---- build ----
+
+    @classmethod
+    def build(cls, df, k=K, seed=SEED):
+        """Fit imputer reference, scaler and KMeans the way imputation.py and clustering.py do."""
+        from sklearn.preprocessing import StandardScaler
+
+        from knn_impute import PatternKNNImputer
+
+        from model_selection import sweep
+
+        reference = df[IMPUTE_COLS].to_numpy(dtype=np.float64)
+        imputed = PatternKNNImputer(N_NEIGHBORS).fit_transform(reference)
+        core = imputed[:, :len(CORE_COLS)]
+        scaler = StandardScaler().fit(core)
+        Z = scaler.transform(core)
+        _, models = sweep(Z, [k], seed=seed)   # shares the fitted-model cache with clustering.py
+        km = models[k]
+        labels = km.predict(Z)
+        sq = _sq_distances(Z, km.cluster_centers_)[np.arange(len(Z)), labels]
+        counts = np.bincount(labels, minlength=k).astype(np.float64)
+        meta = {"k": k, "seed": seed, "rows": len(df), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "parent": None}
+        return cls(reference, scaler.mean_, scaler.scale_, km.cluster_centers_, counts=counts,
+                   base_share=counts / counts.sum(), base_sq_dist=sq.mean(), meta=meta)
+
+    # ---- predict ----
+
+    def transform(self, X) -> np.ndarray:
+        """Raw six-column rows (NaN allowed) -> imputed, scaled core features."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if np.isnan(X).any():
+            if len(self.reference) > DENSE_REFERENCE_MAX:
+                X = self._indexed_imputer().transform(X)
+            else:
+                X = knn_impute(X, self.reference, self.meta["n_neighbors"])
+        return (X[:, :len(self.meta["core_cols"])] - self.scaler_mean) / self.scaler_scale
+
+    def _indexed_imputer(self):
+        if self._imputer is None:
+            from knn_impute import PatternKNNImputer
+
+            self._imputer = PatternKNNImputer(self.meta["n_neighbors"]).fit(self.reference)
+        return self._imputer
+
+    def assign_scaled(self, Z):
+        """(labels, squared distance to the assigned centroid) for already scaled rows."""
+        d = _sq_distances(Z, self.centroids)
+        labels = d.argmin(1)
+        return labels, d[np.arange(len(Z)), labels]
+
+    def assign(self, X):
+        return self.assign_scaled(self.transform(X))
+
+    def frame_values(self, df) -> np.ndarray:
+        return df.reindex(columns=self.meta["impute_cols"]).to_numpy(dtype=np.float64)
+
+    # ---- online update ----
+
+    def partial_fit(self, X, scaled=False):
+        """One mini-batch step: centroid += (mean of new members - centroid) * n_new / (count + n_new)."""
+        Z = np.atleast_2d(X) if scaled else self.transform(X)
+        labels, _ = self.assign_scaled(Z)
+        k = len(self.centroids)
+        n_new = np.bincount(labels, minlength=k).astype(np.float64)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, Z)
+        hit = n_new > 0
+        means = sums[hit] / n_new[hit, None]
+        rate = n_new[hit] / (self.counts[hit] + n_new[hit])
+        self.centroids[hit] += (means - self.centroids[hit]) * rate[:, None]
+        self.counts += n_new
+        return labels
+
+    # ---- drift ----
+
+    def drift(self, X, scaled=False) -> dict:
+        """Drift of new rows against the training baseline; refit is True when a threshold is crossed."""
+        Z = np.atleast_2d(X) if scaled else self.transform(X)
+        labels, sq = self.assign_scaled(Z)
+        share = np.bincount(labels, minlength=len(self.centroids)) / max(len(Z), 1)
+        spread = np.sqrt(self.base_sq_dist) or 1.0
+        metrics = {
+            "rows": int(len(Z)),
+            # mean squared distance to the assigned centroid vs the same at fit time
+            "distance_ratio": float(sq.mean() / self.base_sq_dist) if len(Z) else 0.0,
+            # training features are standardised, so their mean is 0 and std 1
+            "max_mean_shift": float(np.abs(Z.mean(0)).max()) if len(Z) else 0.0,
+            "psi": _psi(self.base_share, share),
+            # centroid movement from online updates, in units of the typical within-cluster distance
+            "centroid_shift": float(np.sqrt(((self.centroids - self.base_centroids) ** 2).sum(1)).max() / spread),
+        }
+        metrics["exceeded"] = [name for name, limit in DRIFT_THRESHOLDS.items() if metrics[name] > limit]
+        metrics["refit"] = bool(metrics["exceeded"])
+        return metrics
+
+    # ---- persistence ----
+
+    def version(self) -> str:
+        h = hashlib.sha256()
+        for name in self.ARRAYS:
+            h.update(np.ascontiguousarray(getattr(self, name), dtype=np.float64).tobytes())
+        return h.hexdigest()[:12]
+
+    def save(self, model_dir=MODEL_DIR) -> str:
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        version = self.version()
+        self.meta["version"] = version
+        np.savez(model_dir / f"{version}.npz", meta=json.dumps(self.meta),
+                 **{name: np.asarray(getattr(self, name), dtype=np.float64) for name in self.ARRAYS})
+        latest = model_dir / "latest.json"
+        history = json.loads(latest.read_text())["history"] if latest.exists() else []
+        history.append({"version": version, "parent": self.meta.get("parent"), "saved": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        latest.write_text(json.dumps({"version": version, "history": history}, indent=2))
+        return version
+
+    @classmethod
+    def load(cls, model_dir=MODEL_DIR, version=None):
+        model_dir = Path(model_dir)
+        version = version or json.loads((model_dir / "latest.json").read_text())["version"]
+        with np.load(model_dir / f"{version}.npz") as f:
+            arrays = {name: f[name] for name in cls.ARRAYS}
+            meta = json.loads(str(f["meta"]))
+        arrays["base_sq_dist"] = float(arrays["base_sq_dist"])
+        return cls(**arrays, meta=meta)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Versioned cluster model: build, assign, online update, drift.")
+    ap.add_argument("cmd", choices=["build", "assign", "update", "drift", "bench"])
+    ap.add_argument("--data", default="clustering/data/clustering_data.csv")
+    ap.add_argument("--model-dir", default=MODEL_DIR)
+    ap.add_argument("--version", default=None, help="model version to load (default: latest)")
+    ap.add_argument("--out", default=None, help="assign: write iso3,cluster,distance here")
+    ap.add_argument("-k", type=int, default=K)
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.data)
+    if args.cmd == "build":
+        model = ClusterModel.build(df, args.k)
+        print(f"[OK] saved cluster model {model.save(args.model_dir)} (k={args.k}, {len(df)} reference rows)")
+        return
+
+    model = ClusterModel.load(args.model_dir, args.version)
+    X = model.frame_values(df)
+    if args.cmd == "assign":
+        labels, sq = model.assign(X)
+        out = pd.DataFrame({"iso3": df.get("iso3"), "cluster": labels, "distance": np.sqrt(sq)})
+        if args.out:
+            out.to_csv(args.out, index=False)
+            print(f"[OK] wrote {args.out}")
+        else:
+            print(out.to_string(index=False))
+    elif args.cmd == "update":
+        parent = model.meta.get("version")
+        model.partial_fit(X)
+        model.meta["parent"] = parent
+        print(f"[OK] updated {parent} -> {model.save(args.model_dir)} with {len(X)} rows")
+        print(model.drift(X))
+    elif args.cmd == "drift":
+        metrics = model.drift(X)
+        print(json.dumps(metrics, indent=2))
+        print("[WARN] drift over threshold, run a full refit" if metrics["refit"] else "[OK] no refit needed")
+    elif args.cmd == "bench":
+        missing = np.isnan(X).any(1)
+        cases = [("1 complete row", X[~missing][:1]), ("1 row with NaNs", X[missing][:1]), (f"{len(X)} rows", X)]
+        for name, rows in cases:
+            if not len(rows):
+                continue
+            model.assign(rows)
+            reps = 2000 if len(rows) == 1 else 50
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                model.assign(rows)
+            print(f"[INFO] assign {name}: {(time.perf_counter() - t0) / reps * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,54 +10,65 @@ Original file is located at
 
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 import seaborn as sns
 
-# Load your cleaned dataset
-df = pd.read_csv("clustering/data/clustering_ready.csv")
+from model_selection import choose_k, sweep
 
-# Inspect the structure
-df.head()
 
-X = df[['gpi_score', 'ppi_score', 'gti_score', 'pvi_score']]
+def main():
+    # Load your cleaned dataset
+    df = pd.read_csv("clustering/data/clustering_ready.csv")
 
-inertias = []
-K_range = range(2, 11)
+    # Inspect the structure
+    df.head()
 
-for k in K_range:
-    model = KMeans(n_clusters=k, random_state=42)
-    model.fit(X)
-    inertias.append(model.inertia_)
+    X = df[['gpi_score', 'ppi_score', 'gti_score', 'pvi_score']]
 
-plt.figure(figsize=(6,4))
-plt.plot(K_range, inertias, 'o-', linewidth=2)
-plt.xlabel("Number of Clusters (k)")
-plt.ylabel("Inertia")
-plt.title("Elbow Method for Optimal k")
-plt.savefig("clustering/output/elbow_plot.png", bbox_inches='tight', dpi=300)
-plt.close()
+    K_range = range(2, 11)
 
-k = 5  # adjust after looking at the elbow plot
-model = KMeans(n_clusters=k, random_state=42)
-df['cluster'] = model.fit_predict(X)
+    # one parallel pass over k: inertia, silhouette and Davies-Bouldin; fits are cached by data hash
+    sweep_metrics, models = sweep(X.to_numpy(), K_range)
+    sweep_metrics.to_csv("clustering/output/k_sweep.csv", index=False)
+    print(sweep_metrics[['k', 'inertia', 'silhouette', 'davies_bouldin']].to_string(index=False))
+    inertias = sweep_metrics['inertia'].tolist()
 
-# Inspect cluster centroids
-centroids = pd.DataFrame(model.cluster_centers_, columns=X.columns)
-centroids
+    plt.figure(figsize=(6,4))
+    plt.plot(K_range, inertias, 'o-', linewidth=2)
+    plt.xlabel("Number of Clusters (k)")
+    plt.ylabel("Inertia")
+    plt.title("Elbow Method for Optimal k")
+    plt.savefig("clustering/output/elbow_plot.png", bbox_inches='tight', dpi=300)
+    plt.close()
 
+    k = 5  # adjust after looking at the elbow plot / k_sweep.csv; None picks the best silhouette
+    if k is None:
+        k = choose_k(sweep_metrics)
+    print(f"[INFO] k={k} (best silhouette in the sweep: k={choose_k(sweep_metrics)})")
+    model = models[k]  # reuse the sweep's fit instead of fitting again
+    df['cluster'] = model.labels_
 
-# Create a scatter plot matrix
-pairplot = sns.pairplot(df, vars=X.columns, hue='cluster', palette='viridis')
-plt.suptitle('Scatter Plot Matrix of Clusters', y=1.02)
-pairplot.savefig("clustering/output/scatter_matrix.png", bbox_inches='tight', dpi=300)
-plt.close()
+    # Inspect cluster centroids
+    centroids = pd.DataFrame(model.cluster_centers_, columns=X.columns)
+    centroids
 
-for cluster_id in sorted(df['cluster'].unique()):
-    countries_in_cluster = df[df['cluster'] == cluster_id]['iso3'].tolist()
-    print(f"Cluster {cluster_id}: {countries_in_cluster}")
 
-summary = df.groupby('cluster')[X.columns].mean()
-summary
+    # Create a scatter plot matrix
+    pairplot = sns.pairplot(df, vars=X.columns, hue='cluster', palette='viridis')
+    plt.suptitle('Scatter Plot Matrix of Clusters', y=1.02)
+    pairplot.savefig("clustering/output/scatter_matrix.png", bbox_inches='tight', dpi=300)
+    plt.close()
 
-df.to_csv("clustering/output/clustering_output.csv", index=False)
\ No newline at end of file
+    for cluster_id in sorted(df['cluster'].unique()):
+        countries_in_cluster = df[df['cluster'] == cluster_id]['iso3'].tolist()
+        print(f"Cluster {cluster_id}: {countries_in_cluster}")
+
+    summary = df.groupby('cluster')[X.columns].mean()
+    summary
+
+    df.to_csv("clustering/output/clustering_output.csv", index=False)
+
+
+# sweep() starts a process pool: under spawn (the macOS default) workers re-import
+# this file, so the script body must only run in the parent
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 #Implement Imputation Using Clustering Techniques
 
-from sklearn.impute import KNNImputer
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
 
+from knn_impute import PatternKNNImputer
+
 df = pd.read_csv("clustering/data/clustering_data.csv")
 
 core_cols = ['gpi_score', 'ppi_score', 'gti_score', 'pvi_score']
@@ -11,8 +12,8 @@ aux_cols  = ['numbeo_safety_index', 'numbeo_crime_index']
 
 X_full = df[core_cols + aux_cols]
 
-# Step 1: Impute using all six
-imputer = KNNImputer(n_neighbors=5)
+# Step 1: Impute using all six (KNNImputer(n_neighbors=5)'s result, indexed per missingness pattern; see knn_impute.py on ties)
+imputer = PatternKNNImputer(n_neighbors=5)
 X_imputed = imputer.fit_transform(X_full)
 
 # Step 2: Create new DataFrame
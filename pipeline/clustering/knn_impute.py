@@ -0,0 +1,270 @@
+"""
+KNN imputation through per-pattern tree indexes, a drop-in for KNNImputer(n_neighbors=5).
+
+KNNImputer computes the full NaN-aware distance matrix between the rows to
+impute and every fitted row, which is O(n^2) time. Here rows are grouped by
+missingness pattern instead:
+
+    donors     fitted rows, grouped by which columns they observe (pattern Q)
+    receivers  rows with NaNs, grouped by pattern P
+
+For a receiver in P and a donor in Q the nan-euclidean distance only uses
+the columns both observe, S = P & Q, scaled by sqrt(n_features / |S|). The
+scale is the same for every donor in Q, so the k nearest donors of Q are a
+plain euclidean k-NN query on the S columns. For each receiver pattern,
+donors are grouped by (S, missing column c they observe) and one KD-tree
+(BallTree above KDTREE_MAX_DIMS columns) is built per group and reused. The
+k nearest donors for c are then the k smallest among the per-group results.
+Rare patterns (receivers x donors under BRUTE_FORCE_PAIRS) are answered by a
+direct distance block instead, since building a tree would cost more.
+
+That is KNNImputer's neighbour set (uniform weights, column mean when no
+donor shares a column with the receiver) whenever the k-th nearest donor is
+unique. With ties at the k-th distance, e.g. many donors at distance 0 when
+the receiver only observes gti_score, KNNImputer keeps whichever tied donors
+np.argpartition leaves in front. Each group therefore returns k + 1 donors,
+and receivers whose k-th and (k + 1)-th distances are equal up to TIE_RTOL
+are recomputed the way KNNImputer does it: nan_euclidean_distances to every
+fitted row, then argpartition over the donors of the column. One caveat
+remains: donors tied in exact arithmetic can differ in KNNImputer's Gram-form
+distances by BLAS rounding (~1e-8), which depends on where the receiver sits
+in KNNImputer's own distance chunk, so a handful of such receivers can still
+get a different (equally near) donor. The bench reports both clean and tied
+data (--bench, "ties" rows).
+
+Receivers are processed in chunks of chunk_rows, so working memory is
+O(chunk_rows * k * groups) on top of the trees (one copy of the shared
+donor columns per group), plus blocks of BRUTE_FORCE_PAIRS distances for
+tied receivers.
+
+    python clustering/knn_impute.py --bench 1000 5000 20000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.neighbors import BallTree, KDTree
+
+N_NEIGHBORS = 5
+CHUNK_ROWS = 4096
+LEAF_SIZE = 40
+KDTREE_MAX_DIMS = 16
+BRUTE_FORCE_PAIRS = 4_000_000    # receivers x donors below which a pattern skips the tree
+TIE_RTOL = 1e-8                 # squared-distance gap, relative to the squared norms, treated as a tie
+DENSE_BENCH_MAX = 20_000        # rows; KNNImputer is only timed up to this size
+SEED = 42
+COLUMNS = ['gpi_score', 'ppi_score', 'gti_score', 'pvi_score', 'numbeo_safety_index', 'numbeo_crime_index']
+
+
+def _pattern_groups(mask):
+    """{observed-columns tuple: row indices} for a boolean missing mask."""
+    keys, inverse = np.unique(~mask, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+    return {tuple(k): order[bounds[i]:bounds[i + 1]] for i, k in enumerate(keys)}
+
+
+class PatternKNNImputer:
+    """KNNImputer (uniform weights, nan-euclidean) answered from per-missingness-pattern tree indexes."""
+
+    def __init__(self, n_neighbors=N_NEIGHBORS, chunk_rows=CHUNK_ROWS, leaf_size=LEAF_SIZE):
+        self.n_neighbors = n_neighbors
+        self.chunk_rows = chunk_rows
+        self.leaf_size = leaf_size
+        self._groups_cache = {}
+        self._trees = {}
+        self._column_donors = {}
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        self.fit_X_ = X
+        mask = np.isnan(X)
+        with np.errstate(invalid="ignore"):
+            counts = (~mask).sum(0)
+            self.col_means_ = np.where(counts > 0, np.nansum(X, 0) / np.maximum(counts, 1), np.nan)
+        self.donor_groups_ = _pattern_groups(mask)
+        self._groups_cache = {}
+        self._trees = {}
+        self._column_donors = {}
+        return self
+
+    def _groups(self, observed):
+        """
+        [(column, shared columns, scale, donor rows)] for receivers observing exactly the columns in observed.
+
+        Donors are grouped by the columns they share with the receiver
+        (which fixes the distance scale) and by the missing column they can fill.
+        """
+        if observed not in self._groups_cache:
+            n_features = len(observed)
+            missing = [c for c in range(n_features) if not observed[c]]
+            groups = {}
+            for q, donors in self.donor_groups_.items():
+                shared = tuple(j for j in range(n_features) if observed[j] and q[j])
+                if not shared:
+                    continue
+                for c in missing:
+                    if q[c]:
+                        groups.setdefault((c, shared), []).append(donors)
+            self._groups_cache[observed] = [(c, shared, np.sqrt(n_features / len(shared)), np.sort(np.concatenate(parts)))
+                                            for (c, shared), parts in sorted(groups.items())]
+        return self._groups_cache[observed]
+
+    def _query(self, observed, group, queries, n_receivers):
+        """(distances, donor rows) of the k + 1 nearest donors in one group (one extra to detect ties)."""
+        c, shared, scale, donors = group
+        k = min(self.n_neighbors + 1, len(donors))
+        key = (observed, c, shared)
+        points = self.fit_X_[donors][:, list(shared)] if key not in self._trees else None
+        if key not in self._trees and n_receivers * len(donors) <= BRUTE_FORCE_PAIRS:
+            # a tree does not pay for itself on a handful of receivers
+            d = (queries * queries).sum(1)[:, None] - 2 * queries @ points.T + (points * points).sum(1)[None, :]
+            idx = np.argpartition(d, k - 1, axis=1)[:, :k] if k < len(donors) else np.tile(np.arange(k), (len(d), 1))
+            dist = np.sqrt(np.maximum(np.take_along_axis(d, idx, 1), 0))
+        else:
+            if key not in self._trees:
+                cls = KDTree if len(shared) <= KDTREE_MAX_DIMS else BallTree
+                self._trees[key] = cls(points, leaf_size=self.leaf_size)
+            dist, idx = self._trees[key].query(queries, k=k)
+        return dist * scale, donors[idx]
+
+    def _impute_chunk(self, rows, observed, n_receivers):
+        """Fill the missing columns of rows, which all observe exactly the columns in observed."""
+        original = rows.copy()
+        found = {c: ([], []) for c in range(rows.shape[1]) if not observed[c]}   # column -> (distances, donors)
+        for group in self._groups(observed):
+            c, shared = group[:2]
+            dist, idx = self._query(observed, group, original[:, list(shared)], n_receivers)
+            found[c][0].append(dist)
+            found[c][1].append(idx)
+        n = self.n_neighbors
+        sq_norm = np.nansum(original * original, 1) * rows.shape[1]
+        tied = {}
+        for c, (dists, idxs) in found.items():
+            if not dists:
+                rows[:, c] = self.col_means_[c]
+                continue
+            dist, idx = np.hstack(dists), np.hstack(idxs)
+            order = np.argsort(dist, axis=1, kind="stable")
+            dist, idx = np.take_along_axis(dist, order, 1), np.take_along_axis(idx, order, 1)
+            rows[:, c] = self.fit_X_[idx[:, :n], c].mean(1)
+            if dist.shape[1] > n:
+                # k-th and (k + 1)-th donor tie: KNNImputer's pick depends on argpartition, so ask it the same way
+                gap = dist[:, n] ** 2 - dist[:, n - 1] ** 2
+                tied[c] = gap <= TIE_RTOL * (1 + sq_norm + dist[:, n] ** 2)
+        if tied:
+            self._impute_tied(rows, original, tied)
+        return rows
+
+    def _impute_tied(self, rows, original, tied):
+        """
+        Refill {column: receiver mask} exactly as KNNImputer picks donors.
+
+        Distances from each tied receiver to every fitted row are computed once,
+        with KNNImputer's nan_euclidean_distances, and the donors of each column
+        are then chosen by argpartition over that row.
+        """
+        from sklearn.metrics.pairwise import nan_euclidean_distances
+
+        any_tied = np.flatnonzero(np.any(list(tied.values()), axis=0))
+        step = max(2, BRUTE_FORCE_PAIRS // len(self.fit_X_))
+        for start in range(0, len(any_tied), step):
+            block = any_tied[start:start + step]
+            # never a single-row product: BLAS answers that with a matrix-vector kernel
+            # whose rounding can reorder near-ties
+            queries = original[block] if len(block) > 1 else np.repeat(original[block], 2, 0)
+            d_all = nan_euclidean_distances(queries, self.fit_X_)[:len(block)]
+            for c, mask in tied.items():
+                sel = np.flatnonzero(mask[block])
+                if not len(sel):
+                    continue
+                if c not in self._column_donors:
+                    self._column_donors[c] = np.flatnonzero(~np.isnan(self.fit_X_[:, c]))
+                donors = self._column_donors[c]
+                k = min(self.n_neighbors, len(donors))
+                d = d_all[sel][:, donors]
+                idx = np.argpartition(d, k - 1, axis=1)[:, :k]
+                values = np.where(np.isnan(np.take_along_axis(d, idx, 1)), np.nan, self.fit_X_[donors[idx], c])
+                rows[block[sel], c] = np.nanmean(values, 1)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        mask = np.isnan(X)
+        for observed, rows in _pattern_groups(mask).items():
+            if all(observed):
+                continue
+            for start in range(0, len(rows), self.chunk_rows):
+                part = rows[start:start + self.chunk_rows]
+                X[part] = self._impute_chunk(X[part], observed, len(rows))
+        return X
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+
+def synthetic(n_rows, n_features=6, missing_rate=(0.07, 0.09, 0.07, 0.01, 0.19, 0.19), ties=False, seed=SEED):
+    """
+    Clustered rows with per-column missing rates like clustering_data.csv.
+
+    ties=True rounds to two decimals, zeroes a third of gti_score and leaves 5% of
+    the rows with gti_score only, so many donors sit at the same distance.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 1, (8, n_features))
+    X = centers[rng.integers(0, len(centers), n_rows)] + rng.normal(0, 0.3, (n_rows, n_features))
+    X[rng.random(X.shape) < np.asarray(missing_rate)[:n_features]] = np.nan
+    if ties:
+        gti = COLUMNS.index("gti_score")
+        X = np.round(X, 2)
+        X[rng.random(n_rows) < 1 / 3, gti] = 0.0
+        only_gti = rng.random(n_rows) < 0.05
+        X[np.ix_(only_gti, [j for j in range(n_features) if j != gti])] = np.nan
+    return X
+
+
+def bench(sizes, n_neighbors=N_NEIGHBORS, dense_max=DENSE_BENCH_MAX):
+    from sklearn.impute import KNNImputer
+
+    print(f"{'rows':>8s} {'data':>6s} {'patterns':>8s} {'index s':>9s} {'KNNImputer s':>13s} {'speedup':>8s} "
+          f"{'max |diff|':>11s} {'differ':>7s}")
+    for n in sizes:
+        for ties in (False, True):
+            X = synthetic(n, ties=ties)
+            label = "ties" if ties else "plain"
+            t0 = time.perf_counter()
+            ours = PatternKNNImputer(n_neighbors).fit_transform(X)
+            t_ours = time.perf_counter() - t0
+            patterns = len(_pattern_groups(np.isnan(X)))
+            if n <= dense_max:
+                t0 = time.perf_counter()
+                ref = KNNImputer(n_neighbors=n_neighbors).fit_transform(X)
+                t_ref = time.perf_counter() - t0
+                diff = np.abs(ours - ref)
+                print(f"{n:8d} {label:>6s} {patterns:8d} {t_ours:9.2f} {t_ref:13.2f} {t_ref / t_ours:7.1f}x "
+                      f"{diff.max():11.2e} {int((diff > 1e-9).sum()):7d}")
+            else:
+                print(f"{n:8d} {label:>6s} {patterns:8d} {t_ours:9.2f} {'-':>13s} {'-':>8s} {'-':>11s} {'-':>7s}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tree-indexed KNN imputation; compare with KNNImputer.")
+    ap.add_argument("--bench", type=int, nargs="+", default=[1000, 5000, 20000, 100000],
+                    help="synthetic row counts to time (KNNImputer only up to %d rows)" % DENSE_BENCH_MAX)
+    ap.add_argument("--data", default=None, help="CSV to check against KNNImputer instead of benchmarking")
+    args = ap.parse_args()
+
+    if args.data:
+        import pandas as pd
+        from sklearn.impute import KNNImputer
+
+        X = pd.read_csv(args.data)[COLUMNS].to_numpy(dtype=np.float64)
+        diff = np.abs(PatternKNNImputer().fit_transform(X) - KNNImputer(n_neighbors=N_NEIGHBORS).fit_transform(X))
+        print(f"[INFO] {len(X)} rows, {int(np.isnan(X).sum())} missing values; max |diff| vs KNNImputer {diff.max():.2e} "
+              f"({int((diff > 1e-9).sum())} values differ)")
+        return
+    bench(args.bench)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Model selection for the KMeans clustering stage.
+
+sweep() fits every k of a range in one pass and scores each fit with
+
+    inertia
+    silhouette       sampled (silhouette_sample rows) once n is larger than that
+    Davies-Bouldin
+
+Fits run in a process pool (one BLAS/OpenMP thread per worker, so workers do
+not oversubscribe the cores). Scripts must call sweep() under an
+if __name__ == "__main__" guard, since spawned workers re-import them. Each
+fitted model is cached on disk under .model_cache/, keyed by a hash of the
+data, k, backend and seed, so a rerun on unchanged data loads the fits
+instead of refitting. clustering.py takes the
+chosen k's model from the sweep instead of fitting it again.
+
+Above minibatch_threshold rows the backend switches from KMeans to
+MiniBatchKMeans, so the same stage works for ~200 countries and for 100k+
+sub-national regions.
+
+    python clustering/model_selection.py --data clustering/data/clustering_ready.csv
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+CACHE_DIR = Path(__file__).resolve().parent / ".model_cache"
+FEATURES = ['gpi_score', 'ppi_score', 'gti_score', 'pvi_score']
+K_RANGE = range(2, 11)
+SEED = 42
+MINIBATCH_THRESHOLD = 20_000    # rows; MiniBatchKMeans above this
+SILHOUETTE_SAMPLE = 10_000      # rows; silhouette is O(n^2), so sample above this
+
+_X = None   # worker-side copy of the data, set once per process
+
+
+def data_hash(X) -> str:
+    """Content hash of a float matrix (shape, dtype and bytes)."""
+    X = np.ascontiguousarray(X)
+    h = hashlib.sha256(f"{X.shape}|{X.dtype}".encode("ascii"))
+    h.update(X.tobytes())
+    return h.hexdigest()
+
+
+def backend_for(n_rows, threshold=MINIBATCH_THRESHOLD) -> str:
+    return "minibatch" if n_rows > threshold else "kmeans"
+
+
+def make_model(k, backend, seed=SEED):
+    if backend == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=4096, n_init=3)
+    return KMeans(n_clusters=k, random_state=seed)
+
+
+def score(X, labels, silhouette_sample=SILHOUETTE_SAMPLE, seed=SEED) -> dict:
+    """Silhouette (sampled for large n) and Davies-Bouldin for one labelling."""
+    if len(np.unique(labels)) < 2:
+        return {"silhouette": float("nan"), "davies_bouldin": float("nan")}
+    sample = silhouette_sample if len(X) > silhouette_sample else None
+    return {"silhouette": float(silhouette_score(X, labels, sample_size=sample, random_state=seed)),
+            "davies_bouldin": float(davies_bouldin_score(X, labels))}
+
+
+def fit_one(X, k, backend, seed=SEED, silhouette_sample=SILHOUETTE_SAMPLE):
+    """(metrics, fitted model) for one k."""
+    t0 = time.perf_counter()
+    model = make_model(k, backend, seed).fit(X)
+    metrics = {"k": k, "backend": backend, "inertia": float(model.inertia_),
+               **score(X, model.labels_, silhouette_sample, seed),
+               "fit_seconds": time.perf_counter() - t0}
+    return metrics, model
+
+
+def _init_worker(X, threads):
+    global _X
+    _X = X
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+
+
+def _fit_in_worker(args):
+    return fit_one(_X, *args)
+
+
+def _cache_path(cache_dir, digest, backend, k, seed) -> Path:
+    return Path(cache_dir) / f"{digest[:20]}-{backend}-k{k}-s{seed}.joblib"
+
+
+def sweep(X, k_values=K_RANGE, seed=SEED, n_jobs=None, cache_dir=CACHE_DIR, use_cache=True,
+          minibatch_threshold=MINIBATCH_THRESHOLD, silhouette_sample=SILHOUETTE_SAMPLE):
+    """
+    Fit and score every k; returns (metrics DataFrame sorted by k, {k: fitted model}).
+
+    Fits found in cache_dir are loaded; the rest run on a pool of n_jobs
+    processes (default: one per core, at most one per k).
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    backend = backend_for(len(X), minibatch_threshold)
+    digest = data_hash(X)
+    rows, models, todo = [], {}, []
+    for k in k_values:
+        path = _cache_path(cache_dir, digest, backend, k, seed)
+        if use_cache and path.exists():
+            entry = joblib.load(path)
+            rows.append({**entry["metrics"], "cached": True})
+            models[k] = entry["model"]
+        else:
+            todo.append(k)
+
+    if todo:
+        workers = max(1, min(n_jobs or os.cpu_count() or 1, len(todo)))
+        args = [(k, backend, seed, silhouette_sample) for k in todo]
+        if workers == 1:
+            results = [fit_one(X, *a) for a in args]
+        else:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, threads)) as pool:
+                results = list(pool.map(_fit_in_worker, args))
+        for metrics, model in results:
+            rows.append({**metrics, "cached": False})
+            models[metrics["k"]] = model
+            if use_cache:
+                path = _cache_path(cache_dir, digest, backend, metrics["k"], seed)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                joblib.dump({"metrics": metrics, "model": model}, path)
+
+    metrics = pd.DataFrame(rows).sort_values("k").reset_index(drop=True)
+    print(f"[INFO] k sweep over {len(X)} rows ({backend}): {len(todo)} fitted, "
+          f"{len(metrics) - len(todo)} from cache")
+    return metrics, models
+
+
+def choose_k(metrics, method="silhouette") -> int:
+    """Best k by highest silhouette, lowest Davies-Bouldin, or the elbow of the inertia curve."""
+    if method == "silhouette":
+        return int(metrics.loc[metrics["silhouette"].idxmax(), "k"])
+    if method == "davies_bouldin":
+        return int(metrics.loc[metrics["davies_bouldin"].idxmin(), "k"])
+    if method == "elbow":
+        # point furthest from the straight line between the first and last (k, inertia)
+        k = metrics["k"].to_numpy(float)
+        y = metrics["inertia"].to_numpy(float)
+        k_n = (k - k[0]) / (k[-1] - k[0])
+        y_n = (y - y[-1]) / (y[0] - y[-1])
+        return int(k[np.argmax(np.abs(1 - k_n - y_n))])
+    raise ValueError(f"unknown method {method!r} (expected 'silhouette', 'davies_bouldin' or 'elbow')")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel, cached KMeans k sweep.")
+    ap.add_argument("--data", default="clustering/data/clustering_ready.csv")
+    ap.add_argument("--k-min", type=int, default=K_RANGE.start)
+    ap.add_argument("--k-max", type=int, default=K_RANGE.stop - 1)
+    ap.add_argument("-j", "--jobs", type=int, default=None)
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--synthetic", type=int, default=0, help="sweep N synthetic rows instead (scaling check)")
+    args = ap.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(SEED)
+        centers = rng.normal(0, 3, (6, len(FEATURES)))
+        X = centers[rng.integers(0, len(centers), args.synthetic)] + rng.normal(0, 1, (args.synthetic, len(FEATURES)))
+    else:
+        X = pd.read_csv(args.data)[FEATURES].to_numpy()
+
+    t0 = time.perf_counter()
+    metrics, _ = sweep(X, range(args.k_min, args.k_max + 1), n_jobs=args.jobs, use_cache=not args.no_cache)
+    print(metrics.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"[INFO] sweep took {time.perf_counter() - t0:.2f}s; best k by silhouette {choose_k(metrics)}, "
+          f"Davies-Bouldin {choose_k(metrics, 'davies_bouldin')}, elbow {choose_k(metrics, 'elbow')}")
+
+
+if __name__ == "__main__":
+    main()
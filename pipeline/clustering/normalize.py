@@ -1,17 +1,165 @@
-from sklearn.preprocessing import StandardScaler
+"""
+Fit-once normalization of the unified scores.
+
+    fit    one streamed pass over the input: per-column max, mean and std
+           (population std, NaNs skipped, like StandardScaler). Saved to
+           clustering/data/normalization.json together with the direction flips
+    apply  streams the input in chunks and writes
+           (max - x  for the flipped columns, x otherwise - mean) / std
+           to a separate output; the input is never modified
+
+gpi_score, numbeo_crime_index and gti_score are flipped (max - value) so that
+higher means safer for every column. The parameters are only refitted with
+--refit, so rerunning is idempotent and new rows are transformed with the
+saved parameters without reprocessing history:
+
+    python clustering/normalize.py                                   # fit if needed, then apply
+    python clustering/normalize.py --input new_rows.parquet --output new_rows_normalized.parquet
+    python clustering/normalize.py --refit
+
+CSV and Parquet are read and written chunk by chunk, by file extension.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-# Load the CSV file
-data = pd.read_csv('clustering/data/unified_cleaned.csv')  # Load the CSV file
+COLUMNS = ['gpi_score', 'ppi_score', 'numbeo_safety_index', 'numbeo_crime_index', 'gti_score']
+FLIP = ['gpi_score', 'numbeo_crime_index', 'gti_score']    # reversed so that higher = safer
+INPUT = "clustering/data/unified_cleaned.csv"
+OUTPUT = "clustering/data/unified_normalized.csv"
+PARAMS = "clustering/data/normalization.json"
+CHUNK_ROWS = 100_000
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, columns=None):
+    """DataFrame chunks of a CSV or Parquet file."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, usecols=columns)
+
+
+class Normalizer:
+    """Direction flips + standardisation with persisted parameters."""
+
+    def __init__(self, columns, flip, maximum, mean, std, meta=None):
+        self.columns = list(columns)
+        self.flip = list(flip)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.meta = dict(meta or {})
+        # out = x * scale + offset, folded once from the flips and the moments
+        sign = np.where(np.isin(self.columns, self.flip), -1.0, 1.0)
+        base = np.where(sign < 0, self.maximum, 0.0)
+        safe_std = np.where(self.std > 0, self.std, 1.0)      # constant columns, as StandardScaler
+        self.scale = sign / safe_std
+        self.offset = (base - self.mean) / safe_std
+
+    @classmethod
+    def fit(cls, path, columns=COLUMNS, flip=FLIP, chunk_rows=CHUNK_ROWS):
+        """One pass: count, mean and M2 per column merged chunk by chunk (Chan et al.), plus the max."""
+        n = np.zeros(len(columns))
+        mean = np.zeros(len(columns))
+        m2 = np.zeros(len(columns))
+        maximum = np.full(len(columns), -np.inf)
+        rows = 0
+        for chunk in iter_chunks(path, chunk_rows, columns):
+            X = chunk[columns].to_numpy(dtype=np.float64)
+            rows += len(X)
+            observed = ~np.isnan(X)
+            n_b = observed.sum(0)
+            if not n_b.any():
+                continue
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_b = np.where(n_b > 0, np.nansum(X, 0) / n_b, 0.0)
+                m2_b = np.nansum((X - mean_b) ** 2, 0)
+                maximum = np.maximum(maximum, np.where(observed, X, -np.inf).max(0))
+                total = n + n_b
+                delta = mean_b - mean
+                mean = np.where(total > 0, mean + delta * n_b / total, 0.0)
+                m2 = m2 + m2_b + np.where(total > 0, delta ** 2 * n * n_b / total, 0.0)
+            n = total
+        if not (n > 0).all():
+            raise ValueError(f"no values for {[c for c, k in zip(columns, n) if not k]} in {path}")
+        flipped = np.isin(columns, flip)
+        # moments of max - x: mean becomes max - mean, std is unchanged
+        mean = np.where(flipped, maximum - mean, mean)
+        std = np.sqrt(m2 / n)
+        meta = {"source": str(path), "rows": rows, "fitted": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        return cls(columns, flip, maximum, mean, std, meta)
+
+    def transform(self, df) -> pd.DataFrame:
+        out = df.copy()
+        out[self.columns] = df[self.columns].to_numpy(dtype=np.float64) * self.scale + self.offset
+        return out
+
+    def apply(self, src, dst, chunk_rows=CHUNK_ROWS) -> int:
+        """Normalize src into dst chunk by chunk; dst is written to a temporary file and renamed."""
+        dst = Path(dst)
+        tmp = dst.with_name(dst.name + ".tmp")
+        rows = 0
+        writer = None
+        try:
+            for i, chunk in enumerate(iter_chunks(src, chunk_rows)):
+                chunk = self.transform(chunk)
+                rows += len(chunk)
+                if dst.suffix == ".parquet":
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = writer or pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table)
+                else:
+                    chunk.to_csv(tmp, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
+        tmp.replace(dst)
+        return rows
+
+    def save(self, path=PARAMS) -> None:
+        params = {"columns": self.columns, "flip": self.flip, "max": self.maximum.tolist(),
+                  "mean": self.mean.tolist(), "std": self.std.tolist(), **self.meta}
+        Path(path).write_text(json.dumps(params, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path=PARAMS):
+        p = json.loads(Path(path).read_text(encoding="utf-8"))
+        meta = {k: v for k, v in p.items() if k not in ("columns", "flip", "max", "mean", "std")}
+        return cls(p["columns"], p["flip"], p["max"], p["mean"], p["std"], meta)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fit-once, streamed normalization of the unified scores.")
+    ap.add_argument("--input", default=INPUT)
+    ap.add_argument("--output", default=OUTPUT)
+    ap.add_argument("--params", default=PARAMS)
+    ap.add_argument("--refit", action="store_true", help="refit the parameters on --input")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args()
 
-# Reverse undesired direction
-for col in ['gpi_score', 'numbeo_crime_index', 'gti_score']:
-    data[col] = data[col].max() - data[col]
+    if args.refit or not Path(args.params).exists():
+        norm = Normalizer.fit(args.input, chunk_rows=args.chunk_rows)
+        norm.save(args.params)
+        print(f"[INFO] fitted normalization on {norm.meta['rows']} rows -> {args.params}")
+    else:
+        norm = Normalizer.load(args.params)
+        print(f"[INFO] using normalization fitted {norm.meta.get('fitted')} on {norm.meta.get('source')}")
 
-scaler = StandardScaler()
-cols = ['gpi_score', 'ppi_score', 'numbeo_safety_index', 'numbeo_crime_index', 'gti_score']
-data[cols] = scaler.fit_transform(data[cols])
+    t0 = time.perf_counter()
+    rows = norm.apply(args.input, args.output, args.chunk_rows)
+    print(f"[OK] normalized {rows} rows into {args.output} in {time.perf_counter() - t0:.2f}s")
 
 
-# Save the updated DataFrame back to the CSV file
-data.to_csv('clustering/data/unified_cleaned.csv', index=False)  # Save the updated DataFrame
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+What-if scenarios over the persisted cluster model (cluster_model.py).
+
+A scenario perturbs the four core scores in their original units, for all
+countries or for a subset (a region, given as iso3 codes):
+
+    {"name": "gti +20% in the Sahel", "change": {"gti_score": 0.2}, "countries": ["MLI", "NER", "BFA"]}
+    {"name": "gpi +0.3 everywhere",   "add": {"gpi_score": 0.3}}
+
+i.e. raw' = raw * (1 + change) + add on the selected countries. Thousands of
+scenarios run at once as broadcast NumPy operations. The baseline rows are
+imputed once (the auxiliary Numbeo columns only feed imputation). Because
+normalization (normalize.py) and the cluster scaler are both per-column
+affine maps, they fold into one scale and offset per column. Assignment only
+needs argmin_k |c_k|^2 - 2 z.c_k, so that product is taken once per scenario
+chunk for every (scenario, country, centroid) with a single einsum.
+
+run() returns a ScenarioResult with the cluster of every country under every
+scenario, and transitions() lists the countries that change cluster:
+
+    python clustering/scenarios.py --spec scenarios.json
+    python clustering/scenarios.py --bench 10000
+
+Without normalization params (clustering/data/normalization.json) the
+perturbations are applied to the values as stored in the model input.
+"""
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cluster_model import MODEL_DIR, ClusterModel
+from normalize import PARAMS, Normalizer
+
+DATA = "clustering/data/clustering_data.csv"
+CHUNK_SCENARIOS = 2048      # scenarios per einsum block: chunk x countries x k floats
+
+
+@dataclass
+class ScenarioResult:
+    names: list
+    countries: list
+    baseline: np.ndarray        # (countries,) cluster under the unperturbed data
+    labels: np.ndarray          # (scenarios, countries)
+
+    @property
+    def changed(self) -> np.ndarray:
+        return self.labels != self.baseline[None, :]
+
+    def summary(self) -> pd.DataFrame:
+        """Per scenario: how many countries move and the resulting cluster sizes."""
+        k = int(max(self.labels.max(initial=0), self.baseline.max(initial=0))) + 1
+        rows = np.arange(len(self.labels))[:, None] * k
+        sizes = np.bincount((self.labels + rows).ravel(), minlength=len(self.labels) * k).reshape(-1, k)
+        out = pd.DataFrame(sizes, columns=[f"size_{c}" for c in range(k)])
+        out.insert(0, "moved", self.changed.sum(1))
+        out.insert(0, "scenario", self.names)
+        return out
+
+    def transitions(self) -> pd.DataFrame:
+        """One row per (scenario, country) that changes cluster."""
+        s, n = np.nonzero(self.changed)
+        return pd.DataFrame({"scenario": np.asarray(self.names, dtype=object)[s],
+                             "iso3": np.asarray(self.countries, dtype=object)[n],
+                             "from_cluster": self.baseline[n], "to_cluster": self.labels[s, n]})
+
+
+class ScenarioEngine:
+    """Batched cluster assignment of perturbed copies of the baseline countries."""
+
+    def __init__(self, model: ClusterModel, frame: pd.DataFrame, normalizer: Normalizer = None):
+        self.model = model
+        self.core = list(model.meta["core_cols"])
+        self.countries = frame["iso3"].astype(object).tolist() if "iso3" in frame else list(range(len(frame)))
+        values = model.transform(model.frame_values(frame))           # imputed + cluster-scaled
+        self.baseline = model.assign_scaled(values)[0]
+
+        # per core column: stored value = raw * norm_scale + norm_offset (identity when not normalized)
+        norm_scale = np.ones(len(self.core))
+        norm_offset = np.zeros(len(self.core))
+        if normalizer is not None:
+            for j, col in enumerate(self.core):
+                if col in normalizer.columns:
+                    i = normalizer.columns.index(col)
+                    norm_scale[j], norm_offset[j] = normalizer.scale[i], normalizer.offset[i]
+        # raw -> cluster space in one affine map: z = raw * g + h
+        g = norm_scale / model.scaler_scale
+        h = (norm_offset - model.scaler_mean) / model.scaler_scale
+        self.raw = (values - h) / g                                    # (countries, core) in original units
+        C = model.centroids
+        self._G = g[:, None] * C.T                                     # (core, k)
+        self._base = (C * C).sum(1) - 2 * h @ C.T                      # (k,)
+        self._raw_G = self.raw @ self._G                               # (countries, k)
+
+    def matrices(self, scenarios):
+        """Scenario dicts -> (names, change (S, core), add (S, core), country mask (S, countries) or None)."""
+        index = {c: i for i, c in enumerate(self.countries)}
+        change = np.zeros((len(scenarios), len(self.core)))
+        add = np.zeros((len(scenarios), len(self.core)))
+        mask = None
+        names = []
+        for s, spec in enumerate(scenarios):
+            names.append(spec.get("name", f"scenario_{s}"))
+            for key, target in (("change", change), ("add", add)):
+                for col, v in spec.get(key, {}).items():
+                    if col not in self.core:
+                        raise ValueError(f"scenario {names[-1]!r}: {col!r} is not one of {self.core}")
+                    target[s, self.core.index(col)] = v
+            if spec.get("countries") is not None:
+                if mask is None:
+                    mask = np.ones((len(scenarios), len(self.countries)), dtype=bool)
+                unknown = [c for c in spec["countries"] if c not in index]
+                if unknown:
+                    print(f"[WARN] scenario {names[-1]!r}: unknown countries {unknown}")
+                mask[s] = False
+                mask[s, [index[c] for c in spec["countries"] if c in index]] = True
+        return names, change, add, mask
+
+    def run(self, change, add=None, mask=None, names=None, chunk=CHUNK_SCENARIOS) -> ScenarioResult:
+        """
+        Cluster of every country under every scenario.
+
+        change / add are (S, core) relative and absolute perturbations in
+        original units; mask (S, countries) selects where each scenario applies.
+        """
+        change = np.atleast_2d(np.asarray(change, dtype=np.float64))
+        n_scenarios = len(change)
+        add = np.zeros_like(change) if add is None else np.atleast_2d(np.asarray(add, dtype=np.float64))
+        labels = np.empty((n_scenarios, len(self.countries)), dtype=np.int16)
+        for start in range(0, n_scenarios, chunk):
+            stop = min(start + chunk, n_scenarios)
+            # raw' G = raw G + w * (raw (change * G) + add G); only the perturbation term is per scenario
+            delta = np.einsum("nd,sdk->snk", self.raw, change[start:stop, :, None] * self._G[None])
+            delta += (add[start:stop] @ self._G)[:, None, :]
+            if mask is not None:
+                delta *= mask[start:stop, :, None]
+            scores = self._base - 2 * (self._raw_G[None] + delta)
+            labels[start:stop] = scores.argmin(2)
+        names = names if names is not None else [f"scenario_{s}" for s in range(n_scenarios)]
+        return ScenarioResult(list(names), self.countries, self.baseline.astype(np.int16), labels)
+
+    def run_specs(self, scenarios, chunk=CHUNK_SCENARIOS) -> ScenarioResult:
+        names, change, add, mask = self.matrices(scenarios)
+        return self.run(change, add, mask, names, chunk)
+
+
+def load_engine(data=DATA, model_dir=MODEL_DIR, params=PARAMS) -> ScenarioEngine:
+    normalizer = Normalizer.load(params) if Path(params).exists() else None
+    if normalizer is None:
+        print(f"[WARN] no normalization params at {params}; perturbing the stored values directly")
+    return ScenarioEngine(ClusterModel.load(model_dir), pd.read_csv(data), normalizer)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batched what-if scenarios over the cluster model.")
+    ap.add_argument("--spec", default=None, help="JSON list of scenarios (name, change, add, countries)")
+    ap.add_argument("--bench", type=int, default=0, help="run N random scenarios and time them")
+    ap.add_argument("--data", default=DATA)
+    ap.add_argument("--model-dir", default=MODEL_DIR)
+    ap.add_argument("--params", default=PARAMS)
+    ap.add_argument("--out", default=None, help="write the transitions CSV here")
+    args = ap.parse_args()
+
+    engine = load_engine(args.data, args.model_dir, args.params)
+    if args.bench:
+        rng = np.random.default_rng(42)
+        change = rng.normal(0, 0.2, (args.bench, len(engine.core)))
+        mask = rng.random((args.bench, len(engine.countries))) < 0.3
+        engine.run(change[:10], mask=mask[:10])      # warm-up
+        t0 = time.perf_counter()
+        result = engine.run(change, mask=mask)
+        seconds = time.perf_counter() - t0
+        print(f"[INFO] {args.bench} scenarios x {len(engine.countries)} countries in {seconds * 1e3:.1f} ms "
+              f"({int(result.changed.sum())} transitions)")
+        return
+    if not args.spec:
+        ap.error("give --spec or --bench")
+
+    result = engine.run_specs(json.loads(Path(args.spec).read_text(encoding="utf-8")))
+    print(result.summary().to_string(index=False))
+    transitions = result.transitions()
+    if args.out:
+        transitions.to_csv(args.out, index=False)
+        print(f"[OK] wrote {len(transitions)} transitions to {args.out}")
+    else:
+        print(transitions.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
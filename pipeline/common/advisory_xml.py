@@ -0,0 +1,115 @@
+"""
+Streaming parser for State Department advisory RSS feeds.
+
+iter_items() walks the XML with a pull parser and yields one record per
+<item>, clearing each element as soon as it has been read, so memory stays
+flat no matter how large the input is. Several feeds concatenated into one
+archive file (each with its own <?xml ...?> header) are handled as a single
+stream.
+
+Record keys:
+    title        - stripped <title> text
+    description  - raw <description> HTML (CDATA contents)
+    text         - visible text of the description
+    categories   - {domain: text} for the <category domain="..."> tags
+    link, pub_date
+"""
+
+import re
+import xml.etree.ElementTree as ET
+
+from textnorm import html_to_text
+
+CHUNK_SIZE = 1 << 20
+
+# XML/doctype headers are dropped so concatenated documents parse as one stream
+_PROLOG = re.compile(rb"<\?xml[^>]*\?>|<!DOCTYPE[^>]*>", re.IGNORECASE)
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, str) and source.lstrip().startswith("<"):
+        source = source.encode("utf-8")
+    if isinstance(source, (bytes, bytearray)):
+        for start in range(0, len(source), chunk_size):
+            yield bytes(source[start:start + chunk_size])
+        return
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+    with open(source, "rb") as fh:
+        yield from _iter_chunks(fh, chunk_size)
+
+
+def _iter_clean_chunks(source, chunk_size):
+    """Yield byte chunks with XML prologs removed, never splitting a tag across chunks."""
+    carry = b""
+    for chunk in _iter_chunks(source, chunk_size):
+        buf = carry + chunk
+        cut = buf.rfind(b"<")
+        if cut != -1 and buf.find(b">", cut) == -1:
+            buf, carry = buf[:cut], buf[cut:]
+        else:
+            carry = b""
+        yield _PROLOG.sub(b"", buf)
+    if carry:
+        yield _PROLOG.sub(b"", carry)
+
+
+def _record(item) -> dict:
+    desc = item.find("description")
+    if desc is None:
+        description = ""
+    elif desc.text:
+        description = desc.text
+    else:
+        # description text sometimes lives in sub-elements instead of CDATA
+        description = " ".join(desc.itertext())
+
+    categories = {}
+    for cat in item.findall("category"):
+        categories.setdefault(cat.get("domain"), (cat.text or "").strip())
+
+    return {
+        "title": (item.findtext("title") or "").strip(),
+        "description": description.strip(),
+        "text": html_to_text(description),
+        "categories": categories,
+        "link": (item.findtext("link") or "").strip(),
+        "pub_date": (item.findtext("pubDate") or "").strip(),
+    }
+
+
+def iter_items(source, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield a record dict for every <item> in source.
+
+    source may be a path, an open (binary) file object, or the XML itself as
+    bytes/str.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    parser.feed(b"<archive>")
+    stack = []
+
+    def drain():
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == "item":
+                yield _record(elem)
+            # only drop finished subtrees that are not inside an open <item>
+            if elem.tag == "item" or not any(e.tag == "item" for e in stack):
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+
+    for chunk in _iter_clean_chunks(source, chunk_size):
+        parser.feed(chunk)
+        yield from drain()
+    parser.feed(b"</archive>")
+    yield from drain()
+    parser.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark for textnorm on pipeline/BERT/train.csv.
+
+Runs each cleaner in its old per-call form and in its compiled textnorm form
+over every document, checks that both give identical output, and prints
+throughput in docs/sec.
+
+    python pipeline/common/bench_textnorm.py [path/to/train.csv] [--repeat N]
+"""
+
+import argparse
+import csv
+import html
+import random
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+import textnorm
+
+DEFAULT_CSV = Path(__file__).resolve().parents[1] / "BERT" / "train.csv"
+
+
+# ---------------------- previous implementations ----------------------
+
+def legacy_clean_text_for_bert(body):
+    text = body.strip()
+    for pattern in textnorm.BOILERPLATE_REMOVE:
+        text = re.sub(pattern, " ", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def legacy_clean_html(raw_html):
+    if raw_html is None:
+        return ""
+    text = re.sub(r'<[^>]+>', ' ', raw_html)
+    text = html.unescape(text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def legacy_clean_text(text):
+    if not text:
+        return ""
+    text = text.lower()
+    text = re.sub(r'http\S+|www\S+', '', text)
+    text = re.sub(r"[^a-zA-Z\s.,!?:;'-]", '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def legacy_norm_string(x):
+    if x is None:
+        return None
+    s = str(x)
+    s = unicodedata.normalize("NFKC", s)
+    s = s.replace("’", "'").replace("`", "'").replace("–", "-").replace("—", "-")
+    s = re.sub(r"\s+", " ", s.strip())
+    return s
+
+# -----------------------------------------------------------------------
+
+
+BOILERPLATE_SAMPLES = [
+    "Read the Safety and Security section on the country information page. ",
+    "If you decide to travel to Rwanda:",
+    "Enroll in the Smart Traveler Enrollment Program ( STEP ) to receive Alerts. ",
+    "Follow the Department of State on Facebook and Twitter . ",
+    "Review the Traveler’s Checklist . ",
+    "Review the Crime and Safety Report for Rwanda. ",
+    "Review the Crime and Safety Reports for Rwanda. ",
+    "U.S. citizens who travel abroad should always have a contingency plan for emergencies. ",
+    "Read the Safety and Security section",
+    # overlapping phrases: results depend on the order the passes run in
+    "If you decide to travel to Read the Safety and Security section:",
+    "Read the Safety and Security section. If you decide to travel to Mali: ",
+    "If you decide to travel to Enroll in the Smart Traveler Enrollment Program. Then: ",
+    "Review the Crime and Safety Reports Review the Crime and Safety Report. ",
+    "Follow the Department of State on Facebook and Twitter If you decide to travel to Chad: . ",
+]
+
+FUZZ_PIECES = ["Read the Safety and Security section", "If you decide to travel to ", ":", ". ", " ", "Mali",
+               "Enroll in the Smart Traveler Enrollment Program", "Review the Crime and Safety Report", "s",
+               "Review the Traveler’s Checklist", "read THE safety", "U.S. citizens who travel abroad should "
+               "always have a contingency plan", "Follow the Department of State on Facebook and Twitter", "\n"]
+
+
+def fuzz_boilerplate(n, seed=0):
+    """Random strings built from overlapping phrase fragments, for the parity check."""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 8))) for _ in range(n)]
+
+
+def load_docs(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return [row["text"] for row in csv.DictReader(f)]
+
+
+def raw_variants(docs, seed=0):
+    """Re-inject boilerplate and markup so every rule actually fires."""
+    rng = random.Random(seed)
+    raw, marked_up = [], []
+    for doc in docs:
+        words = doc.split(" ")
+        for sample in rng.sample(BOILERPLATE_SAMPLES, 3):
+            words.insert(rng.randrange(len(words) + 1), sample)
+        raw.append("  ".join(words))
+        marked_up.append(f"<p>{doc[:len(doc) // 2]}</p>\n<b>{doc[len(doc) // 2:]}</b>&nbsp;&amp; "
+                         f"<a href='http://x.y'>www.state.gov</a> – ’quoted’")
+    return raw, marked_up
+
+
+def bench(name, old, new, docs, repeat):
+    for doc in docs:
+        a, b = old(doc), new(doc)
+        if a != b:
+            raise AssertionError(f"{name}: outputs differ\n old={a!r}\n new={b!r}")
+
+    def run(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for doc in docs:
+                fn(doc)
+            best = min(best, time.perf_counter() - t0)
+        return len(docs) / best
+
+    old_rate, new_rate = run(old), run(new)
+    print(f"{name:22s} legacy {old_rate:10,.0f} docs/s   textnorm {new_rate:10,.0f} docs/s   "
+          f"x{new_rate / old_rate:4.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv", nargs="?", default=DEFAULT_CSV)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--fuzz", type=int, default=200_000, help="random overlapping-phrase strings to check")
+    args = ap.parse_args()
+
+    docs = load_docs(args.csv)
+    raw, marked_up = raw_variants(docs)
+    print(f"[INFO] {len(docs)} docs from {args.csv}")
+
+    bench("clean_text_for_bert", legacy_clean_text_for_bert, textnorm.clean_text_for_bert, raw, args.repeat)
+    bench("  (overlap fuzz)", legacy_clean_text_for_bert, textnorm.clean_text_for_bert,
+          fuzz_boilerplate(args.fuzz), 1)
+    bench("html_to_text", legacy_clean_html, textnorm.html_to_text, marked_up, args.repeat)
+    bench("clean_text_lowercase", legacy_clean_text, textnorm.clean_text_lowercase, marked_up, args.repeat)
+    bench("norm_string", legacy_norm_string, textnorm.norm_string, marked_up, args.repeat)
+
+    try:
+        import pandas as pd
+    except ImportError:
+        return
+    # batched path: snapshot-style input where most texts repeat
+    series = pd.Series(raw * 10)
+    t0 = time.perf_counter()
+    series.map(legacy_clean_text_for_bert)
+    old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    textnorm.batch(textnorm.clean_text_for_bert, series)
+    new = time.perf_counter() - t0
+    print(f"{'batch (Series, 10x dup)':22s} legacy {len(series) / old:10,.0f} docs/s   "
+          f"textnorm {len(series) / new:10,.0f} docs/s   x{old / new:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
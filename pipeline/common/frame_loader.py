@@ -0,0 +1,190 @@
+"""
+Single-parse JSON/JSONL loader with a columnar parse cache.
+
+load_json_frame() sniffs the layout from the first bytes of the file instead
+of trying pd.read_json and re-reading on failure:
+
+    [ ...            -> array of records
+    { ... } {...}    -> JSON lines (first line is a complete object and more follow)
+    { ...            -> one JSON document (columns orient, or a single record)
+
+The file is parsed once (orjson when installed, else the stdlib) and the
+columns and axes get the same dtype inference as pd.read_json (numeric
+strings and integral floats to int64/float64, epoch or ISO values in date-named
+columns to datetime64). The resulting frame is stored as an Arrow IPC sidecar in .frame_cache/ next to the
+source, tagged with the source path, mtime and size. An unchanged input is
+then loaded straight from the memory-mapped sidecar.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback
+    _loads = json.loads
+
+CACHE_DIRNAME = ".frame_cache"
+SNIFF_BYTES = 64 * 1024
+_META_KEY = b"safetrip_source"
+_CACHE_VERSION = 2  # bump when the parsed frame changes for the same input
+_STAMP_UNITS = ("s", "ms", "us", "ns")
+_MIN_STAMP = 31536000  # epoch seconds; smaller numbers are not read as dates
+
+
+def sniff_format(head: bytes) -> str:
+    """Return "array", "lines" or "document" for the first bytes of a JSON file."""
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if text.startswith(b"["):
+        return "array"
+    first, sep, rest = text.partition(b"\n")
+    if sep and rest.strip().startswith(b"{"):
+        try:
+            _loads(first)
+            return "lines"
+        except ValueError:
+            pass
+    return "document"
+
+
+def _frame_from(obj) -> pd.DataFrame:
+    if isinstance(obj, list):
+        return pd.DataFrame(obj)
+    if isinstance(obj, dict):
+        if obj and not any(isinstance(v, (dict, list)) for v in obj.values()):
+            return pd.DataFrame([obj])  # a single record
+        return pd.DataFrame(obj)
+    raise ValueError(f"Unsupported JSON top-level type: {type(obj).__name__}")
+
+
+def _is_date_column(name) -> bool:
+    """read_json's keep_default_dates column names."""
+    if not isinstance(name, str):
+        return False
+    name = name.lower()
+    return name.endswith(("_at", "_time")) or name in {"modified", "date", "datetime"} or name.startswith("timestamp")
+
+
+def _to_dates(s: pd.Series) -> pd.Series:
+    """Epoch numbers (s/ms/us/ns, first unit that fits) or date strings as datetime64; s itself otherwise."""
+    if not len(s):
+        return s
+    values = s
+    if s.dtype == "object" or s.dtype == "string":
+        try:
+            values = s.astype("int64")
+        except OverflowError:
+            return s
+        except (TypeError, ValueError):
+            pass
+    if issubclass(values.dtype.type, np.number) and not (values.isna() | (values > _MIN_STAMP)).all():
+        return s
+    if values.dtype == "string":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            for fmt in (None, "iso8601", "mixed"):
+                try:
+                    return pd.to_datetime(values, errors="raise", format=fmt)
+                except Exception:
+                    pass
+        return s
+    for unit in _STAMP_UNITS:
+        try:
+            out = pd.to_datetime(values, errors="raise", unit=unit)
+            out.dt.as_unit("ns")
+            return out
+        except pd.errors.OutOfBoundsDatetime:
+            continue
+        except (ValueError, OverflowError, TypeError):
+            pass
+    return s
+
+
+def _infer_dtype(s: pd.Series, dates: bool) -> pd.Series:
+    """read_json's per-column inference: dates if asked, then float64 from strings, then int64 when lossless."""
+    if dates:
+        converted = _to_dates(s)
+        if converted is not s:
+            return converted
+    out = s
+    if pd.api.types.is_string_dtype(s.dtype):
+        try:
+            out = s.astype("float64")
+        except (TypeError, ValueError):
+            pass
+    if len(out) and out.dtype in ("float", "object"):
+        try:
+            as_int = s.astype("int64")
+            if (as_int == out).all():
+                out = as_int
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return out
+
+
+def infer_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply pd.read_json's default dtype and date inference to a frame built from parsed JSON."""
+    for axis in ("index", "columns"):
+        labels = getattr(df, axis)
+        converted = _infer_dtype(pd.Series(labels, dtype=labels.dtype), dates=True)
+        if converted.dtype != labels.dtype:
+            setattr(df, axis, pd.Index(converted))
+    columns = {i: _infer_dtype(df.iloc[:, i], _is_date_column(col)) for i, col in enumerate(df.columns)}
+    return pd.DataFrame(columns, index=df.index).set_axis(df.columns, axis=1)
+
+
+def parse_json_frame(path) -> pd.DataFrame:
+    """Parse a JSON array / JSON lines / JSON document file into a DataFrame, reading it once."""
+    data = Path(path).read_bytes()
+    fmt = sniff_format(data[:SNIFF_BYTES])
+    if fmt == "lines":
+        return infer_dtypes(pd.DataFrame([_loads(line) for line in data.splitlines() if line.strip()]))
+    return infer_dtypes(_frame_from(_loads(data)))
+
+
+def _cache_path(path: Path) -> Path:
+    digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:12]
+    return path.parent / CACHE_DIRNAME / f"{path.stem}-{digest}.arrow"
+
+
+def _source_tag(path: Path) -> bytes:
+    st = path.stat()
+    return f"{path}|{st.st_mtime_ns}|{st.st_size}|v{_CACHE_VERSION}".encode("utf-8")
+
+
+def load_json_frame(path, use_cache: bool = True) -> pd.DataFrame:
+    """Load a JSON/JSONL file as a DataFrame, via the parse cache when it is still valid."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    path = Path(path).resolve()
+    if not use_cache:
+        return parse_json_frame(path)
+
+    tag = _source_tag(path)
+    cache = _cache_path(path)
+    if cache.exists():
+        table = feather.read_table(cache, memory_map=True)
+        if (table.schema.metadata or {}).get(_META_KEY) == tag:
+            return table.to_pandas()
+
+    df = parse_json_frame(path)
+    try:
+        table = pa.Table.from_pandas(df)  # a keyed document index round-trips
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return df  # mixed-type columns: nothing to cache, the parse result is still fine
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: tag})
+
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(f".tmp{os.getpid()}")
+    feather.write_feather(table, tmp, compression="uncompressed")
+    os.replace(tmp, cache)
+    return df
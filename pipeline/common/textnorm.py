@@ -0,0 +1,157 @@
+"""
+Shared text normalization for every cleaner in the pipeline.
+
+Each rule set is compiled once at import time and run in as few regex
+passes as possible:
+
+    clean_text_for_bert  - boilerplate passes only for phrases whose prefix occurs
+    html_to_text         - comments + tags in one pass, entities only if present
+    clean_text_lowercase - URLs only if present, disallowed chars via a byte
+                           deletion table for ASCII text
+    norm_string          - NFKC only for non-ASCII input
+
+Whitespace is always collapsed with split/join instead of a regex pass.
+
+Every function takes one string (scalar API). batch() applies any of them to
+a pandas Series, cleaning each distinct value once, or lazily to an iterable
+of strings.
+"""
+
+import html
+import re
+import unicodedata
+
+
+# Optional boilerplate removal to reduce noise (wayback_to_csv.py)
+BOILERPLATE_REMOVE = [
+    r"Read the Safety and Security section.*?\. ",
+    r"Read the Safety and Security section.*?$",
+    r"If you decide to travel to .*?:",
+    r"Enroll in the Smart Traveler Enrollment Program.*?\. ",
+    r"Follow the Department of State on Facebook and Twitter.*?\. ",
+    r"U\.S\. citizens who travel abroad should always have a contingency plan.*?\. ",
+    r"Review the Traveler’s Checklist.*?\. ",
+    r"Review the Crime and Safety Report.*?\. ",
+    r"Review the Crime and Safety Reports.*?\. ",
+]
+
+# The phrases are removed one pass at a time, in list order: when they overlap
+# (a "Read the Safety..." inside an "If you decide to travel to ...:"), a fused
+# alternation would pick different spans. A pass is skipped unless its literal
+# prefix occurs in the lowercased text, which is exact as long as the text has
+# none of the non-ASCII characters that IGNORECASE folds onto ASCII letters.
+def _literal_prefix(pattern: str) -> str:
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            out.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in ".^$*+?{}[]()|\\":
+            break
+        out.append(ch)
+        i += 1
+    return "".join(out).lower()
+
+
+_BOILERPLATE = [(re.compile(p, re.IGNORECASE), _literal_prefix(p)) for p in BOILERPLATE_REMOVE]
+_CASEFOLD_ODD = re.compile("[\u0130\u0131\u017f\u212a]")    # İ ı ſ K match i / s / k under IGNORECASE
+
+_HTML_MARKUP = re.compile(r"<!--.*?-->|<[^>]+>", re.DOTALL)
+_URL = re.compile(r"http\S+|www\S+")
+_DISALLOWED = re.compile(r"[^a-zA-Z\s.,!?:;'-]+")
+# same character class as _DISALLOWED, as a byte deletion table for ASCII input
+_DISALLOWED_ASCII = bytes(
+    b for b in range(128)
+    if not (chr(b).isalpha() or chr(b).isspace() or chr(b) in ".,!?:;'-")
+)
+
+
+def _squash(text: str) -> str:
+    # str.split() and the regex \s agree on what whitespace is, so this equals
+    # re.sub(r"\s+", " ", text).strip() without a regex pass
+    return " ".join(text.split())
+
+
+def clean_text_for_bert(body) -> str:
+    """
+    Clean advisory body text for BERT:
+
+    - DOES NOT include the title or the Level text
+    - Strips boilerplate
+    - Normalizes whitespace
+    """
+    if not body:
+        return ""
+    text = body.strip()
+    gated = not _CASEFOLD_ODD.search(text)
+    lowered = text.lower() if gated else ""
+    for pattern, prefix in _BOILERPLATE:
+        if gated and prefix not in lowered:
+            continue
+        text, n = pattern.subn(" ", text)
+        if n and gated:
+            lowered = text.lower()
+    return _squash(text)
+
+
+def html_to_text(raw_html) -> str:
+    """Strip tags and comments, unescape entities and collapse whitespace."""
+    if not raw_html:
+        return ""
+    text = _HTML_MARKUP.sub(" ", raw_html)
+    if "&" in text:
+        text = html.unescape(text)
+    return _squash(text)
+
+
+def clean_text_lowercase(text) -> str:
+    """Lowercase, drop URLs and anything but letters/basic punctuation, collapse whitespace."""
+    if not text:
+        return ""
+    text = text.lower()
+    if "http" in text or "www" in text:
+        text = _URL.sub("", text)
+    if text.isascii():
+        text = text.encode("ascii").translate(None, _DISALLOWED_ASCII).decode("ascii")
+    else:
+        text = _DISALLOWED.sub("", text)
+    return _squash(text)
+
+
+def norm_string(x):
+    """NFKC-normalize, fold curly quotes/dashes and collapse whitespace; None for missing."""
+    if x is None or (isinstance(x, float) and x != x):
+        return None
+    s = str(x)
+    if not s.isascii():
+        s = unicodedata.normalize("NFKC", s).replace("’", "'").replace("–", "-").replace("—", "-")
+    return _squash(s.replace("`", "'"))
+
+
+def batch(fn, texts):
+    """
+    Apply a scalar cleaner to many texts.
+
+    pandas Series -> Series with the same index; each distinct value is cleaned
+    once and missing values get fn(None).
+    any other iterable -> generator of cleaned strings.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None and isinstance(texts, pd.Series):
+        import numpy as np
+
+        codes, uniques = pd.factorize(texts, use_na_sentinel=True)
+        # code -1 (missing) picks the trailing fn(None) entry
+        cleaned = np.empty(len(uniques) + 1, dtype=object)
+        cleaned[:-1] = [fn(u) for u in uniques]
+        cleaned[-1] = fn(None)
+        return pd.Series(cleaned[codes], index=texts.index, name=texts.name)
+
+    return (fn(t) for t in texts)
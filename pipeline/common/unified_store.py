@@ -0,0 +1,95 @@
+"""
+Columnar storage for the unified travel dataset.
+
+unify_data.py writes unified_travel_data.parquet (zstd, for interchange) and
+unified_travel_data.arrow (uncompressed Arrow IPC, for memory-mapped reads)
+next to the optional legacy JSON. Columns are stored compactly:
+
+    country names, iso2, advisory level  -> dictionary / categorical
+    scores and indices                   -> float32
+    events_year                          -> int16 (nullable)
+    events                               -> int32 (nullable)
+
+read_unified() loads only the requested columns: straight from the mapped
+Arrow file when it exists, otherwise from Parquet, otherwise from the JSON.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+CATEGORICAL = ("iso2", "country_name", "country_name_norm", "advisory_level")
+TEXT = ("advisory_text", "bert_input_text")
+INT_COLUMNS = {"events_year": "Int16", "events": "Int32"}
+
+
+def _base(path) -> Path:
+    path = Path(path)
+    return path.with_suffix("") if path.suffix in (".json", ".parquet", ".arrow") else path
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the unified frame with compact column dtypes."""
+    df = df.copy()
+    for col in df.columns:
+        if col in CATEGORICAL:
+            df[col] = df[col].astype("category")
+        elif col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype(INT_COLUMNS[col])
+        elif col in TEXT:
+            continue
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def write_columnar(df: pd.DataFrame, base) -> list:
+    """Write base.parquet and base.arrow; returns the written paths."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    base = _base(base)
+    base.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(compact_frame(df), preserve_index=False)
+
+    parquet_path = base.with_suffix(".parquet")
+    arrow_path = base.with_suffix(".arrow")
+    pq.write_table(table, parquet_path, compression="zstd")
+    # uncompressed so readers can memory-map the columns without a decode step
+    feather.write_feather(table, arrow_path, compression="uncompressed")
+    return [parquet_path, arrow_path]
+
+
+def read_unified(path, columns=None) -> pd.DataFrame:
+    """
+    Load the unified dataset, reading only `columns` when given.
+
+    path may be the base name or any of the .arrow/.parquet/.json files.
+    Requested columns that the file does not have are skipped.
+    """
+    base = _base(path)
+    arrow_path = base.with_suffix(".arrow")
+    parquet_path = base.with_suffix(".parquet")
+
+    if arrow_path.exists() or parquet_path.exists():
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        if arrow_path.exists():
+            with pa.memory_map(str(arrow_path)) as source:
+                names = pa.ipc.open_file(source).schema.names
+        else:
+            names = pq.read_schema(parquet_path).names
+        cols = None if columns is None else [c for c in columns if c in names]
+        if arrow_path.exists():
+            table = feather.read_table(arrow_path, columns=cols, memory_map=True)
+        else:
+            table = pq.read_table(parquet_path, columns=cols, memory_map=True)
+        return table.to_pandas()
+
+    df = pd.read_json(base.with_suffix(".json"))
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
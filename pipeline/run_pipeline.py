@@ -0,0 +1,289 @@
+# run_pipeline.py
+"""
+Incremental runner for the data pipeline.
+
+Every stage declares the script it runs, the working directory it expects and
+the files it reads and writes (paths relative to pipeline/, exactly as the
+scripts use them). A stage is skipped when the content hashes of its inputs
+match the last successful run and its outputs still exist. Stages whose
+dependencies are done run in parallel (e.g. the events / index / country-code
+conversions), and each run's wall time is recorded in the state file.
+
+    python pipeline/run_pipeline.py                 # build what is out of date
+    python pipeline/run_pipeline.py --dry-run       # show what would run
+    python pipeline/run_pipeline.py --force unify_data
+    python pipeline/run_pipeline.py --only clustering visualize -j 2
+
+Dependencies are derived from the files: a stage depends on whichever stage
+writes one of its inputs. Hand-offs that do not go through a declared file
+(the clustering CSVs are still prepared by hand) are declared with `after`;
+those edges always propagate a rebuild.
+"""
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent          # pipeline/
+STATE_PATH = ROOT / ".pipeline_state.json"
+
+OLD = "scrapers/old_scrapers"
+CLEANED = "scrapers/cleaned_data"
+RAW = "scrapers/raw_datasets"
+UNIFIED = "scrapers/unified_data"
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: tuple = ()
+    outputs: tuple = ()
+    cwd: str = "."
+    after: tuple = ()
+    args: tuple = ()
+
+
+STAGES = [
+    # raw -> cleaned_data conversions (independent of each other)
+    Stage("country_codes_to_json", f"{OLD}/country_codes_to_json.py",
+          inputs=(f"{RAW}/country_codes.csv",),
+          outputs=(f"{CLEANED}/country_codes.json",)),
+    Stage("events_to_json", f"{OLD}/events_to_json.py",
+          inputs=(f"{RAW}/number_of_political_violence_events_by_country-year_as-of-26Sep2025.xlsx",),
+          outputs=(f"{CLEANED}/events.json",)),
+    # reads GTI.csv / writes gti.json in its working directory
+    Stage("index_csv_to_json", f"{OLD}/PPI_GTI_GPI_csv_to_json.py", cwd=CLEANED,
+          inputs=(f"{CLEANED}/GTI.csv",),
+          outputs=(f"{CLEANED}/gti.json",)),
+    # downloads the State Department feed; no inputs, so it only runs when forced or missing
+    Stage("travel_advisory_to_json", f"{OLD}/travel_advisory_to_json.py", cwd="scrapers",
+          outputs=(f"{RAW}/travel_state_raw.xml", f"{CLEANED}/travel_advisory.json")),
+
+    # fips_to_name.json is read back and extended, so it is an input too
+    Stage("make_fips_map", f"{OLD}/make_fips_map.py", cwd=OLD,
+          inputs=(f"{CLEANED}/travel_advisory.json", f"{UNIFIED}/fips_to_name.json"),
+          outputs=(f"{UNIFIED}/fips_to_name.json",)),
+    Stage("unify_data", f"{OLD}/unify_data.py", cwd=OLD,
+          inputs=tuple(f"{CLEANED}/{name}" for name in (
+              "country_codes.json", "travel_advisory.json", "gpi.json", "gti.json",
+              "events.json", "numbeo_clean.json", "ppi.json")) + (f"{UNIFIED}/fips_to_name.json",),
+          outputs=(f"{UNIFIED}/unified_travel_data.parquet", f"{UNIFIED}/unified_travel_data.arrow",
+                   f"{UNIFIED}/unified_travel_data.json")),
+
+    Stage("unified_to_csv", "scrapers/clustering/unified_to_csv.py",
+          inputs=("unified_data/unified_travel_data.arrow", "unified_data/unified_travel_data.parquet",
+                  "unified_data/unified_travel_data.json"),
+          outputs=("clustering/data/unified_cleaned.csv",),
+          after=("unify_data",)),
+    # fits normalization.json once (kept across runs, so it is an input too) and writes a separate output
+    Stage("normalize", "clustering/normalize.py",
+          inputs=("clustering/data/unified_cleaned.csv", "clustering/data/normalization.json"),
+          outputs=("clustering/data/unified_normalized.csv", "clustering/data/normalization.json")),
+    Stage("combine_country_codes", "scrapers/clustering/combine_country_codes.py",
+          inputs=("clustering/data/clustering_copy.csv", "raw_datasets/political_violence_index.csv"),
+          outputs=("clustering/data/clustering_copy.csv", "clustering/data/combined_output.csv"),
+          after=("normalize",)),
+    Stage("imputation", "clustering/imputation.py",
+          inputs=("clustering/data/clustering_data.csv",),
+          outputs=("clustering/data/clustering_ready.csv",),
+          after=("combine_country_codes",)),
+    Stage("clustering", "clustering/clustering.py",
+          inputs=("clustering/data/clustering_ready.csv",),
+          outputs=("clustering/output/clustering_output.csv", "clustering/output/elbow_plot.png",
+                   "clustering/output/scatter_matrix.png", "clustering/output/k_sweep.csv")),
+    # persisted imputer reference / scaler / centroids for predict-only assignment
+    Stage("cluster_model", "clustering/cluster_model.py", args=("build",),
+          inputs=("clustering/data/clustering_data.csv",),
+          outputs=("clustering/output/cluster_model/latest.json",),
+          after=("combine_country_codes",)),
+    Stage("visualize", "clustering/visualize.py",
+          inputs=("clustering/output/clustering_output.csv",),
+          outputs=("clustering/output/clusters_map.html",)),
+]
+
+
+class FileHasher:
+    """Content hashes, reusing the previous digest while a file's mtime and size are unchanged."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self.lock = threading.Lock()
+
+    def digest(self, rel: str):
+        path = ROOT / rel
+        if not path.exists():
+            return None
+        st = path.stat()
+        with self.lock:
+            entry = self.known.get(rel)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry["digest"]
+        h = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        with self.lock:
+            self.known[rel] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "digest": h.hexdigest()}
+        return h.hexdigest()
+
+
+def load_state() -> dict:
+    if STATE_PATH.exists():
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    return {"files": {}, "stages": {}}
+
+
+def save_state(state: dict) -> None:
+    tmp = STATE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(STATE_PATH)
+
+
+def dependencies(stages) -> dict:
+    """stage name -> set of stage names it waits for (file producers + explicit `after`)."""
+    producers = {}
+    for st in stages:
+        for out in st.outputs:
+            producers.setdefault(out, set()).add(st.name)
+    deps = {}
+    for st in stages:
+        d = set(st.after)
+        for inp in st.inputs:
+            d |= producers.get(inp, set())
+        d.discard(st.name)   # in-place files (fips map, normalization params) are not self-edges
+        deps[st.name] = d
+    return deps
+
+
+def stale_reason(stage: Stage, record, signature: dict, rebuilt_after: list):
+    """Why the stage has to run, or None if it is up to date."""
+    if record is None:
+        return "never built"
+    if rebuilt_after:
+        return f"rebuilt upstream: {', '.join(rebuilt_after)}"
+    built = record.get("outputs", {})
+    missing = [o for o in stage.outputs if built.get(o) and not (ROOT / o).exists()]
+    if missing:
+        return f"missing output: {missing[0]}"
+    changed = [p for p, d in signature.items() if record.get("inputs", {}).get(p) != d]
+    if changed:
+        return f"changed input: {changed[0]}"
+    return None
+
+
+def run_stage(stage: Stage) -> tuple:
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, str(ROOT / stage.script), *stage.args],
+                          cwd=ROOT / stage.cwd, capture_output=True, text=True)
+    return proc, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the out-of-date pipeline stages.")
+    ap.add_argument("--only", nargs="+", metavar="STAGE", help="restrict the run to these stages")
+    ap.add_argument("--force", nargs="*", metavar="STAGE",
+                    help="rebuild these stages (all selected stages if none given)")
+    ap.add_argument("--dry-run", action="store_true", help="print the plan without running anything")
+    ap.add_argument("-j", "--jobs", type=int, default=4, help="stages to run in parallel")
+    args = ap.parse_args()
+
+    by_name = {st.name: st for st in STAGES}
+    unknown = [n for n in (args.only or []) + (args.force or []) if n not in by_name]
+    if unknown:
+        raise SystemExit(f"[ERROR] unknown stage(s): {', '.join(unknown)}; known: {', '.join(by_name)}")
+    selected = set(args.only or by_name)
+    forced = set(selected if args.force == [] else (args.force or []))
+
+    deps = dependencies(STAGES)
+    state = load_state()
+    hasher = FileHasher(state.get("files"))
+    state_lock = threading.Lock()
+
+    pending = [st.name for st in STAGES if st.name in selected]
+    done, rebuilt, failed = set(), set(), set()
+    futures = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while pending or futures:
+            progressed = False
+            for name in list(pending):
+                waits = deps[name] & selected
+                if not waits <= done:
+                    continue
+                pending.remove(name)
+                progressed = True
+                stage = by_name[name]
+                blocked = sorted(waits & failed)
+                if blocked:
+                    print(f"[SKIP] {name}: upstream failed ({', '.join(blocked)})")
+                    failed.add(name)
+                    done.add(name)
+                    continue
+                signature = {p: hasher.digest(p) for p in stage.inputs}
+                # a real run sees rebuilt input files in the signature; a dry run never writes them,
+                # so any rebuilt upstream (file producer or `after`) counts
+                upstream = deps[name] if args.dry_run else set(stage.after)
+                reason = "forced" if name in forced else stale_reason(
+                    stage, state["stages"].get(name), signature, sorted(upstream & rebuilt))
+                if reason is None:
+                    print(f"[SKIP] {name}: up to date")
+                    done.add(name)
+                    continue
+                print(f"[RUN ] {name}: {reason}")
+                if args.dry_run:
+                    # assume it would rebuild, so the plan shows everything downstream
+                    rebuilt.add(name)
+                    done.add(name)
+                    continue
+                futures[pool.submit(run_stage, stage)] = name
+
+            if not futures:
+                if not progressed:
+                    raise SystemExit(f"[ERROR] dependency cycle among: {', '.join(pending)}")
+                continue
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = futures.pop(fut)
+                stage = by_name[name]
+                proc, seconds = fut.result()
+                if proc.stdout.strip():
+                    print("\n".join(f"  {name} | {line}" for line in proc.stdout.rstrip().splitlines()))
+                if proc.returncode != 0:
+                    print(proc.stderr.rstrip(), file=sys.stderr)
+                    print(f"[FAIL] {name} (exit {proc.returncode}) after {seconds:.1f}s")
+                    failed.add(name)
+                else:
+                    print(f"[DONE] {name} in {seconds:.1f}s")
+                    rebuilt.add(name)
+                    with state_lock:
+                        # hash after the run so files a stage rewrites in place are recorded as written
+                        state["stages"][name] = {
+                            "inputs": {p: hasher.digest(p) for p in stage.inputs},
+                            "outputs": {p: hasher.digest(p) for p in stage.outputs},
+                            "seconds": round(seconds, 3),
+                            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        }
+                        state["files"] = hasher.known
+                        save_state(state)
+                done.add(name)
+
+    if not args.dry_run:
+        print("[INFO] last wall time per stage:")
+        for st in STAGES:
+            rec = state["stages"].get(st.name)
+            if st.name in selected and rec:
+                mark = "*" if st.name in rebuilt else " "
+                print(f"  {mark} {st.name:<26s} {rec['seconds']:8.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
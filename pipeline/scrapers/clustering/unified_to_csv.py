@@ -1,20 +1,20 @@
-# Convert the Unified data json files into csv files for easier processing
+# Convert the Unified data files into csv files for easier processing
+import sys
 from pathlib import Path
-import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from unified_store import read_unified
 
 def main():
     # Correctly locate files relative to the project root.
     # Assuming this script is run from the project root.
     project_root = Path(__file__).resolve().parents[2]
-    input_path = project_root / "unified_data/unified_travel_data.json"
+    input_path = project_root / "unified_data/unified_travel_data"  # .arrow / .parquet / .json
     output_path = project_root / "clustering/data/unified_cleaned.csv"
 
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Load JSON into a pandas DataFrame
-    df = pd.read_json(input_path)
-
     # Fields to keep
     fields_to_keep = [
         "iso2",
@@ -24,6 +24,9 @@ def main():
         "gti_score",
         "numbeo_crime_index",
     ]
+
+    # Load only those columns (memory-mapped when the Arrow file exists)
+    df = read_unified(input_path, columns=fields_to_keep)
     
     # Select the desired columns and drop rows where ALL of these columns are missing
     df_cleaned = df[fields_to_keep].dropna(how='all', subset=fields_to_keep[1:])
@@ -0,0 +1,78 @@
+# bench_bert_text.py
+"""
+Check that render_bert_input() is byte-identical to the row-wise mk_bert()
+and time both.
+
+    python bench_bert_text.py [--rows 50000] [--unified path/to/unified_travel_data.json]
+
+Synthetic frames mimic the unify_data output (missing levels/scores/events,
+float-typed years and counts). If the unified JSON exists it is checked too.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bert_text import mk_bert, render_bert_input
+
+UNIFIED = Path(__file__).resolve().parent.parent / "unified_data" / "unified_travel_data.json"
+
+
+def make_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    def holes(values, p):
+        values = pd.Series(values, dtype=object if isinstance(values[0], str) else None)
+        return values.mask(rng.random(n) < p)
+
+    levels = np.array(["Level 1: Exercise Normal Precautions", "Level 2: Exercise Increased Caution",
+                       "Level 3: Reconsider Travel", "Level 4: Do Not Travel"], dtype=object)
+    return pd.DataFrame({
+        "iso2": [f"C{i % 900:03d}" for i in range(n)],
+        "country_name": [f"Country {i}" if i % 97 else None for i in range(n)],
+        "country_name_norm": [f"Country {i}" for i in range(n)],
+        "advisory_level": holes(levels[rng.integers(0, 4, n)], 0.2),
+        "advisory_text": holes(np.array([f"Exercise caution in region {i}. " * 5 for i in range(n)], dtype=object), 0.2),
+        "gpi_score": holes(rng.uniform(1, 4, n), 0.3),
+        "gti_score": holes(rng.uniform(0, 10, n) * (rng.random(n) < 0.7), 0.3),
+        "events": holes(rng.integers(0, 5000, n).astype(float), 0.25),
+        "events_year": holes(rng.integers(2015, 2026, n).astype(float), 0.25),
+    })
+
+
+def check(df: pd.DataFrame, label: str) -> None:
+    old = df.apply(mk_bert, axis=1)
+    new = render_bert_input(df)
+    mismatch = int((old.to_numpy(dtype=object) != new.to_numpy(dtype=object)).sum())
+    if mismatch:
+        i = int(np.flatnonzero(old.to_numpy(dtype=object) != new.to_numpy(dtype=object))[0])
+        raise AssertionError(f"{label}: {mismatch} rows differ, e.g.\n old={old.iloc[i]!r}\n new={new.iloc[i]!r}")
+    print(f"[OK] {label}: {len(df)} rows byte-identical")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--unified", type=Path, default=UNIFIED)
+    args = ap.parse_args()
+
+    check(make_frame(2_000, seed=1), "synthetic")
+    if args.unified.exists():
+        check(pd.read_json(args.unified), args.unified.name)
+
+    for n in sorted({1_000, 10_000, args.rows}):
+        df = make_frame(n)
+        t0 = time.perf_counter()
+        df.apply(mk_bert, axis=1)
+        t_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        render_bert_input(df)
+        t_new = time.perf_counter() - t0
+        print(f"[BENCH] rows={n:>7d}  apply(mk_bert) {t_old * 1e3:8.1f} ms   "
+              f"render_bert_input {t_new * 1e3:7.1f} ms   x{t_old / t_new:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_country_join.py
+"""
+Compare the old chained string-key merges of unify_data.py with the
+integer-keyed single-pass join in country_join.py on synthetic data.
+
+    python bench_country_join.py [--entities 100000] [--repeat 3]
+
+Entities stand in for sub-national regions; each of the six sources covers a
+random ~80% of them in shuffled order, with a few unknown names, duplicate
+keys and missing keys mixed in. The two outputs must be identical, row
+multiplicity included.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from country_join import add_surrogate_key, join_facts
+
+KEY = "country_name_norm"
+
+
+def make_data(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    names = pd.Series([f"Region {i:07d}" for i in range(n)], dtype=object)
+    names[n // 2] = np.nan      # an unnormalizable name; merge matches NaN keys to each other
+    dim = pd.DataFrame({"iso2": rng.integers(0, 250, n).astype(str), "country_name": names, KEY: names})
+
+    def source(cols, unknown=0.02, duplicated=0.01, missing=2):
+        idx = rng.permutation(n)[: int(n * 0.8)]
+        # raw inputs, as the scrapers deliver them: some keys repeat, some are missing
+        idx = np.concatenate([idx, rng.choice(idx, int(len(idx) * duplicated))])
+        keys = names.to_numpy()[idx].copy()
+        keys[rng.random(len(keys)) < unknown] = "Nowhere"
+        keys[rng.choice(len(keys), missing, replace=False)] = np.nan   # few: NaN rows multiply across sources
+        df = pd.DataFrame({KEY: keys})
+        for c in cols:
+            df[c] = rng.normal(size=len(keys)) if not c.endswith("text") else "advisory text"
+        return df
+
+    facts = [
+        source(["advisory_level", "advisory_text"]),
+        source(["gpi_score"]),
+        source(["gti_score"]),
+        source(["events", "events_year"]),
+        source(["numbeo_crime_index", "numbeo_safety_index"]),
+        source(["ppi_score"]),
+    ]
+    return dim, facts
+
+
+def merge_chain(dim, facts):
+    out = dim.copy()
+    for fact in facts:
+        out = out.merge(fact, on=KEY, how="left")
+    return out
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entities", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for n in sorted({1_000, 10_000, args.entities}):
+        dim, facts = make_data(n)
+        t_old, old = best_of(lambda: merge_chain(dim, facts), args.repeat)
+        t_new, new = best_of(lambda: join_facts(add_surrogate_key(dim), facts), args.repeat)
+
+        # same rows, same values (new output only adds the surrogate key)
+        pd.testing.assert_frame_equal(
+            old.reset_index(drop=True),
+            new.drop(columns=["country_id"])[old.columns],
+            check_dtype=False,
+        )
+        print(f"[BENCH] entities={n:>7d} sources={len(facts)}  "
+              f"merge chain {t_old * 1e3:8.1f} ms   indexed join {t_new * 1e3:8.1f} ms   "
+              f"x{t_old / t_new:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
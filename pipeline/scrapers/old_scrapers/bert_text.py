@@ -0,0 +1,74 @@
+# bert_text.py
+"""
+bert_input_text assembly for unify_data.py.
+
+render_bert_input() builds every sentence fragment for the whole frame at
+once on object arrays and masks out missing fields, instead of calling
+mk_bert() once per row through DataFrame.apply(axis=1). The output is
+byte-identical to mk_bert (see bench_bert_text.py).
+"""
+import numpy as np
+import pandas as pd
+
+_str = np.frompyfunc(str, 1, 1)
+_fmt3 = np.frompyfunc("{:.3f}".format, 1, 1)
+
+
+def mk_bert(row):
+    """Row-wise reference implementation (the original unify_data helper)."""
+    parts = [f"Country: {row['country_name']}."]
+    if pd.notna(row.get("advisory_level")):
+        parts.append(f"Travel Advisory: {row['advisory_level']}.")
+    if pd.notna(row.get("gpi_score")):
+        parts.append(f"The Global Peace Index score is {float(row['gpi_score']):.3f}.")
+    if pd.notna(row.get("gti_score")):
+        parts.append(f"The Global Terrorism Index score is {float(row['gti_score']):.3f}.")
+    if pd.notna(row.get("events")) and pd.notna(row.get("events_year")):
+        parts.append(f"In {int(row['events_year'])}, there were {int(row['events'])} political violence events.")
+    if pd.notna(row.get("advisory_text")):
+        parts.append(f"Advisory Details: {row['advisory_text']}")
+    return " ".join(parts)
+
+
+def _column(df: pd.DataFrame, col: str):
+    """(values as an object array, notna mask); all-missing if the column is absent."""
+    if col not in df.columns:
+        return np.full(len(df), None, dtype=object), np.zeros(len(df), dtype=bool)
+    s = df[col]
+    return s.to_numpy(dtype=object), s.notna().to_numpy()
+
+
+def _append(acc: np.ndarray, mask: np.ndarray, fragment: np.ndarray) -> np.ndarray:
+    """Append ' ' + fragment to acc where mask is set (fragment is only built for those rows)."""
+    if mask.any():
+        acc = acc.copy()
+        acc[mask] = acc[mask] + (" " + fragment)
+    return acc
+
+
+def render_bert_input(df: pd.DataFrame) -> pd.Series:
+    """Column-wise equivalent of df.apply(mk_bert, axis=1)."""
+    name, _ = _column(df, "country_name")
+    acc = "Country: " + _str(name) + "."
+    if not len(df):
+        return pd.Series(acc, index=df.index, dtype=object)
+
+    level, has_level = _column(df, "advisory_level")
+    acc = _append(acc, has_level, "Travel Advisory: " + _str(level[has_level]) + ".")
+
+    for col, label in (("gpi_score", "Global Peace Index"), ("gti_score", "Global Terrorism Index")):
+        score, has_score = _column(df, col)
+        acc = _append(acc, has_score,
+                      f"The {label} score is " + _fmt3(score[has_score].astype(np.float64)) + ".")
+
+    events, has_events = _column(df, "events")
+    year, has_year = _column(df, "events_year")
+    both = has_events & has_year
+    acc = _append(acc, both,
+                  "In " + _str(year[both].astype(np.float64).astype(np.int64)) + ", there were "
+                  + _str(events[both].astype(np.float64).astype(np.int64)) + " political violence events.")
+
+    text, has_text = _column(df, "advisory_text")
+    acc = _append(acc, has_text, "Advisory Details: " + _str(text[has_text]))
+
+    return pd.Series(acc, index=df.index, dtype=object)
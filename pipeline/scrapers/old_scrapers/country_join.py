@@ -0,0 +1,127 @@
+# country_join.py
+"""
+Integer-keyed multiway join for unify_data.py.
+
+The country dimension gets a compact int32 surrogate key (its row position).
+The dimension keys are hashed once (an Arrow hash table for string keys) and
+each fact row is looked up to the integer position of its dimension row.
+Rows of unique keys are scattered straight into dimension order; only the
+rows of duplicated keys are sorted and expanded. Each source is gathered
+with array takes, and all aligned blocks are concatenated once. Cost is linear in rows x sources instead of one full copy
+of the growing output per merge. The result equals the chain of left merges
+it replaces, including one output row per match for duplicate fact keys and
+NaN keys matching each other.
+"""
+import numpy as np
+import pandas as pd
+
+KEY = "country_name_norm"
+SURROGATE = "country_id"
+
+
+def add_surrogate_key(dim: pd.DataFrame, key: str = KEY) -> pd.DataFrame:
+    """Return dim (unique on key) with an int32 country_id = row position."""
+    dim = dim.drop_duplicates(key).reset_index(drop=True)
+    dim[SURROGATE] = np.arange(len(dim), dtype=np.int32)
+    return dim
+
+
+def surrogate_ids(dim: pd.DataFrame, facts, key: str = KEY):
+    """
+    Map the key column of every fact frame to dim row positions (-1 if the
+    name is not in the dimension). Missing keys match a missing dim key, as in
+    merge. String keys are looked up in one Arrow hash table of the dimension;
+    other key types go through one factorization over all keys.
+    """
+    if not facts:
+        return []
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        # one lookup for all sources: index_in rebuilds its hash table on every call
+        arrays = [pa.array(f[key], from_pandas=True) for f in facts]
+        fact_keys = pa.chunked_array([a.cast(arrays[0].type) for a in arrays])
+        ids = pc.index_in(fact_keys, value_set=pa.array(dim[key], from_pandas=True))
+        ids = ids.fill_null(-1).to_numpy().astype(np.int64)
+        return np.split(ids, np.cumsum([len(f) for f in facts])[:-1])
+    except (ImportError, TypeError, ValueError, NotImplementedError):   # Arrow*Error subclass these
+        pass
+
+    keys = pd.concat([dim[key]] + [f[key] for f in facts], ignore_index=True)
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+
+    n = len(dim)
+    row_of_code = np.full(len(uniques), -1, dtype=np.int64)
+    row_of_code[codes[:n]] = np.arange(n)
+
+    out, offset = [], n
+    for f in facts:
+        out.append(row_of_code[codes[offset:offset + len(f)]])
+        offset += len(f)
+    return out
+
+
+def _matches(n_rows: int, ids: np.ndarray):
+    """(fact rows sorted by dim row then fact order, first match per dim row, matches per dim row)."""
+    hit = np.flatnonzero(ids >= 0)
+    counts = np.bincount(ids[hit], minlength=n_rows)
+    first = np.cumsum(counts) - counts
+    rows = np.empty(len(hit), dtype=np.int64)
+    multi = counts[ids[hit]] > 1
+    single = hit[~multi]
+    rows[first[ids[single]]] = single            # unique keys land in their slot directly
+    if multi.any():
+        # only the rows of duplicated keys need ordering
+        dup = hit[multi]
+        dup = dup[np.argsort(ids[dup], kind="stable")]
+        dup_ids = ids[dup]
+        rank = np.arange(len(dup)) - np.searchsorted(dup_ids, dup_ids)
+        rows[first[dup_ids] + rank] = dup
+    return rows, first, counts
+
+
+def _gather(values: pd.DataFrame, take: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame({col: values[col].array.take(take, allow_fill=True) for col in values.columns})
+
+
+def join_facts(dim: pd.DataFrame, facts, key: str = KEY) -> pd.DataFrame:
+    """
+    Left-join every fact frame onto dim by key in one pass.
+
+    dim must already be unique on key (see add_surrogate_key). Each fact is a
+    DataFrame holding key plus the columns to bring over. The result is the
+    same as chaining dim.merge(fact, on=key, how="left") over the facts:
+    a dim row matched by several rows of a fact is repeated once per match
+    (the product over facts, earlier facts varying slowest), unmatched dim
+    rows get NaN, and missing keys match each other.
+    """
+    dim = dim.reset_index(drop=True)
+    facts = [f for f in facts if f is not None and len(f.columns) > 1]
+    n = len(dim)
+    matches = [_matches(n, ids) for ids in surrogate_ids(dim, facts, key)]
+
+    # output rows per dim row: product of max(matches, 1) over the facts
+    sizes = np.ones(n, dtype=np.int64)
+    for _, _, counts in matches:
+        sizes *= np.maximum(counts, 1)
+    dim_take = np.repeat(np.arange(n), sizes)
+    within = np.arange(len(dim_take)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    blocks = [dim.take(dim_take).reset_index(drop=True) if len(dim_take) != n else dim]
+    stride = sizes.copy()
+    for fact, (rows, first, counts) in zip(facts, matches):
+        take = np.full(n, -1, dtype=np.int64)
+        take[counts > 0] = rows[first[counts > 0]]
+        if counts.max(initial=0) > 1:
+            # this source has duplicate keys: pick the match for each repeated output row
+            width = np.maximum(counts, 1)
+            stride //= width
+            local = (within // stride[dim_take]) % width[dim_take]
+            take = take[dim_take]
+            matched = counts[dim_take] > 0
+            take[matched] = rows[first[dim_take[matched]] + local[matched]]
+        elif len(dim_take) != n:
+            take = take[dim_take]
+        blocks.append(_gather(fact.drop(columns=[key]), take))
+    return pd.concat(blocks, axis=1)
@@ -0,0 +1,150 @@
+# country_resolver.py
+"""
+Country-name resolution shared by every source in unify_data.py.
+
+Each distinct raw string is normalized and resolved once, then whole Series
+are mapped through that interned lookup table. Resolution order:
+
+    1. alias      - ALIASES (lowercase spelling -> canonical)
+    2. exact      - case-insensitive match against the canonical names
+    3. fuzzy      - best character-trigram (Dice) match above min_score
+                    (disabled with min_score=None)
+    4. unresolved - normalized input is kept as-is (old behaviour)
+
+report() says how many names/rows went through each path so join coverage
+can be checked after every run.
+"""
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from utils_norm import ALIASES, norm_string
+
+MIN_FUZZY_SCORE = 0.8
+
+
+def _fuzzy_key(name: str) -> str:
+    # accent-free, lowercase, punctuation as spaces, no leading "the"
+    s = unicodedata.normalize("NFKD", name)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    s = "".join(ch if ch.isalnum() else " " for ch in s)
+    s = " ".join(s.split())
+    return s[4:] if s.startswith("the ") else s
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CountryResolver:
+    """Memoized name -> canonical country lookup with a trigram fallback index."""
+
+    def __init__(self, canonical_names=(), aliases=ALIASES, min_score: float = MIN_FUZZY_SCORE):
+        self.aliases = {k.lower(): v for k, v in aliases.items()}
+        self.min_score = min_score
+
+        names = list(pd.unique(pd.Series(list(canonical_names), dtype=object).dropna()))
+        names += [v for v in dict.fromkeys(self.aliases.values()) if v not in names]
+        self.canonical = {n.lower(): sys.intern(n) for n in names}
+
+        # trigram -> ids of candidate targets; aliases are indexed too so
+        # misspelled alias forms still land on their canonical name
+        self._targets = []
+        self._target_grams = []
+        self._postings = defaultdict(list)
+        for key, name in [(_fuzzy_key(n), n) for n in self.canonical.values()] + \
+                         [(_fuzzy_key(a), v) for a, v in self.aliases.items()]:
+            grams = _trigrams(key)
+            idx = len(self._targets)
+            self._targets.append(sys.intern(name))
+            self._target_grams.append(len(grams))
+            for g in grams:
+                self._postings[g].append(idx)
+
+        self._cache = {}
+        self.method_counts = Counter()  # distinct names per resolution path
+        self.row_counts = Counter()     # rows per resolution path
+        self.fuzzy_matches = {}
+        self.unresolved = Counter()
+
+    def fuzzy_match(self, name: str):
+        """Return (canonical, score) for the closest target, or (None, 0.0)."""
+        grams = _trigrams(_fuzzy_key(name))
+        if not grams:
+            return None, 0.0
+        shared = Counter()
+        for g in grams:
+            for idx in self._postings.get(g, ()):
+                shared[idx] += 1
+        best, best_score = None, 0.0
+        for idx, common in shared.items():
+            score = 2.0 * common / (len(grams) + self._target_grams[idx])
+            if score > best_score:
+                best, best_score = self._targets[idx], score
+        return best, best_score
+
+    def _resolve_new(self, raw):
+        s = norm_string(raw)
+        if s is None:
+            return None, None
+        low = s.lower()
+        if low in self.aliases:
+            return sys.intern(self.aliases[low]), "alias"
+        if low in self.canonical:
+            return self.canonical[low], "exact"
+        if self.min_score is not None:
+            match, score = self.fuzzy_match(s)
+            if match is not None and score >= self.min_score:
+                self.fuzzy_matches[s] = (match, round(score, 3))
+                return match, "fuzzy"
+        return sys.intern(s), "unresolved"
+
+    def resolve(self, raw):
+        """Canonical name for one raw value (None for missing)."""
+        hit = self._cache.get(raw)
+        if hit is None:
+            hit = self._cache[raw] = self._resolve_new(raw)
+            if hit[1] is not None:
+                self.method_counts[hit[1]] += 1
+        return hit[0]
+
+    def resolve_series(self, series: pd.Series) -> pd.Series:
+        """Resolve a whole Series, touching each distinct value once."""
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        # code -1 (missing) picks the trailing None
+        table = np.empty(len(uniques) + 1, dtype=object)
+        table[:-1] = [self.resolve(u) for u in uniques]
+        table[-1] = None
+
+        rows = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        for raw, n in zip(uniques, rows.tolist()):
+            name, method = self._cache[raw]
+            if method is not None:
+                self.row_counts[method] += n
+                if method == "unresolved":
+                    self.unresolved[name] += n
+        return pd.Series(table[codes], index=series.index, name=series.name)
+
+    def report(self) -> dict:
+        return {
+            "names": dict(self.method_counts),
+            "rows": dict(self.row_counts),
+            "fuzzy": dict(self.fuzzy_matches),
+            "unresolved": [n for n, _ in self.unresolved.most_common()],
+        }
+
+    def print_report(self, limit: int = 20) -> None:
+        r = self.report()
+        total = sum(r["rows"].values()) or 1
+        print("[INFO] country resolution (distinct names / rows):")
+        for method in ("exact", "alias", "fuzzy", "unresolved"):
+            rows = r["rows"].get(method, 0)
+            print(f"  {method:10s}: {r['names'].get(method, 0):5d} / {rows:6d} ({rows / total * 100:4.1f}%)")
+        for name, (match, score) in list(r["fuzzy"].items())[:limit]:
+            print(f"  fuzzy  {name!r} -> {match!r} ({score})")
+        if r["unresolved"]:
+            print(f"  unresolved (top {limit}): {r['unresolved'][:limit]}")
@@ -1,10 +1,12 @@
 import requests
-import xml.etree.ElementTree as ET
 import pandas as pd
 import os
+import sys
 import json
-import html
-import re
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from advisory_xml import iter_items
 
 
 def download_xml_file(dir_path : str):
@@ -24,59 +26,20 @@ def download_xml_file(dir_path : str):
 def create_df(path_to_xml):
     '''create a pandas df in the form of {country_id: [], country_advisory: []}.   
     return the df.'''
-    try:
-        xml_data = open(path_to_xml, 'r').read()  
-    except FileNotFoundError:
+    if not os.path.exists(path_to_xml):
         print(f'No xml file found at {path_to_xml}')
         raise FileNotFoundError
-    # parse XML from provided path
-    tree = ET.parse(path_to_xml)
-    root = tree.getroot()
-    channel_root = root.find('channel')
 
     country_id = []
     country_advisory = []
     country_advisory_text = []
 
-    def clean_html(raw_html: str) -> str:
-        """Remove HTML tags, unescape entities, and normalize whitespace."""
-        if raw_html is None:
-            return ""
-        # Some descriptions may include CDATA wrappers; xml parser gives the inner text
-        text = raw_html
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', ' ', text)
-        # Unescape HTML entities
-        text = html.unescape(text)
-        # Collapse multiple whitespace and newlines
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-
-    for element in channel_root.findall('item'):
-        try:
-            cid = element.find('category[@domain="Country-Tag"]').text if element.find('category[@domain="Country-Tag"]') is not None else None
-            adv = element.find('category[@domain="Threat-Level"]').text if element.find('category[@domain="Threat-Level"]') is not None else None
-            # description elements often contain HTML; extract inner text
-            desc_el = element.find('description')
-            desc_text = None
-            if desc_el is not None and desc_el.text:
-                desc_text = desc_el.text
-            else:
-                # sometimes description can have text in subelements or tail; join them
-                desc_parts = []
-                for child in desc_el.iter() if desc_el is not None else []:
-                    if child.text:
-                        desc_parts.append(child.text)
-                    if child.tail:
-                        desc_parts.append(child.tail)
-                desc_text = ' '.join(desc_parts) if desc_parts else None
-
-            country_id.append(cid)
-            country_advisory.append(adv)
-            country_advisory_text.append(clean_html(desc_text))
-        except Exception as e:
-            # avoid failing the whole run if one item is bad
-            print(f"error while reading element with tag: {element.tag} -> {e}")
+    # stream <item> records; descriptions come back already stripped of HTML
+    for record in iter_items(path_to_xml):
+        categories = record["categories"]
+        country_id.append(categories.get("Country-Tag"))
+        country_advisory.append(categories.get("Threat-Level"))
+        country_advisory_text.append(record["text"])
 
     df = pd.DataFrame({
         "country_id": country_id,
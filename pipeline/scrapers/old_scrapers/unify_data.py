@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
+import argparse
 import json
 from pathlib import Path
 import pandas as pd
@@ -7,13 +8,17 @@ import pandas as pd
 from utils_norm import (
     read_json_auto, snake_cols, canon_country, coerce_numeric, norm_string
 )
+from country_resolver import CountryResolver
+from country_join import add_surrogate_key, join_facts
+from bert_text import render_bert_input
+from unified_store import write_columnar  # pipeline/common, on sys.path via utils_norm
 
 # at the top of each script
 HERE = Path(__file__).resolve().parent
 ROOT = HERE.parent                          # <- repo root (SafeTrip-IQ/)
 RAW  = ROOT / "cleaned_data"                # <- INPUTS live here
 WORK = ROOT / "unified_data"                # <- keep fips map here
-OUT  = ROOT / "unified_data"                # <- OUTPUT unified JSON here
+OUT  = ROOT / "unified_data"                # <- OUTPUT unified Parquet/Arrow (+ JSON) here
 OUT.mkdir(parents=True, exist_ok=True)
 WORK.mkdir(parents=True, exist_ok=True)
 
@@ -56,8 +61,9 @@ def load_fips_map() -> dict:
         return {}
     return json.loads(f.read_text(encoding="utf-8"))
 
-def norm_with_country(df: pd.DataFrame, name_col_guess=("country_name","country","name")) -> pd.DataFrame:
-    from utils_norm import snake_cols, norm_string, canon_country
+def norm_with_country(df: pd.DataFrame, name_col_guess=("country_name","country","name"),
+                      resolver: CountryResolver | None = None) -> pd.DataFrame:
+    from utils_norm import snake_cols, norm_string, canon_country, batch
     df = snake_cols(df)
     # ensure a country_name column exists
     if "country_name" not in df.columns:
@@ -69,15 +75,17 @@ def norm_with_country(df: pd.DataFrame, name_col_guess=("country_name","country"
         # still nothing; create empty so downstream doesn’t crash
         df["country_name"] = None
     # normalize + canonicalize
-    df["country_name"] = df["country_name"].apply(norm_string)
-    df["country_name_norm"] = canon_country(df["country_name"])
+    df["country_name"] = batch(norm_string, df["country_name"])
+    df["country_name_norm"] = canon_country(df["country_name"], resolver)
     return df
 
 
-def main():
+def main(write_json: bool = True):
     # Load dim and FIPS map
     dim = load_dim_countries()
     fips_map = load_fips_map()
+    # every source resolves names against the dimension (exact / alias / fuzzy)
+    resolver = CountryResolver(dim["country_name_norm"])
 
     # --- Load sources
     # Advisories (FIPS-coded)
@@ -89,18 +97,19 @@ def main():
         adv["country_name"] = adv.get("country_name")
         adv["country_name"] = adv["country_name"].where(adv["country_name"].notna(),
                                                         adv["country_id"].map(fips_map))
-    adv = norm_with_country(adv)
+    adv = norm_with_country(adv, resolver=resolver)
 
     # GPI / GTI
-    gpi = norm_with_country(read_json_auto(RAW / "gpi.json"))
+    gpi = norm_with_country(read_json_auto(RAW / "gpi.json"), resolver=resolver)
     if "score" in gpi.columns and "gpi_score" not in gpi.columns:
         gpi = gpi.rename(columns={"score":"gpi_score"})
-    gti = norm_with_country(read_json_auto(RAW / "gti.json"))
+    gti = norm_with_country(read_json_auto(RAW / "gti.json"), resolver=resolver)
     if "score" in gti.columns and "gti_score" not in gti.columns:
         gti = gti.rename(columns={"score":"gti_score"})
 
     # Events
-    events = norm_with_country(read_json_auto(RAW / "events.json"), name_col_guess=("country","country_name","name"))
+    events = norm_with_country(read_json_auto(RAW / "events.json"), name_col_guess=("country","country_name","name"),
+                               resolver=resolver)
     events = coerce_numeric(events, ["year","events"])
     if "year" in events.columns:
         events = (events.sort_values("year", ascending=False)
@@ -111,16 +120,18 @@ def main():
     def load_optional(fname):
         p = RAW / fname
         if p.exists():
-            df = norm_with_country(read_json_auto(p))
+            df = norm_with_country(read_json_auto(p), resolver=resolver)
             return df
         return None
 
     numbeo = load_optional("numbeo_clean.json")
     ppi    = load_optional("ppi.json")
 
-    # --- Merge pipeline
-    # start from dim; left-join facts so we keep “known” countries
-    out = dim.copy()
+    # --- Join pipeline
+    # dim carries an integer surrogate key; every fact source is keyed against
+    # it once and all of them are left-joined in a single pass
+    dim = add_surrogate_key(dim)
+    facts = []
 
     # advisories: choose reasonable column names
     level_col = None
@@ -133,19 +144,19 @@ def main():
     cols = ["country_name_norm"]
     if level_col: cols.append(level_col)
     if text_col:  cols.append(text_col)
-    out = out.merge(adv[cols], on="country_name_norm", how="left")
+    facts.append(adv[cols])
 
     # gpi/gti
     if "gpi_score" in gpi.columns:
-        out = out.merge(gpi[["country_name_norm","gpi_score"]], on="country_name_norm", how="left")
+        facts.append(gpi[["country_name_norm","gpi_score"]])
     if "gti_score" in gti.columns:
-        out = out.merge(gti[["country_name_norm","gti_score"]], on="country_name_norm", how="left")
+        facts.append(gti[["country_name_norm","gti_score"]])
 
     # events
     to_keep = ["country_name_norm"]
     for c in ["events","events_year"]:
         if c in events.columns: to_keep.append(c)
-    out = out.merge(events[to_keep], on="country_name_norm", how="left")
+    facts.append(events[to_keep])
 
     # numbeo (prefix)
     if numbeo is not None:
@@ -153,7 +164,7 @@ def main():
         numbeo_pref = numbeo[["country_name_norm"] + num_cols]
         numbeo_pref = numbeo_pref.add_prefix("numbeo_")
         numbeo_pref = numbeo_pref.rename(columns={"numbeo_country_name_norm":"country_name_norm"})
-        out = out.merge(numbeo_pref, on="country_name_norm", how="left")
+        facts.append(numbeo_pref)
 
     # ppi (prefix)
     if ppi is not None:
@@ -161,7 +172,9 @@ def main():
         ppi_pref = ppi[["country_name_norm"] + ppi_cols]
         ppi_pref = ppi_pref.add_prefix("ppi_")
         ppi_pref = ppi_pref.rename(columns={"ppi_country_name_norm":"country_name_norm"})
-        out = out.merge(ppi_pref, on="country_name_norm", how="left")
+        facts.append(ppi_pref)
+
+    out = join_facts(dim, facts)
 
     # final tidy columns
     out = coerce_numeric(out, ["gpi_score","gti_score","events","events_year"])
@@ -179,30 +192,23 @@ def main():
         *[c for c in out.columns if c.startswith("ppi_")],
     ]]
 
-    # BERT input
-    def mk_bert(row):
-        parts = [f"Country: {row['country_name']}."]
-        if pd.notna(row.get("advisory_level")):
-            parts.append(f"Travel Advisory: {row['advisory_level']}.")
-        if pd.notna(row.get("gpi_score")):
-            parts.append(f"The Global Peace Index score is {float(row['gpi_score']):.3f}.")
-        if pd.notna(row.get("gti_score")):
-            parts.append(f"The Global Terrorism Index score is {float(row['gti_score']):.3f}.")
-        if pd.notna(row.get("events")) and pd.notna(row.get("events_year")):
-            parts.append(f"In {int(row['events_year'])}, there were {int(row['events'])} political violence events.")
-        if pd.notna(row.get("advisory_text")):
-            parts.append(f"Advisory Details: {row['advisory_text']}")
-        return " ".join(parts)
-
-    out["bert_input_text"] = out.apply(mk_bert, axis=1)
-
-    # write
-    out = out.where(pd.notna(out), None)
-    (OUT / "unified_travel_data.json").write_text(
-        json.dumps(out.to_dict(orient="records"), ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
-    print(f"[DONE] Wrote {OUT/'unified_travel_data.json'} (rows={len(out)})")
+    # BERT input (column-wise; identical to bert_text.mk_bert per row)
+    out["bert_input_text"] = render_bert_input(out)
+
+    # write: columnar files for downstream readers, JSON kept for older consumers
+    for path in write_columnar(out, OUT / "unified_travel_data"):
+        print(f"[DONE] Wrote {path} (rows={len(out)})")
+    if write_json:
+        out = out.where(pd.notna(out), None)
+        (OUT / "unified_travel_data.json").write_text(
+            json.dumps(out.to_dict(orient="records"), ensure_ascii=False, indent=2),
+            encoding="utf-8"
+        )
+        print(f"[DONE] Wrote {OUT/'unified_travel_data.json'} (rows={len(out)})")
+    resolver.print_report()
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--no-json", action="store_true",
+                    help="only write the Parquet/Arrow outputs, skip unified_travel_data.json")
+    main(write_json=not ap.parse_args().no_json)
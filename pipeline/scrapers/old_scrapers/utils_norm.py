@@ -1,4 +1,11 @@
-import unicodedata, re, pandas as pd
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from textnorm import norm_string, batch
+from frame_loader import load_json_frame
 
 ALIASES = {
     "türkiye":"Turkey", "turkiye":"Turkey", "t\ufffdrkiye":"Turkey",
@@ -12,23 +19,21 @@ ALIASES = {
     "united states of america":"United States",
 }
 
-def norm_string(x):
-    if x is None or (isinstance(x, float) and pd.isna(x)):
-        return None
-    # Convert non-strings to string safely
-    s = str(x)
-    s = unicodedata.normalize("NFKC", s)
-    s = s.replace("’","'").replace("`","'").replace("–","-").replace("—","-")
-    s = re.sub(r"\s+", " ", s.strip())
-    return s
-
-def canon_country(series: pd.Series) -> pd.Series:
-    # Normalize each element safely; allow None
-    s = series.apply(norm_string)
-    # lower() only on non-null strings
-    lower = s.where(s.isna(), s.str.lower())
-    mapped = lower.map(ALIASES).fillna(s)   # map known aliases; keep original otherwise
-    return mapped
+_DEFAULT_RESOLVER = None
+
+def canon_country(series: pd.Series, resolver=None) -> pd.Series:
+    """
+    Normalize + canonicalize country names. Without a resolver only ALIASES
+    apply; pass a country_resolver.CountryResolver built from the country
+    dimension to also get case-insensitive and fuzzy matches.
+    """
+    global _DEFAULT_RESOLVER
+    if resolver is None:
+        if _DEFAULT_RESOLVER is None:
+            from country_resolver import CountryResolver
+            _DEFAULT_RESOLVER = CountryResolver(min_score=None)
+        resolver = _DEFAULT_RESOLVER
+    return resolver.resolve_series(series)
 
 def snake_cols(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
@@ -39,11 +44,9 @@ def snake_cols(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def read_json_auto(path):
-    import pandas as pd
-    try:
-        return pd.read_json(path)
-    except ValueError:
-        return pd.read_json(path, lines=True)
+    # format is sniffed from the first bytes (array / JSON lines / document),
+    # parsed once, and cached next to the file until its mtime or size changes
+    return load_json_frame(path)
 
 def coerce_numeric(df: pd.DataFrame, cols):
     df = df.copy()
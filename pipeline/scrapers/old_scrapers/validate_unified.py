@@ -1,14 +1,18 @@
+import sys
 from pathlib import Path
-import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from unified_store import read_unified
 
 ROOT = Path(__file__).resolve().parents[1]
-UNIFIED = ROOT / "unified_data" / "unified_travel_data.json"
+UNIFIED = ROOT / "unified_data" / "unified_travel_data"   # .arrow / .parquet / .json
+COVERAGE = ["advisory_level","gpi_score","gti_score","events","events_year","numbeo_crime_index","ppi_score"]
 
 def main():
-    df = pd.read_json(UNIFIED)
+    df = read_unified(UNIFIED, columns=["iso2","country_name", *COVERAGE])
 
     print(f"[INFO] rows: {len(df)}")
-    for col in ["advisory_level","gpi_score","gti_score","events","events_year","numbeo_crime_index","ppi_score"]:
+    for col in COVERAGE:
         got = int(df[col].notna().sum())
         pct = (got/len(df)*100) if len(df) else 0
         print(f"  coverage {col:20s}: {got:4d} / {len(df):4d} ({pct:4.1f}%)")
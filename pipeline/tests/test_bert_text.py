@@ -0,0 +1,71 @@
+"""render_bert_input() must match df.apply(mk_bert, axis=1) byte for byte."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scrapers" / "old_scrapers"))
+from bert_text import mk_bert, render_bert_input
+
+
+def assert_same(df):
+    expected = df.apply(mk_bert, axis=1) if len(df) else pd.Series([], index=df.index, dtype=object)
+    got = render_bert_input(df)
+    assert got.index.equals(df.index)
+    assert got.tolist() == expected.tolist()
+
+
+def test_missing_values():
+    assert_same(pd.DataFrame({
+        "country_name": ["France", None, np.nan, "Chad"],
+        "advisory_level": [np.nan, "Level 2: Exercise Increased Caution", None, "Level 4: Do Not Travel"],
+        "gpi_score": [1.5, np.nan, np.nan, 2.25],
+        "gti_score": [np.nan, 0.0, np.nan, 7.1234],
+        "events": [12.0, np.nan, 3.0, 40.0],
+        "events_year": [2019.0, 2020.0, np.nan, 2021.0],    # events only rendered when both are present
+        "advisory_text": [None, "Avoid the border.", np.nan, "Do not travel."],
+    }, index=[10, 11, 12, 13]))
+
+
+def test_empty_strings():
+    assert_same(pd.DataFrame({
+        "country_name": ["", "Peru"],
+        "advisory_level": ["", "Level 1: Exercise Normal Precautions"],
+        "advisory_text": ["", ""],
+        "gpi_score": [np.nan, 1.0],
+    }))
+
+
+def test_integer_valued_floats():
+    assert_same(pd.DataFrame({
+        "country_name": ["Mali", "Niger"],
+        "advisory_level": [4.0, 3.0],              # printed as the float repr, like mk_bert
+        "gpi_score": [3.0, 2.0],
+        "gti_score": [0.0, 10.0],
+        "events": [1500.0, 0.0],
+        "events_year": [2023.0, 2015.0],
+    }))
+
+
+def test_mixed_types():
+    assert_same(pd.DataFrame({
+        "country_name": ["Chile", 42, None],
+        "advisory_level": [2, "Level 3: Reconsider Travel", np.nan],
+        "gpi_score": pd.Series(["1.75", 2, np.nan], dtype=object),
+        "gti_score": pd.Series([np.int64(3), 4.5, None], dtype=object),
+        "events": pd.Series([7, "8", None], dtype=object),
+        "events_year": pd.Series(["2018", 2019.0, 2020], dtype=object),
+        "advisory_text": ["text", 3.5, None],
+    }))
+
+
+@pytest.mark.parametrize("columns", [["country_name"], ["country_name", "gpi_score", "events"]])
+def test_absent_columns(columns):
+    df = pd.DataFrame({"country_name": ["Iran", "Oman"], "gpi_score": [2.5, np.nan], "events": [1.0, 2.0]})
+    assert_same(df[columns])
+
+
+def test_empty_frame():
+    assert_same(pd.DataFrame({"country_name": pd.Series([], dtype=object)}))
@@ -0,0 +1,45 @@
+"""DedupIndex only puts advisory hashes on disk once their snapshot is marked (after the CSV rows)."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "BERT" / "wayback"))
+from dedup_index import DedupIndex, advisory_key
+
+
+def entries(path):
+    return path.read_text(encoding="utf-8").splitlines()
+
+
+def test_hashes_written_with_the_snapshot_mark(tmp_path):
+    path = tmp_path / "index.txt"
+    index = DedupIndex(path)
+    assert index.add(2, "exercise caution", cleaned=True)
+    assert not index.add(2, "exercise caution", cleaned=True)     # duplicate within the run
+    index._fh.flush()
+    assert entries(path) == []                                      # a hard kill here leaves nothing behind
+
+    index.mark_url("http://snap/1")
+    assert entries(path) == [f"h {advisory_key(2, 'exercise caution', cleaned=True)}", "u http://snap/1"]
+
+    index.add(3, "reconsider travel", cleaned=True)                # snapshot 2 interrupted before its mark
+    index._fh.flush()
+    reopened = DedupIndex(path)
+    assert reopened.urls == {"http://snap/1"}
+    assert reopened.add(3, "reconsider travel", cleaned=True)      # row is written again on the re-run
+
+
+def test_close_writes_outstanding_hashes(tmp_path):
+    path = tmp_path / "index.txt"
+    with DedupIndex(path) as index:
+        index.add(1, "normal precautions", cleaned=True)
+    reopened = DedupIndex(path)
+    assert not reopened.add(1, "normal precautions", cleaned=True)
+    assert not reopened.urls
+
+
+def test_seed_from_csv(tmp_path):
+    csv_path = tmp_path / "out.csv"
+    csv_path.write_text("label,text_advisory\n1,a\n4,b\n", encoding="utf-8")
+    index = DedupIndex(tmp_path / "index.txt")
+    assert index.seed_from_csv(csv_path) == 2
+    assert len(entries(tmp_path / "index.txt")) == 2
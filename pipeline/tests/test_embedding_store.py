@@ -0,0 +1,92 @@
+"""EmbeddingStore appends, reopening, and recovery from an append interrupted before the manifest write."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "BERT"))
+import embedding_store
+from embedding_store import EmbeddingStore
+
+DIM = 8
+MODEL = "model-a"
+
+
+def vectors(seeds):
+    return embedding_store._normalize(np.stack([np.random.default_rng(s).standard_normal(DIM) for s in seeds]))
+
+
+def records(seeds):
+    return [{"country": f"C{s}", "date": "", "level": 1, "source": "test", "key": f"k{s}"} for s in seeds]
+
+
+def append(store, seeds):
+    return store.append(vectors(seeds), records(seeds), MODEL)
+
+
+def interrupt():
+    raise KeyboardInterrupt
+
+
+def check(store, seeds):
+    assert store.count == len(seeds)
+    assert [row["key"] for row in store.meta] == [f"k{s}" for s in seeds]
+    assert [row["id"] for row in store.meta] == [str(i) for i in range(len(seeds))]
+    np.testing.assert_allclose(np.asarray(store.matrix(), np.float32), vectors(seeds), atol=1e-3)
+
+
+def test_append_and_reopen(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    append(store, [0, 1, 2])
+    append(store, [3])
+    check(EmbeddingStore(tmp_path), [0, 1, 2, 3])
+    scores, ids = EmbeddingStore(tmp_path).search(vectors([1]), k=1)
+    assert ids[0, 0] == 1
+
+
+def test_interrupted_append_is_dropped(tmp_path, monkeypatch):
+    append(EmbeddingStore(tmp_path), [0, 1, 2])
+
+    store = EmbeddingStore(tmp_path)
+    monkeypatch.setattr(store, "_write_manifest", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        append(store, [3, 4])         # rows and meta written, manifest not
+
+    store = EmbeddingStore(tmp_path)
+    check(store, [0, 1, 2])
+    assert store.keys == {"k0", "k1", "k2"}
+    append(store, [10, 11])
+    check(EmbeddingStore(tmp_path), [0, 1, 2, 10, 11])
+
+
+def test_interrupted_first_append(tmp_path, monkeypatch):
+    store = EmbeddingStore(tmp_path)
+    monkeypatch.setattr(store, "_write_manifest", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        append(store, [3, 4])
+
+    store = EmbeddingStore(tmp_path)
+    assert store.count == 0 and not store.meta
+    append(store, [10, 11])
+    check(EmbeddingStore(tmp_path), [10, 11])
+
+
+def test_interrupted_append_with_ivf(tmp_path, monkeypatch):
+    store = EmbeddingStore(tmp_path)
+    append(store, range(20))
+    store.build_ivf(n_lists=2)
+
+    store = EmbeddingStore(tmp_path)
+    monkeypatch.setattr(store, "_write_manifest", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        append(store, [30, 31])       # ivf.npz saved with 22 rows
+
+    store = EmbeddingStore(tmp_path)
+    assert len(store.ivf.assign) == 20
+    append(store, [40])
+    store = EmbeddingStore(tmp_path)
+    check(store, list(range(20)) + [40])
+    assert len(store.ivf.assign) == 21
+    _, ids = store.search(vectors([40]), k=1)
+    assert ids[0, 0] == 20
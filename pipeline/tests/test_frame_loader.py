@@ -0,0 +1,40 @@
+"""load_json_frame keeps pd.read_json's dtype inference, parsed or from the cache sidecar."""
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "common"))
+from frame_loader import load_json_frame, parse_json_frame
+
+SAMPLES = {
+    "records": [{"year": "2019", "score": "1.5", "n": 1.0, "created_at": 1577836800, "date": "2020-01-02", "name": "a"},
+                {"year": "2020", "score": None, "n": 2.0, "created_at": 1577923200, "date": "2020-01-03", "name": "b"}],
+    "document": {"gpi": {"AFG": "3.2", "ALB": 1}, "year": {"AFG": 2019, "ALB": 2020}},
+    "numeric_index": {"a": {"0": 1, "1": 2}, "b": {"0": "x", "1": "y"}},
+    "numeric_columns": [{"2019": 1, "2020": 2.5}],
+    "epoch_ms": [{"timestamp": 1577836800000}, {"timestamp": None}],
+    "empty": [],
+}
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLES))
+def test_matches_read_json(tmp_path, name):
+    path = tmp_path / f"{name}.json"
+    path.write_text(json.dumps(SAMPLES[name]), encoding="utf-8")
+    ref = pd.read_json(path)
+    assert_frame_equal(parse_json_frame(path), ref)
+    assert_frame_equal(load_json_frame(path), ref)      # parsed, sidecar written
+    assert_frame_equal(load_json_frame(path), ref)      # from the sidecar
+
+
+def test_json_lines(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"year": "2019", "events": "12", "modified": "2020-01-01"}\n'
+                    '{"year": "2020", "events": 3, "modified": "2021-01-01"}\n', encoding="utf-8")
+    ref = pd.read_json(path, lines=True)
+    assert_frame_equal(load_json_frame(path), ref)
+    assert ref["events"].dtype == "int64"
@@ -0,0 +1,110 @@
+"""fetch_snapshots against a local http.server: retries, per-host rate limit, cache hits, output order."""
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "BERT" / "wayback"))
+from snapshot_fetcher import fetch_snapshots, make_session
+
+
+class SnapshotServer(ThreadingHTTPServer):
+    """Serves /<name> as <xml>name</xml>; fail[name] = n answers 503 to the first n requests."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.requests = []      # (monotonic time, path)
+        self.fail = {}
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        name = self.path.lstrip("/")
+        with server.lock:
+            server.requests.append((time.monotonic(), self.path))
+            failing = server.fail.get(name, 0) > 0
+            if failing:
+                server.fail[name] -= 1
+        body = b"busy" if failing else f"<xml>{name}</xml>".encode()
+        self.send_response(503 if failing else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = SnapshotServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def fetch(urls, cache_dir, **kwargs):
+    kwargs.setdefault("min_interval", 0.0)
+    session = make_session(pool_size=4, retries=3, backoff_factor=0.05)
+    try:
+        return fetch_snapshots(urls, cache_dir=cache_dir, max_workers=4, session=session, timeout=5, **kwargs)
+    finally:
+        session.close()
+
+
+def test_output_order_and_duplicates(server, tmp_path):
+    urls = [server.url(n) for n in ("c", "a", "b", "a")]
+    out = fetch(urls, tmp_path)
+    assert [u for u, _ in out] == urls
+    assert [p.read_text() for _, p in out] == ["<xml>c</xml>", "<xml>a</xml>", "<xml>b</xml>", "<xml>a</xml>"]
+    assert len(server.requests) == 3        # the duplicate is fetched once
+
+
+def test_retries_with_backoff(server, tmp_path):
+    server.fail["flaky"] = 2
+    (url, path), = fetch([server.url("flaky")], tmp_path)
+    assert path.read_text() == "<xml>flaky</xml>"
+    times = [t for t, p in server.requests if p == "/flaky"]
+    assert len(times) == 3
+    # urllib3 retries the first failure immediately, then sleeps backoff_factor * 2
+    assert times[2] - times[1] >= 0.09
+
+
+def test_gives_up_after_retries(server, tmp_path):
+    server.fail["down"] = 10
+    with pytest.raises(Exception):
+        fetch([server.url("down")], tmp_path)
+    assert len(server.requests) == 4        # first try + 3 retries
+
+
+def test_per_host_rate_limit(server, tmp_path):
+    urls = [server.url(f"s{i}") for i in range(4)]
+    fetch(urls, tmp_path, min_interval=0.15)
+    starts = sorted(t for t, _ in server.requests)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= 0.13                 # 4 workers, but one start per interval on this host
+
+
+def test_cache_hits_skip_the_network(server, tmp_path):
+    urls = [server.url("x"), server.url("y")]
+    first = fetch(urls, tmp_path)
+    assert len(server.requests) == 2
+    second = fetch(urls + [server.url("z")], tmp_path)
+    assert len(server.requests) == 3         # only z was fetched
+    assert second[:2] == first
+    assert (tmp_path / "index.json").exists()
+
+    fetch(urls, tmp_path, refresh=True)
+    assert len(server.requests) == 5